@@ -5,8 +5,9 @@ Created on Mon Dec  2 14:16:41 2019
 @author: mdamelio
 """
 
+import json
 from threading import Thread
-from time import sleep
+from time import sleep, perf_counter_ns
 from SimpleWebSocketServer import WebSocket, SimpleWebSocketServer
 
 clients = []
@@ -15,7 +16,18 @@ debug = False
 
 class WebsocketBroadcasterHandler(WebSocket):
 
+    accounts = None
+
     def handleMessage(self):
+        ## {"account": "X"} or {"accounts": ["X", "Y"]}: only order reports of these accounts ([] or null: all)
+        try:
+            request = json.loads(self.data)
+        except (TypeError, ValueError):
+            request = None
+        if isinstance(request, dict) and ('account' in request or 'accounts' in request):
+            accounts = request.get('accounts', [request.get('account')] if request.get('account') else [])
+            self.accounts = set(accounts) if accounts else None
+            return
         if debug:
             self.sendMessage(self.data)
 
@@ -32,10 +44,11 @@ class WebsocketBroadcasterHandler(WebSocket):
 
 class BroadcasterWebsocketServer(Thread):
 
-    def __init__(self, host, port, debugInfo=False):
+    def __init__(self, host, port, debugInfo=False, latency=None):
         Thread.__init__(self)
         self.server = SimpleWebSocketServer(host, port, WebsocketBroadcasterHandler)
         self._isClosed = False
+        self.latency = latency
         global debug
         debug = debugInfo
         self.setDaemon(True)
@@ -61,15 +74,64 @@ class BroadcasterWebsocketServer(Thread):
         except KeyboardInterrupt:
             pass
 
-    def broadcast(self, msg):
+    def clientCount(self):
+        return len(clients)
+
+    def queueDepths(self):
+        return {'%s:%s' % client.address[:2] : len(client.sendq) for client in list(clients)}
+
+    def broadcast(self, msg, account=None, timed=False):
+        ## timed: the broadcast of an inbound message (once per message) records the socket enqueue and write times
+        latency = self.latency if timed else None
+        if latency is not None:
+            enqueue, write = 0, 0
         if isinstance(msg, str):
             msg = str(msg)
             msg = msg.replace("\'", "\"")
         for client in clients:
+            if account is not None and client.accounts is not None and account not in client.accounts:
+                continue
+            if latency is not None:
+                start = perf_counter_ns()
             client.sendMessage(msg)
+            if latency is not None:
+                queued = perf_counter_ns()
             while client.sendq:
                 opcode, payload = client.sendq.popleft()
                 remaining = client._sendBuffer(payload)
                 if remaining is not None:
                     client.sendq.appendleft((opcode, remaining))
-                    break
\ No newline at end of file
+                    break
+            if latency is not None:
+                enqueue += queued - start
+                write += perf_counter_ns() - queued
+        if latency is not None:
+            latency.stage('enqueue', enqueue)
+            latency.stage('write', write)
+
+
+class NullBroadcaster(object):
+    """
+    ### Null Broadcaster
+
+        - Same interface as BroadcasterWebsocketServer without any socket (replay): counts the messages
+    """
+
+    def __init__(self, latency=None):
+        self.latency = latency
+        self.messages = 0
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def clientCount(self):
+        return 0
+
+    def queueDepths(self):
+        return {}
+
+    def broadcast(self, msg, account=None, timed=False):
+        self.messages += 1
@@ -9,19 +9,34 @@ import sys, os
 import quickfix as fix
 import quickfix50sp2 as fix50
 import logging
-import texttable
 import random
 import string
-from WebSocket.BroadcasterWebsocketServer import BroadcasterWebsocketServer
+import time
+from WebSocket.BroadcasterWebsocketServer import BroadcasterWebsocketServer, NullBroadcaster
 
 sys.path.insert(0, os.path.join(os.path.dirname(sys.path[0]), 'model'))
 
 from logger import setup_logger
+from instrumentcache import InstrumentCache
+from instruments import InstrumentRegistry
+from securitylist import SecurityListAssembler
+from tradingstatus import TradingStatusCache
+from tradestore import TradeStore, parseTransactTime
+from tradejournal import TradeJournal
+from latency import LatencyRecorder
+from metrics import MetricsRegistry
+from shmbook import BookWriter
+from rttmonitor import RttMonitor, RttProber, PREFIX as RTT_PREFIX
+from subscriptions import SubscriptionManager
+from bookanalytics import bookAnalytics
+from bars import BarAggregator, BarClock
+from tophistory import TopHistory
+from impliedspreads import ImpliedEngine
+from optionchain import OptionChainEngine, ChainClock
 
 __SOH__ = chr(1)
 
-# Logger
-setup_logger('FIX', './Logs/message.log')
+# Logger (handlers added by the first Application)
 logfix = logging.getLogger('FIX')
 
 def randomString(stringLength=10):
@@ -31,24 +46,108 @@ def randomString(stringLength=10):
 class Application(fix.Application):
     """FIX Application"""
 
-    def __init__(self, target, sender, password, account):
+    def __init__(self, target, sender, password, account, recorder=None, pipeline=None, books=None, rtt=None,
+                 cachePath='./Cache/instruments.db', journalDirectory='./Journal', live=True, barIntervals=(1, 60, 300)):
         """
         ### Start Application
         
             - Start FIX Session    
             - Open WebSocket in localhost:8080    
+            - target/sender/password: default venue (more venues with addVenue)
+            - recorder: FixRecorder of the raw inbound application messages (optional)
+            - pipeline: MarketDataPipeline that decodes, broadcasts and writes the books of the market data out of process,
+              its top of book records feed the top of book consumers on its consumer thread (optional)
+            - books: BookWriter of the shared memory books read by local consumers (default: anonymous segment; written
+              by the pipeline when there is one)
+            - rtt: RttMonitor of the periodic Test Request probes (default: RttMonitor())
+            - cachePath / journalDirectory: instrument cache and trade journal (replay: its own, before anything is loaded)
+            - live: False (replay) keeps the WebSocket server and the bar / chain clock threads off
+            - barIntervals: bar sizes in seconds (BarAggregator)
         """
         
         super().__init__()
         
+        if not logfix.handlers:
+            setup_logger('FIX', './Logs/message.log')
+        
         self.senderCompID = sender
         self.targetCompID = target
         self.password = password
         self.account = account
+        self.recorder = recorder
+        self.pipeline = pipeline
+        
+        ## Venues: TargetCompID -> credentials (one [SESSION] per venue in the configuration file)
+        self.venues = {}
+        self.addVenue(target, sender, password)
+        
+        ## Instrument reference data (warm start from the daily cache of every venue downloaded today)
+        self.instrumentCache = InstrumentCache(cachePath)
+        validVenues = self.instrumentCache.validVenues()
+        if validVenues:
+            self.instruments = InstrumentRegistry(self.instrumentCache.load(validVenues))
+            logfix.info("Instruments loaded from cache >> (%s): %s" % (', '.join(validVenues), len(self.instruments)))
+        else:
+            self.instruments = InstrumentRegistry()
+        self.securityLists = SecurityListAssembler()
+        self.tradingStatus = TradingStatusCache()
+        self.subscriptions = SubscriptionManager()
+        
+        ## OHLCV bars from the trade entries (closed by the clock when a period ends without trades)
+        self.bars = BarAggregator(intervals=barIntervals, onClose=self.onBarClose)
+        self.barClock = BarClock(self.bars)
+        if live:
+            self.barClock.start()
+        
+        ## Intraday top of book history (NumPy ring per symbol)
+        self.topHistory = TopHistory()
+        
+        ## Implied calendar spreads and outrights of the futures curves (rebuilt with the instruments)
+        self.implied = ImpliedEngine()
+        self.implied.load(self.instruments.values())
+        
+        ## Option chains IV and greeks (books only mark their chain, the clock recomputes at most every interval)
+        self.optionChains = OptionChainEngine(onUpdate=self.onOptionChain)
+        self.optionChains.load(self.instruments.values())
+        self.chainClock = ChainClock(self.optionChains)
+        if live:
+            self.chainClock.start()
+        self.tradeStore = TradeStore()
+        
+        ## Books of the subscribed symbols (shared memory, seqlock per symbol)
+        self.books = books if books is not None else BookWriter()
+        if self.books.onSkip is None:
+            self.books.onSkip = self.onBooksSkip
+        
+        ## Trade capture journal (reload the day's trades)
+        self.tradeJournal = TradeJournal(journalDirectory)
+        for record in self.tradeJournal.load():
+            self.storeTradeReport(record['tradeReportId'], record['report'], record['time'])
+        logfix.info("Trade reports loaded from journal >> (%s)" % len(self.tradeJournal))
+        
+        ## Hot path latency histograms (fromApp -> handler -> broadcast)
+        self.latency = LatencyRecorder()
     
-        self.server_md = BroadcasterWebsocketServer('', 8080, True)
+        if live:
+            self.server_md = BroadcasterWebsocketServer('', 8080, True, latency=self.latency)
+        else:
+            self.server_md = NullBroadcaster(latency=self.latency)
         self.server_md.start()
         
+        ## Round trip probes (Test Request / Heartbeat), started on the first logon
+        self.testRequests = {}
+        self.rtt = rtt if rtt is not None else RttMonitor()
+        if self.rtt.onAlert is None:
+            self.rtt.onAlert = self.onRttAlert
+        self.rttProber = RttProber(self.rtt, self.getConnectedVenues, lambda testReqID, venue: self.testRequest(testReqID, venue=venue))
+        
+        ## Metrics (Prometheus): counters on the hot path, gauges evaluated on scrape
+        self.setupMetrics()
+        
+        ## Tops of the books decoded out of process come back to the top of book consumers
+        if self.pipeline is not None:
+            self.pipeline.consume(self.onPipelineTop)
+        
 #        self.server_or = BroadcasterWebsocketServer('', 8081, True)
 #        self.server_or.start()
 
@@ -66,6 +165,7 @@ class Application(fix.Application):
             self.sessions[targetCompID] = {}
         except AttributeError:
             self.lastOrderID            = self.account + '-00000000' 
+            self.orderIDs               = {}
             self.orderID                = 0
             self.sessions               = {}
             self.orders                 = {}
@@ -77,6 +177,7 @@ class Application(fix.Application):
         self.sessions[targetCompID]['connected'] = False
         self.sessions[targetCompID]['exchID']    = 0
         self.sessions[targetCompID]['execID']    = 0
+        self.sessions[targetCompID]['rtt']       = None
         
         logfix.info("onCreate, sessionID >> (%s)" %self.sessions[targetCompID]['session'])
 
@@ -91,8 +192,22 @@ class Application(fix.Application):
         
         logfix.info("Client (%s) has logged in >>" % targetCompID)
 
-        ## Test Message
-        self.testRequest('TEST')
+        ## Test Message (first RTT probe, then one every rtt.interval seconds)
+        self.testRequest(self.rtt.requestId(targetCompID), venue=targetCompID)
+        if not self.rttProber.is_alive():
+            self.rttProber.start()
+        
+        ## Instrument reference data
+        self.requestInstruments(venue=targetCompID)
+        
+        ## Trading status of every symbol (gates order entry)
+        self.securityStatusRequest(subscription=fix.SubscriptionRequestType_SNAPSHOT_PLUS_UPDATES, venue=targetCompID)
+        
+        ## Trade capture reports newer than the journal
+        self.tradeCaptureReportRequest(venue=targetCompID)
+        
+        ## Market data streams open before the reconnection
+        self.resubscribeMarketData(venue=targetCompID)
         
     def onLogout(self, session):
         """
@@ -102,6 +217,7 @@ class Application(fix.Application):
         
         targetCompID = session.getTargetCompID().getValue()
         self.sessions[targetCompID]['connected'] = False
+        self.rtt.reset(targetCompID)
 
         logfix.info("Client (%s) has logged out >>" % targetCompID)
 
@@ -113,12 +229,15 @@ class Application(fix.Application):
         This allows you to add fields to an adminstrative message before it is sent out.
         """
 
+        self.messagesSent.inc(self.getHeaderValue(message, fix.MsgType()))
+
         msg = message.toString().replace(__SOH__, "|")
         logfix.info("S toAdmin>> (%s)" % msg)
 
         if self.getHeaderValue(message, fix.MsgType()) == fix.MsgType_Logon:
-            message.getHeader().setField(553, self.senderCompID)
-            message.getHeader().setField(554, self.password)
+            credentials = self.getCredentials(session.getTargetCompID().getValue())
+            message.getHeader().setField(553, credentials['senderCompID'])
+            message.getHeader().setField(554, credentials['password'])
             msg = message.toString().replace(__SOH__, "|")
             logfix.info("S Logon>> (%s)" % msg)
 
@@ -132,6 +251,8 @@ class Application(fix.Application):
         SESSION MESSAGES
         """
         
+        self.messagesReceived.inc(self.getHeaderValue(message, fix.MsgType()))
+        
         ## Message Type = 'h' - Heartbeat
         if self.getHeaderValue(message, fix.MsgType()) == fix.MsgType_Heartbeat:
             self.onMesssage_Heartbeat(message, session)
@@ -156,12 +277,18 @@ class Application(fix.Application):
         This allows you to add fields to an application message before it is sent out.
         """
         
+        start = time.perf_counter_ns()
+        msgType = self.getHeaderValue(message, fix.MsgType())
+        self.messagesSent.inc(msgType)
+        
         ## Message Type = 'j' - Business Message Reject
-        if self.getHeaderValue(message, fix.MsgType()) == fix.MsgType_BusinessMessageReject:
+        if msgType == fix.MsgType_BusinessMessageReject:
             self.onMessage_BusinessMessageReject(message, session)
         
         msg = message.toString().replace(__SOH__, "|")
         logfix.info("S toApp>> (%s)" % msg)
+        
+        self.latency.record(msgType, 'toApp', time.perf_counter_ns() - start)
 
     def fromApp(self, message, session):
         """
@@ -175,6 +302,21 @@ class Application(fix.Application):
         This will result in the counterparty getting a reject informing them your application cannot process those types of messages.
         An IncorrectTagValue can also be thrown if a field contains a value you do not support.
         """
+        
+        ## Latency: callback entry
+        msgType = self.getHeaderValue(message, fix.MsgType())
+        self.latency.begin(msgType)
+        self.messagesReceived.inc(msgType)
+        
+        ## Raw message to the recorder (written by its own thread)
+        if self.recorder is not None:
+            self.recorder.record(message.toString())
+        
+        ## Market data to the pipeline processes (decoded, logged and broadcast out of process)
+        if self.pipeline is not None and msgType == fix.MsgType_MarketDataSnapshotFullRefresh:
+            self.pipeline.publish(message.toString())
+            self.latency.end()
+            return
                 
         """
         COMMON MESSSAGES
@@ -239,6 +381,9 @@ class Application(fix.Application):
         ## Message Type = 'y' - Security List
         if self.getHeaderValue(message, fix.MsgType()) == fix.MsgType_SecurityList:     
             self.onMessage_SecurityList(message, session)
+        ## Message Type = 'BK' - Security List Update Report
+        if self.getHeaderValue(message, fix.MsgType()) == fix.MsgType_SecurityListUpdateReport:
+            self.onMessage_SecurityListUpdateReport(message, session)
         ## Message Type = 'f' - Security Status
         if self.getHeaderValue(message, fix.MsgType()) == fix.MsgType_SecurityStatus:
             self.onMessage_SecurityStatus(message, session)
@@ -247,6 +392,9 @@ class Application(fix.Application):
         ## Message Type = 'AE' - Trade Capture Report
         if self.getHeaderValue(message, fix.MsgType()) == fix.MsgType_TradeCaptureReport:        
             self.onMessage_TradeCaptureReport(message, session)
+        
+        ## Latency: callback exit
+        self.latency.end()
     
     """
     Response (onMessage)
@@ -271,6 +419,16 @@ class Application(fix.Application):
             print('TEST REQUEST:', text)
         except:
             print('HEARTBEAT')
+            return
+        
+        ## Round trip of a probe (send time in the TestReqID) or of another Test Request of ours
+        targetCompID = session.getTargetCompID().getValue()
+        rtt = self.rtt.onHeartbeat(targetCompID, text)
+        if rtt is None:
+            sent = self.testRequests.pop(text, None)
+            rtt = time.perf_counter_ns() - sent if sent is not None else None
+        if rtt is not None:
+            self.sessions[targetCompID]['rtt'] = rtt
             
     def onMessage_Reject(self, message, session):
         """
@@ -389,6 +547,8 @@ class Application(fix.Application):
         except:
             pass
         
+        self.tradingStatus.setSegmentStatus(session.getTargetCompID().getValue(), details['marketSegmentID'], self.getValue(message, fix.TradSesStatus()))
+        
         print(details)
         
     def onMessage_OrderCancelReject(self, message, session):
@@ -477,11 +637,14 @@ class Application(fix.Application):
                          }
         
         orderID = self.getValue(message, fix.OrderID())
+        details['account'] = self.getAccount(message)
+        
+        self.latency.mark('decode')
         
         data = {}
         data['type']  = 'or'
         data['senderCompID'] = senderCompID
-        data['orderReport'] = {'accountId'    : {'id' : self.account},
+        data['orderReport'] = {'accountId'    : {'id' : details['account']},
                                'clOrdId'      : details['clOrdId'],
                                'cumQty'       : details['cumQty'],
                                'execId'       : details['execId'],
@@ -504,8 +667,12 @@ class Application(fix.Application):
         
         print(self.orders)
         
-        ## Broadcast JSON to WebSocket
-        self.server_md.broadcast(str(data))
+        ## Handler work up to the broadcast (state update)
+        self.latency.mark('update')
+        
+        ## Broadcast JSON to WebSocket (socket enqueue and write times)
+        self.server_md.broadcast(str(data), account=details['account'], timed=True)
+        self.latency.mark('broadcast')
         
     def onMessage_ExecutionReport_OrderCanceledResponse(self, message, session):
         """
@@ -560,11 +727,14 @@ class Application(fix.Application):
                          }
         
         orderID = self.getValue(message, fix.OrderID())
+        details['account'] = self.getAccount(message)
+        
+        self.latency.mark('decode')
         
         data = {}
         data['type']  = 'or'
         data['senderCompID'] = senderCompID
-        data['orderReport'] = {'accountId'    : {'id' : self.account},
+        data['orderReport'] = {'accountId'    : {'id' : details['account']},
                                'avgPx'        : details['avgPx'],
                                'clOrdId'      : details['clOrdId'],
                                'origClOrdId'  : details['origClOrdId'],
@@ -591,8 +761,12 @@ class Application(fix.Application):
         
         print(self.orders)
         
-        ## Broadcast JSON to WebSocket
-        self.server_md.broadcast(str(data))
+        ## Handler work up to the broadcast (state update)
+        self.latency.mark('update')
+        
+        ## Broadcast JSON to WebSocket (socket enqueue and write times)
+        self.server_md.broadcast(str(data), account=details['account'], timed=True)
+        self.latency.mark('broadcast')
         
     def onMessage_ExecutionReport_OrderReplacedResponse(self, message, session):
         """
@@ -647,11 +821,14 @@ class Application(fix.Application):
                          }
         
         orderID = self.getValue(message, fix.OrderID())
+        details['account'] = self.getAccount(message)
+        
+        self.latency.mark('decode')
         
         data = {}
         data['type']  = 'or'
         data['senderCompID'] = senderCompID
-        data['orderReport'] = {'accountId'    : {'id' : self.account},
+        data['orderReport'] = {'accountId'    : {'id' : details['account']},
                                'avgPx'        : details['avgPx'],
                                'clOrdId'      : details['clOrdId'],
                                'origClOrdId'  : details['origClOrdId'],
@@ -678,8 +855,12 @@ class Application(fix.Application):
         
         print(self.orders)
         
-        ## Broadcast JSON to WebSocket
-        self.server_md.broadcast(str(data))
+        ## Handler work up to the broadcast (state update)
+        self.latency.mark('update')
+        
+        ## Broadcast JSON to WebSocket (socket enqueue and write times)
+        self.server_md.broadcast(str(data), account=details['account'], timed=True)
+        self.latency.mark('broadcast')
         
     def onMessage_ExecutionReport_OrderFilledPartiallyFilledResponse(self, message, session):
         """
@@ -734,11 +915,14 @@ class Application(fix.Application):
                          }
         
         orderID = self.getValue(message, fix.OrderID())
+        details['account'] = self.getAccount(message)
+        
+        self.latency.mark('decode')
         
         data = {}
         data['type']  = 'or'
         data['senderCompID'] = senderCompID
-        data['orderReport'] = {'accountId'    : {'id' : self.account},
+        data['orderReport'] = {'accountId'    : {'id' : details['account']},
                                'avgPx'        : details['avgPx'],
                                'clOrdId'      : details['clOrdId'],
                                'origClOrdId'  : details['origClOrdId'],
@@ -765,8 +949,12 @@ class Application(fix.Application):
         
         print(self.orders)
         
-        ## Broadcast JSON to WebSocket
-        self.server_md.broadcast(str(data))
+        ## Handler work up to the broadcast (state update)
+        self.latency.mark('update')
+        
+        ## Broadcast JSON to WebSocket (socket enqueue and write times)
+        self.server_md.broadcast(str(data), account=details['account'], timed=True)
+        self.latency.mark('broadcast')
         
     def onMessage_ExecutionReport_OrderStatusResponse(self, message, session):
         """
@@ -870,7 +1058,7 @@ class Application(fix.Application):
         print(data)
         
         ## Broadcast JSON to WebSocket
-        self.server_md.broadcast(str(data))
+        self.server_md.broadcast(str(data), account=details.get('account'))
         
     def onMessage_ExecutionReport_RejectMessageResponse(self, message, session):
         """
@@ -915,6 +1103,8 @@ class Application(fix.Application):
                          'text'             : self.getValue(message, fix.Text())
                          }
         
+        details['account'] = self.getAccount(message)
+        
         data = {}
         data['type']  = 'or'
         data['senderCompID'] = senderCompID
@@ -922,8 +1112,12 @@ class Application(fix.Application):
               
         print(data)
         
-        ## Broadcast JSON to WebSocket
-        self.server_md.broadcast(str(data))
+        ## Handler work up to the broadcast (state update)
+        self.latency.mark('update')
+        
+        ## Broadcast JSON to WebSocket (socket enqueue and write times)
+        self.server_md.broadcast(str(data), account=details['account'], timed=True)
+        self.latency.mark('broadcast')
         
     def onMessage_MarketDataSnapshotFullRefresh(self, message, session):
         """
@@ -973,11 +1167,7 @@ class Application(fix.Application):
         MDEntrySize = fix.MDEntrySize()
         MDEntryPositionNo = fix.MDEntryPositionNo() # Display position of a bid or offer, numbered from most competitive to least competitive
         
-        table = texttable.Texttable()
-        table.set_deco(texttable.Texttable.BORDER|texttable.Texttable.HEADER)
-        table.header(['Ticker','Tipo','Precio','Size','Posicion'])
-        table.set_cols_width([12,20,8,8,8])      
-        table.set_cols_align(['c','c','c','c','c'])
+        table = self.newTable(['Ticker','Tipo','Precio','Size','Posicion'], [12,20,8,8,8])
                 
         for entry in range(1,int(noMDEntries)+1):
             try:
@@ -1004,6 +1194,9 @@ class Application(fix.Application):
                 elif entry_type == '1':
                     data["marketData"]["OF"].append(md)
                     tipo = 'OFFER'
+                elif entry_type == '2':
+                    data["marketData"]["LA"] = md
+                    tipo = 'TRADE'
                 elif entry_type == 'B':
                     data["marketData"]["TV"] = md
                     tipo = 'TRADE VOLUME'
@@ -1013,11 +1206,79 @@ class Application(fix.Application):
                 table.add_row([symbol, tipo, price, size, position])
             except:
                 pass
+        
+        self.latency.mark('decode')
+        
+        ## Spread, mid, microprice, imbalances and depth weighted prices (once per update, for every consumer)
+        data["analytics"] = bookAnalytics(data["marketData"]["BI"], data["marketData"]["OF"])
+        
+        ## Local consumers see the book before the WebSocket broadcast
+        implied = self.updateMarketData(data)
             
         print(table.draw())
+        self.latency.mark('update')
         
-        ## Broadcast JSON to WebSocket
-        self.server_md.broadcast(str(data))
+        ## Broadcast JSON to WebSocket (socket enqueue and write times)
+        self.server_md.broadcast(str(data), timed=True)
+        self.latency.mark('broadcast')
+        
+        ## Synthetic instruments after the leg itself
+        if implied:
+            self.onImpliedPrices(implied)
+        
+    def updateMarketData(self, data):
+        """
+        Local consumers of a decoded book (Market Data handler): shared memory book and top of book consumers
+        
+        Return:
+            - list: synthetic instruments whose implied prices changed
+        """
+        symbol = data["instrumentId"]["symbol"]
+        bids, offers, trade = data["marketData"]["BI"], data["marketData"]["OF"], data["marketData"].get("LA", {})
+        
+        ## Shared memory book
+        self.books.update(symbol, bids, offers, data["analytics"])
+        
+        return self.updateTop(symbol, bids[0]['price'] if bids else None, bids[0]['size'] if bids else 0.0,
+                              offers[0]['price'] if offers else None, offers[0]['size'] if offers else 0.0,
+                              trade.get('price'), trade.get('size', 0.0), data["marketData"].get("TV", {}).get('size'))
+        
+    def updateTop(self, symbol, bidPx, bidSize, offerPx, offerSize, lastPx=None, lastSize=0.0, volume=None):
+        """
+        Top of book consumers: bars, top of book history, implied prices and option chains (None on a missing price)
+        
+        Return:
+            - list: synthetic instruments whose implied prices changed
+        """
+        ## Last trade to the bars (repeated by every snapshot: deduplicated with the trade volume)
+        if lastPx is not None:
+            self.bars.onTrade(symbol, lastPx, lastSize, volume)
+        
+        ## Top of book history (a row only when the top or the last trade changes)
+        self.topHistory.record(symbol, time.time_ns(),
+                               bidPx if bidPx is not None else float('nan'), bidSize,
+                               offerPx if offerPx is not None else float('nan'), offerSize,
+                               lastPx if lastPx is not None else float('nan'), lastSize)
+        
+        ## Implied prices of the curve of symbol (nothing when symbol is not a future of a curve)
+        implied = self.implied.onTop(symbol, bidPx, bidSize, offerPx, offerSize)
+        self.optionChains.onTop(symbol, bidPx, offerPx, lastPx)
+        return implied
+        
+    def onBooksSkip(self, symbol, reason):
+        """
+        Symbol left out of the shared memory books (BookWriter): the other consumers still get it
+        """
+        logfix.warning("Shared books skip >> (%s): %s" % (symbol, reason))
+        
+    def onPipelineTop(self, symbol, bidPx, bidSize, offerPx, offerSize, lastPx, lastSize, volume):
+        """
+        Top of a book decoded by the MarketDataPipeline (consumer thread): the book itself is broadcast and written
+        to the shared memory books by the fan-out
+        """
+        implied = self.updateTop(symbol, bidPx, bidSize, offerPx, offerSize, lastPx, lastSize, volume)
+        if implied:
+            self.onImpliedPrices(implied)
         
     def onMessage_MarketDataRequestReject(self, message, session):
         """
@@ -1036,6 +1297,9 @@ class Application(fix.Application):
         details = {'MDReqId'           : self.getValue(message, fix.MDReqID()),
                    'MDReqRejReason'    : self.getMDReqRejReason(self.getValue(message, fix.MDReqRejReason()))
                    }
+        
+        ## The streams of the request were never opened
+        details['symbols'] = self.subscriptions.rejected(details['MDReqId'])
          
         print(details)
         
@@ -1110,153 +1374,243 @@ class Application(fix.Application):
                    'securityListRequestType' : self.getValue(message, fix.SecurityListRequestType()),
                    'securityRequestResult'   : self.getValue(message, fix.SecurityRequestResult()),
                    'marketSegmentId'         : self.getValue(message, fix.MarketSegmentID()),
-                   'noRelatedSym'            : self.getValue(message, fix.NoRelatedSym())
+                   'noRelatedSym'            : self.getValue(message, fix.NoRelatedSym()),
+                   'venue'                   : session.getTargetCompID().getValue()
                   }
         
-        data = {}
-        data['details'] = details
-        data['tickers'] = []
-                
-        group = fix50.SecurityList().NoRelatedSym()
+        try:
+            lastFragment = self.getValue(message, fix.LastFragment())
+        except:
+            lastFragment = None
         
-        table = texttable.Texttable()
-        table.set_deco(texttable.Texttable.BORDER|texttable.Texttable.HEADER)
-        table.header(['Symbol','Min Price Increment','Tick Size','Price Precision','Size Precision','Currency',
-                      'Underlying','Low Limit Price','High Limit Price'])
-        table.set_cols_width([35,15,10,10,10,10,45,10,10])      
-        table.set_cols_align(['c','c','c','c','c','c','c','c','c'])
+        tickers = []
+        group = fix50.SecurityList().NoRelatedSym()
                 
         for relatedSym in range(1,details['noRelatedSym']+1):
             
             message.getGroup(relatedSym, group)
-                       
-            aux = {'symbol'                     : self.getValueGroup(group, fix.Symbol()),
-                   'factor'                     : self.getValueGroup(group, fix.Factor()),
-                   'securityDesc'               : self.getValueGroup(group, fix.SecurityDesc()),
-                   'cfiCode'                    : self.getValueGroup(group, fix.CFICode()),
-                   'contractMultiplier'         : self.getValueGroup(group, fix.ContractMultiplier()),      
-                   'minPriceIncrement'          : self.getValueGroup(group, fix.MinPriceIncrement()),
-                   'tickSize'                   : group.getField(5023),
-                   'instrumentPricePrecision'   : group.getField(5514),
-                   'instrumentSizePrecision'    : group.getField(7117),
-                   'currency'                   : self.getValueGroup(group, fix.Currency()),
-                   'maxTradeVol'                : self.getValueGroup(group, fix.MaxTradeVol()),
-                   'minTradeVol'                : self.getValueGroup(group, fix.MinTradeVol()),
-                   'lowLimitPrice'              : self.getValueGroup(group, fix.LowLimitPrice()),
-                   'highLimitPrice'             : self.getValueGroup(group, fix.HighLimitPrice())
-                   }          
-            try: 
-                aux['strikePrice'] = self.getValueGroup(group, fix.StrikePrice()) 
-            except: 
-                pass
-            try: 
-                aux['strikeCurrency'] = self.getValueGroup(group, fix.StrikeCurrency()) 
-            except: 
-                pass
-            try: 
-                aux['maturityMonthYear'] = self.getValueGroup(group, fix.MaturityMonthYear()) 
-            except: 
-                pass
-            try: 
-                aux['maturityDate'] = self.getValueGroup(group, fix.MaturityDate()) 
-            except: 
-                pass
-               
-            ## Block UndInstrmtGrp
-            groupUnderlyings = fix50.SecurityList().NoRelatedSym().NoUnderlyings()
+            aux = self.getInstrument(group)
+            aux['marketSegmentId'] = details['marketSegmentId']
+            aux['venue'] = session.getTargetCompID().getValue()
+            
+            tickers.append(aux)
+        
+        ## Instrument reference data (ingested fragment by fragment, only new or changed definitions written to the cache)
+        changed = [aux for aux in tickers if self.instruments.get(aux['symbol']) != aux]
+        for aux in changed:
+            self.instruments.add(aux)
+        if changed:
+            self.instrumentCache.upsert(changed)
+        
+        securityList = self.securityLists.ingest(details['securityReqId'], details, [aux['symbol'] for aux in tickers], lastFragment)
+        if securityList is None:
+            return
+        
+        self.onSecurityListComplete(securityList)
+        
+    def onSecurityListComplete(self, securityList):
+        """
+        Security List Complete
+        
+        Called once every fragment of a Security List response has been ingested.
+        Stamps the instrument cache and sends a single consolidated broadcast.
+        """
+        
+        self.instrumentCache.stamp(securityList['details']['venue'])
+        self.implied.load(self.instruments.values())
+        self.optionChains.load(self.instruments.values())
+        
+        details = dict(securityList['details'])
+        details['noRelatedSym'] = len(securityList['symbols'])
+        details['fragments'] = securityList['fragments']
+        
+        data = {}
+        data['details'] = details
+        data['tickers'] = [self.instruments[symbol] for symbol in securityList['symbols'] if symbol in self.instruments]
+        
+        logfix.info("Security List complete >> (%s): %s instruments in %s messages, %.3f s" % (securityList['securityReqId'], details['noRelatedSym'],
+                                                                                           details['fragments'], securityList['elapsed']))
+        
+        ## Broadcast JSON to WebSocket
+        self.server_md.broadcast(str(data))
+        
+    def onMessage_SecurityListUpdateReport(self, message, session):
+        """
+        onMessage - Security List Update Report
+        
+        Message Type = 'BK'.
+        The Security List Update Report is used to notify changes (add, delete or modify) in the instrument
+        definitions previously returned in a Security List.
+        
+        Fields:
+            - (35) - MsgType = BK
+            - (320) - SecurityReqID = (string)
+            - (322) - SecurityResponseID = (string)
+            - Block SecLstUpdRelSymGrp:
+                - (146) - NoRelatedSym = (Int - number of repeating symbols specified)
+                    - (1324) - ListUpdateAction = A (Add) / D (Delete) / M (Modify)
+                    - Block Instrument (same as Security List)
+        """
+        
+        noRelatedSym = self.getValue(message, fix.NoRelatedSym())
+        group = fix50.SecurityListUpdateReport().NoRelatedSym()
+        
+        updated, deleted = [], []
+        
+        for relatedSym in range(1,noRelatedSym+1):
+            
+            message.getGroup(relatedSym, group)
+            
             try:
-                noUnderlyings = group.getField(711)
-                for underlying in range(1,int(noUnderlyings)+1):
-                    group.getGroup(underlying, groupUnderlyings)
-                    try:
-                        aux['underlyingSymbol'] = self.getValueGroup(groupUnderlyings, fix.UnderlyingSymbol()).encode(sys.getfilesystemencoding(), 'surrogateescape').decode('latin1','replace')
-                    except:
-                        pass
+                action = self.getValueGroup(group, fix.ListUpdateAction())
             except:
-                pass
+                action = fix.ListUpdateAction_MODIFY
             
-            ## Block LotTypeRules
-            groupLotTypeRules = fix50.SecurityList().NoRelatedSym().NoLotTypeRules()
-            try:
-                noLotTypeRules = group.getField(1234)
-                for typeRule in range(1,int(noLotTypeRules)+1):
-                    group.getGroup(typeRule, groupLotTypeRules)
+            if action == fix.ListUpdateAction_DELETE:
+                symbol = self.getValueGroup(group, fix.Symbol())
+                self.instruments.remove(symbol)
+                deleted.append(symbol)
+            else:
+                aux = self.getInstrument(group, fix50.SecurityListUpdateReport)
+                aux['venue'] = session.getTargetCompID().getValue()
+                if aux['symbol'] in self.instruments:
+                    aux.setdefault('marketSegmentId', self.instruments[aux['symbol']].get('marketSegmentId'))
+                self.instruments.add(aux)
+                updated.append(aux)
+        
+        if updated:
+            self.instrumentCache.upsert(updated)
+        if deleted:
+            self.instrumentCache.delete(deleted)
+        self.implied.load(self.instruments.values())
+        self.optionChains.load(self.instruments.values())
+        
+        logfix.info("Security List Update >> (%s updated, %s deleted)" % (len(updated), len(deleted)))
+        
+    def getInstrument(self, group, msgClass=fix50.SecurityList):
+        """
+        Instrument definition of one NoRelatedSym entry (Security List / Security List Update Report)
+        """
+        
+        aux = {'symbol'                     : self.getValueGroup(group, fix.Symbol()),
+               'factor'                     : self.getValueGroup(group, fix.Factor()),
+               'securityDesc'               : self.getValueGroup(group, fix.SecurityDesc()),
+               'cfiCode'                    : self.getValueGroup(group, fix.CFICode()),
+               'contractMultiplier'         : self.getValueGroup(group, fix.ContractMultiplier()),      
+               'minPriceIncrement'          : self.getValueGroup(group, fix.MinPriceIncrement()),
+               'tickSize'                   : group.getField(5023),
+               'instrumentPricePrecision'   : group.getField(5514),
+               'instrumentSizePrecision'    : group.getField(7117),
+               'currency'                   : self.getValueGroup(group, fix.Currency()),
+               'maxTradeVol'                : self.getValueGroup(group, fix.MaxTradeVol()),
+               'minTradeVol'                : self.getValueGroup(group, fix.MinTradeVol()),
+               'lowLimitPrice'              : self.getValueGroup(group, fix.LowLimitPrice()),
+               'highLimitPrice'             : self.getValueGroup(group, fix.HighLimitPrice())
+               }          
+        try: 
+            aux['strikePrice'] = self.getValueGroup(group, fix.StrikePrice()) 
+        except: 
+            pass
+        try: 
+            aux['strikeCurrency'] = self.getValueGroup(group, fix.StrikeCurrency()) 
+        except: 
+            pass
+        try: 
+            aux['maturityMonthYear'] = self.getValueGroup(group, fix.MaturityMonthYear()) 
+        except: 
+            pass
+        try: 
+            aux['maturityDate'] = self.getValueGroup(group, fix.MaturityDate()) 
+        except: 
+            pass
+           
+        ## Block UndInstrmtGrp
+        groupUnderlyings = msgClass.NoRelatedSym.NoUnderlyings()
+        try:
+            noUnderlyings = group.getField(711)
+            for underlying in range(1,int(noUnderlyings)+1):
+                group.getGroup(underlying, groupUnderlyings)
+                try:
+                    aux['underlyingSymbol'] = self.getValueGroup(groupUnderlyings, fix.UnderlyingSymbol()).encode(sys.getfilesystemencoding(), 'surrogateescape').decode('latin1','replace')
+                except:
+                    pass
+        except:
+            pass
+        
+        ## Block LotTypeRules
+        groupLotTypeRules = msgClass.NoRelatedSym.NoLotTypeRules()
+        try:
+            noLotTypeRules = group.getField(1234)
+            for typeRule in range(1,int(noLotTypeRules)+1):
+                group.getGroup(typeRule, groupLotTypeRules)
+                try:
+                    aux['lotType'] = self.getValueGroup(groupLotTypeRules, fix.LotType())
+                    aux['minLotSize'] = self.getValueGroup(groupLotTypeRules, fix.MinLotSize())
+                    aux['maxLotSize'] = groupLotTypeRules.getField(5515)
+                except:
+                    pass
+        except:
+            pass
+        
+        ## Block TradingSessionRulesGrp
+        groupTradingSessionRules = msgClass.NoRelatedSym.NoTradingSessionRules()
+        try:
+            noTradingSessionRules = group.getField(1309)
+            for sessionRule in range(1,int(noTradingSessionRules)+1):
+                group.getGroup(sessionRule, groupTradingSessionRules)
+                try:
+                    aux['tradingSessionId'] = self.getValueGroup(groupTradingSessionRules, fix.TradingSessionID())
+                    
+                    ## Block TradingSessionRules
+                        
+                    ### Block OrdTypeRules
+                    groupOrdTypeRules = msgClass.NoRelatedSym.NoTradingSessionRules.NoOrdTypeRules()
                     try:
-                        aux['lotType'] = self.getValueGroup(groupLotTypeRules, fix.LotType())
-                        aux['minLotSize'] = self.getValueGroup(groupLotTypeRules, fix.MinLotSize())
-                        aux['maxLotSize'] = groupLotTypeRules.getField(5515)
+                        noOrdTypeRules = groupTradingSessionRules.getField(1237)
+                        aux['ordType'] = []
+                        for typeRule in range(1,int(noOrdTypeRules)+1):
+                            groupTradingSessionRules.getGroup(typeRule, groupOrdTypeRules)
+                            try:
+                                aux['ordType'].append(self.getOrdType(self.getValueGroup(groupOrdTypeRules, fix.OrdType())))
+                            except:
+                                pass
                     except:
-                        pass
-            except:
-                pass
-            
-            ## Block TradingSessionRulesGrp
-            groupTradingSessionRules = fix50.SecurityList().NoRelatedSym().NoTradingSessionRules()
-            try:
-                noTradingSessionRules = group.getField(1309)
-                for sessionRule in range(1,int(noTradingSessionRules)+1):
-                    group.getGroup(sessionRule, groupTradingSessionRules)
+                        pass 
+                    
+                    ### Block TimeInForceRules
+                    groupTimeInForceRules = msgClass.NoRelatedSym.NoTradingSessionRules.NoTimeInForceRules()
                     try:
-                        aux['tradingSessionId'] = self.getValueGroup(groupTradingSessionRules, fix.TradingSessionID())
-                        
-                        ## Block TradingSessionRules
-                            
-                        ### Block OrdTypeRules
-                        groupOrdTypeRules = fix50.SecurityList().NoRelatedSym().NoTradingSessionRules().NoOrdTypeRules()
-                        try:
-                            noOrdTypeRules = groupTradingSessionRules.getField(1237)
-                            aux['ordType'] = []
-                            for typeRule in range(1,int(noOrdTypeRules)+1):
-                                groupTradingSessionRules.getGroup(typeRule, groupOrdTypeRules)
-                                try:
-                                    aux['ordType'].append(self.getOrdType(self.getValueGroup(groupOrdTypeRules, fix.OrdType())))
-                                except:
-                                    pass
-                        except:
-                            pass 
-                        
-                        ### Block TimeInForceRules
-                        groupTimeInForceRules = fix50.SecurityList().NoRelatedSym().NoTradingSessionRules().NoTimeInForceRules()
-                        try:
-                            noTimeInForceRules = groupTradingSessionRules.getField(1239)
-                            aux['timeInForce'] = []
-                            for forceRule in range(1,int(noTimeInForceRules)+1):
-                                groupTradingSessionRules.getGroup(forceRule, groupTimeInForceRules)
-                                try:
-                                    aux['timeInForce'].append(self.getTimeInForce(self.getValueGroup(groupTimeInForceRules, fix.TimeInForce())))
-                                except:
-                                    pass
-                        except:
-                            pass
-                        
-                        ### Block ExecInstRules
-                        groupExecInstRules = fix50.SecurityList().NoRelatedSym().NoTradingSessionRules().NoExecInstRules()
-                        try:
-                            noExecInstRules = groupTradingSessionRules.getField(1232)
-                            aux['execInstValue'] = []
-                            for instRule in range(1,int(noExecInstRules)+1):
-                                groupTradingSessionRules.getGroup(instRule, groupExecInstRules)
-                                try:
-                                    aux['execInstValue'].append(self.getExecInstValue(self.getValueGroup(groupExecInstRules, fix.ExecInstValue())))
-                                except:
-                                    pass
-                        except:
-                            pass                            
-                            
+                        noTimeInForceRules = groupTradingSessionRules.getField(1239)
+                        aux['timeInForce'] = []
+                        for forceRule in range(1,int(noTimeInForceRules)+1):
+                            groupTradingSessionRules.getGroup(forceRule, groupTimeInForceRules)
+                            try:
+                                aux['timeInForce'].append(self.getTimeInForce(self.getValueGroup(groupTimeInForceRules, fix.TimeInForce())))
+                            except:
+                                pass
                     except:
                         pass
-            except:
-                pass
-            
-            data['tickers'].append(aux)
-
-            table.add_row([aux['symbol'],aux['minPriceIncrement'],aux['tickSize'],aux['instrumentPricePrecision'],aux['instrumentSizePrecision'],aux['currency'],
-                           aux['underlyingSymbol'],aux['lowLimitPrice'],aux['highLimitPrice']])
+                    
+                    ### Block ExecInstRules
+                    groupExecInstRules = msgClass.NoRelatedSym.NoTradingSessionRules.NoExecInstRules()
+                    try:
+                        noExecInstRules = groupTradingSessionRules.getField(1232)
+                        aux['execInstValue'] = []
+                        for instRule in range(1,int(noExecInstRules)+1):
+                            groupTradingSessionRules.getGroup(instRule, groupExecInstRules)
+                            try:
+                                aux['execInstValue'].append(self.getExecInstValue(self.getValueGroup(groupExecInstRules, fix.ExecInstValue())))
+                            except:
+                                pass
+                    except:
+                        pass                            
+                        
+                except:
+                    pass
+        except:
+            pass
             
-        print(table.draw())
-        
-        ## Broadcast JSON to WebSocket
-        self.server_md.broadcast(str(data))
+        return aux
         
     def onMessage_SecurityStatus(self, message, session):
         """
@@ -1274,15 +1628,14 @@ class Application(fix.Application):
             - (326) - SecurityTradingStatus = (int)
         """
         
+        securityTradingStatus = self.getValue(message, fix.SecurityTradingStatus())
         details = {'symbol'                   : self.getValue(message, fix.Symbol()),
-                   'securityTradingStatus'    : self.getSecurityTradingStatus(self.getValue(message, fix.SecurityTradingStatus()))
+                   'securityTradingStatus'    : self.getSecurityTradingStatus(securityTradingStatus)
                    }
         
-        table = texttable.Texttable()
-        table.set_deco(texttable.Texttable.BORDER|texttable.Texttable.HEADER)
-        table.header(['Symbol','Trading Status'])
-        table.set_cols_width([35,20])      
-        table.set_cols_align(['c','c'])
+        self.tradingStatus.setSymbolStatus(session.getTargetCompID().getValue(), details['symbol'], securityTradingStatus)
+        
+        table = self.newTable(['Symbol','Trading Status'], [35,20])
         
         table.add_row([details['symbol'], details['securityTradingStatus']])
         print(table.draw())       
@@ -1355,6 +1708,8 @@ class Application(fix.Application):
         noSides                 = self.getValue(message, fix.NoSides())
         group                   = fix50.TradeCaptureReport().NoSides()        
                 
+        transactTime            = parseTransactTime(details['transactTime'])
+        
         for side in range(1,noSides+1):
             message.getGroup(side, group)
             
@@ -1389,18 +1744,265 @@ class Application(fix.Application):
             
             details['sides'].append(aux)
             
+        self.tradeJournal.append(tradeReportID, tradeRequestID, transactTime, details['transactTime'], details)
+        self.storeTradeReport(tradeReportID, details, transactTime)
+            
         if tradeRequestID not in self.tradeReports:
             self.tradeReports[tradeRequestID] = {'totNumTradeReports' : totNumTradeReports,
-                                                 'reports'            : {}                    
+                                                 'received'           : 0
                                                  }
         
-        self.tradeReports[tradeRequestID]['reports'][tradeReportID] = details
+        self.tradeReports[tradeRequestID]['received'] += 1
         
         if lastRptRequested:
-            print(self.tradeReports)
+            print({'tradeRequestId'     : tradeRequestID,
+                   'totNumTradeReports' : totNumTradeReports,
+                   'volumeBySymbol'     : self.tradeStore.volumeBySymbol(),
+                   'vwapBySymbol'       : self.tradeStore.vwapBySymbol()
+                   })
+            
+    def storeTradeReport(self, tradeReportID, details, transactTime):
+        """
+        Append a trade capture report to the Trade Store (one row per side)
+        """
+        
+        for aux in details['sides']:
+            self.tradeStore.append(details['lastPx'], details['lastQty'], 1 if aux['side'] == 'Buy' else -1, details['symbol'],
+                                   transactTime, aux['account'], (tradeReportID, aux['side']))
+            
+    def getTradeAnalytics(self, account=None):
+        """
+        Trade Analytics (Trade Store)
+        
+        VWAP and volume by symbol, volume by account and realized P&L (contract multiplier from the instrument registry).
+        """
+        
+        multipliers = {symbol : self.instruments[symbol].get('contractMultiplier') for symbol in self.tradeStore.symbols if symbol in self.instruments}
+        pnl = [dict(value, account=key[0], symbol=key[1]) for key, value in self.tradeStore.realizedPnl(multipliers).items()
+               if account is None or key[0] == account]
+        
+        return {'trades'          : len(self.tradeStore),
+                'vwapBySymbol'    : self.tradeStore.vwapBySymbol(),
+                'volumeBySymbol'  : self.tradeStore.volumeBySymbol(),
+                'volumeByAccount' : self.tradeStore.volumeByAccount(),
+                'realizedPnl'     : pnl
+                }
+
+    def getOrderAccount(self, orderId):
+        """
+        Account of a known order (default account if unknown)
+        """
+        order = self.orders.get(orderId)
+        return order.get('account', self.account) if order is not None else self.account
+    
+    def getOrders(self, account=None):
+        """
+        Orders of the order store (all the accounts or one)
+        
+        Return:
+            - dict: orderId -> details
+        """
+        return {orderId : dict(details) for orderId, details in list(self.orders.items())
+                if account is None or details.get('account', self.account) == account}
+    
+    def getPositions(self, account=None):
+        """
+        Net positions by account and symbol (Trade Store)
+        
+        Return:
+            - list: {'account', 'symbol', 'position', 'bought', 'sold', 'avgBuy', 'avgSell', 'realized'}
+        """
+        multipliers = {symbol : self.instruments[symbol].get('contractMultiplier') for symbol in self.tradeStore.symbols if symbol in self.instruments}
+        return [dict(value, account=key[0], symbol=key[1], position=value['bought'] - value['sold'])
+                for key, value in self.tradeStore.realizedPnl(multipliers).items()
+                if account is None or key[0] == account]
                         
-    def logout(self):
-        fix.Session.lookupSession(self.sessions[self.targetCompID]['session']).logout()
+    def requestInstruments(self, venue=None):
+        """
+        Instrument reference data of a venue
+        
+        Keep serving the cached instruments when the venue was downloaded today; otherwise drop the venue
+        instruments (registry and cache rows, so delisted ones do not come back) before the full download.
+        Either way request all securities subscribed on every logon, so further changes arrive as Security List
+        Update Reports: FIX has no updates only subscription, the snapshot of a valid cache only writes the
+        definitions that changed.
+        """
+        
+        venue = self.getVenue(venue=venue)
+        symbols = [instrument['symbol'] for instrument in self.instruments.values() if instrument.get('venue') == venue]
+        
+        if self.instrumentCache.isValid(venue):
+            logfix.info("Instruments up to date >> (%s): %s" % (venue, len(symbols)))
+        else:
+            for symbol in symbols:
+                self.instruments.remove(symbol)
+            self.instrumentCache.clear(venue)
+        self.securityListRequest(subscription=fix.SubscriptionRequestType_SNAPSHOT_PLUS_UPDATES, venue=venue)
+        
+    def canTrade(self, symbol, venue=None):
+        """
+        Trading status check of symbol (and its market segment) on the venue it is routed to
+        
+        Return:
+            - tuple: (bool, reason)
+        """
+        instrument = self.instruments.get(symbol)
+        segment = instrument.get('marketSegmentId') if instrument is not None else None
+        return self.tradingStatus.canTrade(self.getVenue(symbol, venue), symbol, segment)
+        
+    def onLocalReject(self, details, reason):
+        """
+        Order rejected locally (not sent to the exchange)
+        
+        Broadcast with the same layout as an Execution Report - Rejected.
+        """
+        
+        details = dict(details)
+        details['ordStatus'] = 'REJECTED'
+        details['text'] = reason
+        
+        data = {}
+        data['type']  = 'or'
+        data['senderCompID'] = self.getCredentials(self.getVenue(details.get('symbol')))['senderCompID']
+        data['orderReport'] = details
+        
+        logfix.warning("Local Reject >> (%s)" % details)
+        
+        ## Broadcast JSON to WebSocket
+        self.server_md.broadcast(str(data), account=details.get('account'))
+        
+    def setupMetrics(self):
+        """
+        Register the Prometheus metrics (rofex_*)
+        """
+        self.metrics = MetricsRegistry('rofex_')
+        self.messagesReceived = self.metrics.counter('fix_messages_received_total', 'FIX messages received by MsgType', ('msgType',))
+        self.messagesSent = self.metrics.counter('fix_messages_sent_total', 'FIX messages sent by MsgType', ('msgType',))
+        
+        self.metrics.gauge('websocket_clients', 'Connected WebSocket clients', self.server_md.clientCount)
+        self.metrics.gauge('websocket_send_queue_depth', 'Frames waiting in the send queue of each WebSocket client',
+                           self.server_md.queueDepths, ('client',))
+        self.metrics.gauge('orders', 'Orders in the order store', lambda: len(getattr(self, 'orders', {})))
+        self.metrics.gauge('pending_requests', 'Requests waiting for the rest of their responses', self.getPendingRequests, ('request',))
+        self.metrics.gauge('heartbeat_rtt_seconds', 'Round trip of the last Test Request / Heartbeat',
+                           lambda: {targetCompID : session['rtt'] / 1e9 if session['rtt'] is not None else None
+                                    for targetCompID, session in getattr(self, 'sessions', {}).items()}, ('session',))
+        self.metrics.gauge('heartbeat_rtt_p99_seconds', 'p99 of the Test Request probe round trips (rolling window)',
+                           lambda: {targetCompID : stats['p99'] / 1e9 if 'p99' in stats else None
+                                    for targetCompID, stats in self.rtt.stats().items()}, ('session',))
+        self.metrics.gauge('session_connected', 'FIX session logged on (1) or not (0)',
+                           lambda: {targetCompID : session['connected'] for targetCompID, session in getattr(self, 'sessions', {}).items()}, ('session',))
+        if self.pipeline is not None:
+            self.metrics.gauge('md_pipeline_ring_usage', 'Used fraction of the input ring of each market data decoder',
+                               lambda: {str(index) : stats['input'] for index, stats in self.pipeline.stats().items()}, ('decoder',))
+            self.metrics.gauge('md_pipeline_dropped', 'Market data messages dropped on a full ring',
+                               lambda: {str(index) : stats['dropped'] for index, stats in self.pipeline.stats().items()}, ('decoder',))
+        
+    def getPendingRequests(self):
+        tradeReports = getattr(self, 'tradeReports', {})
+        return {'securityList'  : len(self.securityLists.pending()),
+                'tradeCapture'  : sum(1 for report in list(tradeReports.values()) if report['received'] < report['totNumTradeReports']),
+                'testRequest'   : len(self.testRequests)
+                }
+        
+    def onBarClose(self, symbol, interval, bar):
+        """
+        Bar closed (BarAggregator): broadcast
+        """
+        data = {}
+        data['type']  = 'bar'
+        data['instrumentId'] = {'symbol' : symbol, 'marketId' : self.getVenue(symbol)}
+        data['bar'] = bar
+        
+        ## Broadcast JSON to WebSocket
+        self.server_md.broadcast(str(data))
+        
+    def onImpliedPrices(self, instruments):
+        """
+        Implied prices changed (ImpliedEngine): broadcast the synthetic instruments
+        """
+        data = {}
+        data['type']  = 'implied'
+        data['instruments'] = instruments
+        
+        ## Broadcast JSON to WebSocket
+        self.server_md.broadcast(str(data))
+        
+    def onOptionChain(self, chain):
+        """
+        Option chain recomputed (OptionChainEngine clock): broadcast IV and greeks of the chain
+        """
+        data = {}
+        data['type']  = 'optionChain'
+        data['chain'] = chain
+        
+        ## Broadcast JSON to WebSocket
+        self.server_md.broadcast(str(data))
+        
+    def onRttAlert(self, targetCompID, kind, rtt, stats):
+        """
+        RTT alert (threshold breach or unanswered probe): log and broadcast
+        """
+        details = {'session' : targetCompID,
+                   'kind'    : kind,
+                   'rtt'     : rtt,
+                   'stats'   : stats
+                   }
+        
+        data = {}
+        data['type']  = 'alert'
+        data['alert'] = 'rtt'
+        data['details'] = details
+        
+        logfix.warning("RTT Alert >> (%s)" % details)
+        
+        ## Broadcast JSON to WebSocket
+        self.server_md.broadcast(str(data))
+        
+    def getConnectedVenues(self):
+        return [targetCompID for targetCompID, session in list(getattr(self, 'sessions', {}).items()) if session['connected']]
+        
+    def logout(self, venue=None):
+        """
+        Logout of a venue (default: every connected venue)
+        """
+        for targetCompID, session in self.sessions.items():
+            if (venue is None and session['connected']) or targetCompID == venue:
+                fix.Session.lookupSession(session['session']).logout()
+        
+    """
+    Venues
+    """
+    
+    def addVenue(self, target, sender, password):
+        """
+        Register the credentials of a venue (TargetCompID)
+        """
+        self.venues[target] = {'senderCompID' : sender,
+                               'password'     : password
+                               }
+        
+    def getCredentials(self, venue):
+        """
+        Credentials of a venue (default venue credentials if not registered)
+        """
+        return self.venues.get(venue, self.venues[self.targetCompID])
+        
+    def getVenue(self, symbol=None, venue=None):
+        """
+        Routing: explicit venue, then the venue that listed the instrument, then the default venue
+        """
+        if venue is not None:
+            return venue
+        instrument = self.instruments.get(symbol) if symbol is not None else None
+        if instrument is not None and instrument.get('venue'):
+            return instrument['venue']
+        return self.targetCompID
+    
+    def setHeader(self, msg, venue):
+        header = msg.getHeader()
+        header.setField(fix.SenderCompID(self.getCredentials(venue)['senderCompID']))
+        header.setField(fix.TargetCompID(venue))
         
     """
     Wrappers for get(Field)
@@ -1426,6 +2028,15 @@ class Application(fix.Application):
         message.getTrailer().getField(key)
         return key.getValue() 
     
+    def getAccount(self, message):
+        """
+        (1) Account of a message (default account if not present)
+        """
+        try:
+            return self.getValue(message, fix.Account())
+        except:
+            return self.account
+    
     def getStringGroup(self, group, field):
         key = field
         group.getField(key)
@@ -1440,9 +2051,25 @@ class Application(fix.Application):
     Wrappers for Next Field
     """
     
-    def getNextOrderID(self):
-        lastOrderID = int(self.lastOrderID.split('-')[1]) + 1
-        self.lastOrderID = self.account + '-' + str(lastOrderID).zfill(8)
+    def newTable(self, header, widths):
+        """
+        Console table (texttable is imported on the first table, not at startup)
+        """
+        import texttable
+        table = texttable.Texttable()
+        table.set_deco(texttable.Texttable.BORDER|texttable.Texttable.HEADER)
+        table.header(header)
+        table.set_cols_width(widths)
+        table.set_cols_align(['c'] * len(header))
+        return table
+        
+    def getNextOrderID(self, account=None):
+        """
+        Next ClOrdID of an account: '<account>-<8 digits>' (one sequence per account)
+        """
+        account = account or self.account
+        self.orderIDs[account] = self.orderIDs.get(account, 0) + 1
+        self.lastOrderID = account + '-' + str(self.orderIDs[account]).zfill(8)
         return self.lastOrderID
 
     def getNextExecID(self, targetCompID):
@@ -1575,7 +2202,7 @@ class Application(fix.Application):
     Messages
     """
     
-    def testRequest(self, message):
+    def testRequest(self, message, venue=None):
         """
         Test Request
                 
@@ -1584,12 +2211,14 @@ class Application(fix.Application):
         checks sequence numbers or verifies communication line status. The opposite application responds to 
         the Test Request with a Heartbeat containing the TestReqID.
         """
-        msg=self.buildMsgHeader("1")
+        msg=self.buildMsgHeader("1", venue)
         msg.setField(fix.TestReqID(str(message)))
         
+        if not str(message).startswith(RTT_PREFIX):
+            self.testRequests[str(message)] = time.perf_counter_ns()
         fix.Session.sendToTarget(msg)        
 
-    def buildMsgHeader(self, msgType):
+    def buildMsgHeader(self, msgType, venue=None):
         """
         Message Header Builder
         """
@@ -1597,11 +2226,10 @@ class Application(fix.Application):
         header = msg.getHeader()
         header.setField(fix.BeginString(fix.BeginString_FIXT11))
         header.setField(fix.MsgType(msgType))
-        header.setField(fix.SenderCompID(self.senderCompID))
-        header.setField(fix.TargetCompID(self.targetCompID))
+        self.setHeader(msg, self.getVenue(venue=venue))
         return self.msg
     
-    def newOrderSingle(self, symbol, side, quantity, price, orderType):
+    def newOrderSingle(self, symbol, side, quantity, price, orderType, venue=None, account=None):
         """
         New Order - Single
         
@@ -1616,6 +2244,8 @@ class Application(fix.Application):
             - quantity: int
             - price: float
             - orderType: char
+            - venue: string (default: venue of the symbol, else the default venue)
+            - account: string (default: the session account)
         
         Fields:
             - Header Group:
@@ -1634,27 +2264,37 @@ class Application(fix.Application):
             - (60) TransactTime = UTC Timestamp     
             - (55) Symbol = (string)            
             - (10) CheckSum = (string(3))       
+        
+        Return:
+            - ClOrdID (string) or None if rejected locally (symbol or segment not trading)
         """
         
-        clOrdId = self.getNextOrderID()
-        details = {'clOrdId'  : clOrdId,
-                   'symbol'   : symbol,
+        details = {'symbol'   : symbol,
                    'side'     : side,
                    'quantity' : quantity,
                    'price'    : price,
-                   'ordType'  : orderType                   
+                   'ordType'  : orderType,
+                   'account'  : account or self.account
                    }
         
+        tradable, reason = self.canTrade(symbol, venue)
+        if not tradable:
+            self.onLocalReject(details, reason)
+            return None
+        
+        clOrdId = self.getNextOrderID(details['account'])
+        details['clOrdId'] = clOrdId
+        
         # ---- Header
         
+        venue = self.getVenue(symbol, venue)
+        
         msg = fix50.NewOrderSingle()        
-        header = msg.getHeader()
-        header.setField(fix.SenderCompID(self.senderCompID))
-        header.setField(fix.TargetCompID(self.targetCompID))
+        self.setHeader(msg, venue)
         
         # ---- Body
         
-        msg.setField(fix.Account(self.account))
+        msg.setField(fix.Account(details['account']))
         msg.setField(fix.ClOrdID(str(details['clOrdId'])))
         msg.setField(fix.OrderQty(details['quantity']))
         msg.setField(fix.OrdType(details['ordType']))
@@ -1665,7 +2305,9 @@ class Application(fix.Application):
         
         fix.Session.sendToTarget(msg)
         
-    def orderCancelRequest(self, orderId, side, quantity, symbol):
+        return clOrdId
+        
+    def orderCancelRequest(self, orderId, side, quantity, symbol, venue=None, account=None):
         """
         Order Cancel Request
         
@@ -1683,6 +2325,8 @@ class Application(fix.Application):
             - symbol: string
             - side: char
             - quantity: int
+            - venue: string (default: venue of the symbol, else the default venue)
+            - account: string (default: account of the order)
         
         Fields:
             - Header Group:
@@ -1702,20 +2346,22 @@ class Application(fix.Application):
             - (10) CheckSum = (string(3))       
         """
         
-        clOrdId = self.getNextOrderID()
+        account = account or self.getOrderAccount(orderId)
+        clOrdId = self.getNextOrderID(account)
         details = {'clOrdId'  : clOrdId,
                    'symbol'   : symbol,
                    'side'     : side,
                    'quantity' : quantity ,
-                   'orderId'  : orderId
+                   'orderId'  : orderId,
+                   'account'  : account
                    }
        
         # ---- Header
         
+        venue = self.getVenue(symbol, venue)
+        
         msg = fix50.OrderCancelRequest()
-        header = msg.getHeader()
-        header.setField(fix.SenderCompID(self.senderCompID))
-        header.setField(fix.TargetCompID(self.targetCompID))
+        self.setHeader(msg, venue)
         
         # ---- Body
         
@@ -1723,14 +2369,14 @@ class Application(fix.Application):
         msg.setField(fix.OrderID(str(details['orderId'])))
         msg.setField(fix.Side(details['side']))
         msg.setField(fix.TransactTime())
-        msg.setField(fix.Account(self.account))
+        msg.setField(fix.Account(details['account']))
         msg.setField(fix.OrderQty(details['quantity']))
         msg.setField(fix.Symbol(details['symbol']))
-        msg.setField(fix.SecurityExchange(self.targetCompID))
+        msg.setField(fix.SecurityExchange(venue))
         
         fix.Session.sendToTarget(msg)
                 
-    def orderCancelReplaceRequest(self, orderId, origClOrdId, side, symbol, orderType, quantity=None, price=None):
+    def orderCancelReplaceRequest(self, orderId, origClOrdId, side, symbol, orderType, quantity=None, price=None, venue=None, account=None):
         """
         Order Cancel/Replace Request
         
@@ -1754,6 +2400,8 @@ class Application(fix.Application):
             - orderType: char
             - quantity: int
             - price: float
+            - venue: string (default: venue of the symbol, else the default venue)
+            - account: string (default: account of the order)
         
         Fields:
             - Header Group:
@@ -1776,8 +2424,17 @@ class Application(fix.Application):
             - (10) CheckSum = (string(3))       
         """
         
-        clOrdId = self.getNextOrderID()
+        account = account or self.getOrderAccount(orderId)
+        
+        tradable, reason = self.canTrade(symbol, venue)
+        if not tradable:
+            self.onLocalReject({'origClOrdId' : origClOrdId, 'orderId' : orderId, 'symbol' : symbol, 'side' : side,
+                                'quantity' : quantity, 'price' : price, 'ordType' : orderType, 'account' : account}, reason)
+            return None
+        
+        clOrdId = self.getNextOrderID(account)
         details = {'clOrdId'        : clOrdId,
+                   'account'        : account,
                    'origClOrdId'    : origClOrdId,
                    'symbol'         : symbol,
                    'side'           : side,
@@ -1789,14 +2446,14 @@ class Application(fix.Application):
         
         # ---- Header
         
+        venue = self.getVenue(symbol, venue)
+        
         msg = fix50.OrderCancelReplaceRequest()
-        header = msg.getHeader()
-        header.setField(fix.SenderCompID(self.senderCompID))
-        header.setField(fix.TargetCompID(self.targetCompID))
+        self.setHeader(msg, venue)
         
         # ---- Body
         
-        msg.setField(fix.Account(self.account))
+        msg.setField(fix.Account(details['account']))
         msg.setField(fix.ClOrdID(str(details['clOrdId'])))
         msg.setField(fix.OrderID(str(details['orderId'])))
         msg.setField(fix.OrdType(details['ordType']))
@@ -1810,8 +2467,10 @@ class Application(fix.Application):
             msg.setField(fix.OrderQty(int(details['quantity'])))        
             
         fix.Session.sendToTarget(msg)
+        
+        return clOrdId
                 
-    def orderStatusRequest(self, orderId, symbol, side):
+    def orderStatusRequest(self, orderId, symbol, side, venue=None):
         """
         Order Status Request
         
@@ -1823,6 +2482,7 @@ class Application(fix.Application):
             - orderId: string
             - symbol: string
             - side: char
+            - venue: string (default: venue of the symbol, else the default venue)
         
         Fields:
             - Header Group:
@@ -1845,10 +2505,10 @@ class Application(fix.Application):
         
         # ---- Header
         
+        venue = self.getVenue(symbol, venue)
+        
         msg = fix50.OrderStatusRequest()
-        header = msg.getHeader()
-        header.setField(fix.SenderCompID(self.senderCompID))
-        header.setField(fix.TargetCompID(self.targetCompID))
+        self.setHeader(msg, venue)
         
         # ---- Body
         
@@ -1858,7 +2518,7 @@ class Application(fix.Application):
         
         fix.Session.sendToTarget(msg)    
     
-    def orderMassStatusRequest(self, securityStatus):        
+    def orderMassStatusRequest(self, securityStatus, venue=None):        
         """
         Order Mass Status Request
         
@@ -1867,6 +2527,7 @@ class Application(fix.Application):
         
         Arguments:
             - securityStatus: string
+            - venue: string (default: the default venue)
         
         Fields:
             - Header Group:
@@ -1884,10 +2545,10 @@ class Application(fix.Application):
         
         # ---- Header
         
+        venue = self.getVenue(venue=venue)
+        
         msg = fix50.OrderMassStatusRequest()
-        header = msg.getHeader()
-        header.setField(fix.SenderCompID(self.senderCompID))
-        header.setField(fix.TargetCompID(self.targetCompID))
+        self.setHeader(msg, venue)
 
         # ---- Body
 
@@ -1897,7 +2558,7 @@ class Application(fix.Application):
         
         fix.Session.sendToTarget(msg)
     
-    def orderMassCancelRequest(self, marketSegment):
+    def orderMassCancelRequest(self, marketSegment, venue=None):
         """
         Order Mass Cancel Request
         
@@ -1906,6 +2567,7 @@ class Application(fix.Application):
         
         Arguments:
             - marketSegment: string
+            - venue: string (default: the default venue)
         
         Fields:
             - Header Group:
@@ -1922,10 +2584,10 @@ class Application(fix.Application):
             - (10) CheckSum = (string(3))       
         """
         
+        venue = self.getVenue(venue=venue)
+        
         msg = fix50.OrderMassCancelRequest()
-        header = msg.getHeader()
-        header.setField(fix.SenderCompID(self.senderCompID))
-        header.setField(fix.TargetCompID(self.targetCompID))
+        self.setHeader(msg, venue)
         
         msg.setField(fix.MassCancelRequestType(fix.MassCancelRequestType_CANCEL_ALL_ORDERS))
         msg.setField(fix.ClOrdID(str(self.getNextOrderID())))
@@ -1934,7 +2596,7 @@ class Application(fix.Application):
     
         fix.Session.sendToTarget(msg)
         
-    def marketDataRequest(self, entries, symbols, subscription=fix.SubscriptionRequestType_SNAPSHOT_PLUS_UPDATES, depth=5):
+    def marketDataRequest(self, entries, symbols, subscription=fix.SubscriptionRequestType_SNAPSHOT_PLUS_UPDATES, depth=5, venue=None, consumer='default'):
         """
         Market Data Request
         
@@ -1947,6 +2609,9 @@ class Application(fix.Application):
             - symbols: list of strings 
             - subscription: int (default: fix.SubscriptionRequestType_SNAPSHOT_PLUS_UPDATES)
             - depth: int (default: 5)
+            - venue: string (default: venue of the symbol, else the default venue)
+            - consumer: string (default: 'default') - subscriptions are ref-counted per consumer, a symbol
+                        already streaming is not requested again
         
         Fields:
             - Header Group:
@@ -1979,16 +2644,69 @@ class Application(fix.Application):
         if not all(elem in posibles_entries for elem in entries):
             return
         
+        ## One request per venue when the symbols are listed in more than one
+        if venue is None:
+            venues = {}
+            for symbol in symbols:
+                venues.setdefault(self.getVenue(symbol), []).append(symbol)
+            if len(venues) > 1:
+                for venue, venueSymbols in venues.items():
+                    self.marketDataRequest(entries, venueSymbols, subscription, depth, venue, consumer)
+                return
+            venue = next(iter(venues))
+        
+        if subscription == fix.SubscriptionRequestType_SNAPSHOT_PLUS_UPDATES:
+            mdReqId, symbols = self.subscriptions.subscribe(consumer, venue, symbols, entries, depth)
+            if not symbols:
+                logfix.info("Market data already streaming >> (%s)" % consumer)
+                return
+        else:
+            mdReqId = self.subscriptions.nextId()
+        
+        self.sendMarketDataRequest(mdReqId, entries, symbols, subscription, depth, venue)
+        
+    def marketDataUnsubscribe(self, entries, symbols, depth=5, venue=None, consumer='default'):
+        """
+        Market Data Request - Disable Previous Snapshot + Update (263=2)
+        
+        Sent only for the streams left without consumers, with the MDReqID that opened them. The request is
+        disabled as a whole: its streams still in use are requested again under a new MDReqID.
+        """
+        
+        venues = {}
+        for symbol in symbols:
+            venues.setdefault(self.getVenue(symbol, venue), []).append(symbol)
+        
+        for venue, venueSymbols in venues.items():
+            disable, requests = self.subscriptions.unsubscribe(consumer, venue, venueSymbols, entries, depth)
+            for mdReqId, streamEntries, streamDepth, streamSymbols in disable:
+                self.sendMarketDataRequest(mdReqId, streamEntries, streamSymbols, fix.SubscriptionRequestType_DISABLE_PREVIOUS_SNAPSHOT_PLUS_UPDATE_REQUEST,
+                                           streamDepth, venue)
+            for mdReqId, streamEntries, streamDepth, streamSymbols in requests:
+                self.sendMarketDataRequest(mdReqId, streamEntries, streamSymbols, fix.SubscriptionRequestType_SNAPSHOT_PLUS_UPDATES, streamDepth, venue)
+        
+    def resubscribeMarketData(self, venue=None):
+        """
+        Open again every market data stream of a venue (batched requests, new MDReqIDs)
+        """
+        
+        venue = self.getVenue(venue=venue)
+        for mdReqId, entries, depth, symbols in self.subscriptions.resubscribe(venue):
+            self.sendMarketDataRequest(mdReqId, entries, symbols, fix.SubscriptionRequestType_SNAPSHOT_PLUS_UPDATES, depth, venue)
+        
+    def sendMarketDataRequest(self, mdReqId, entries, symbols, subscription, depth, venue):
+        """
+        Market Data Request message (see marketDataRequest)
+        """
+        
         # ---- Header
         
         msg = fix50.MarketDataRequest()
-        header = msg.getHeader()
-        header.setField(fix.SenderCompID(self.senderCompID))
-        header.setField(fix.TargetCompID(self.targetCompID))
+        self.setHeader(msg, venue)
         
         # ---- Body
         
-        msg.setField(fix.MDReqID(randomString(5))) # Unique ID 
+        msg.setField(fix.MDReqID(mdReqId)) # Unique ID 
         msg.setField(fix.SubscriptionRequestType(subscription))
         msg.setField(fix.MarketDepth(depth))
         msg.setField(fix.MDUpdateType(0))
@@ -2015,7 +2733,7 @@ class Application(fix.Application):
 
         fix.Session.sendToTarget(msg)
         
-    def securityListRequest(self, criteria=fix.SecurityListRequestType_ALL_SECURITIES, symbol=None, cficode=None, subscription=fix.SubscriptionRequestType_SNAPSHOT):
+    def securityListRequest(self, criteria=fix.SecurityListRequestType_ALL_SECURITIES, symbol=None, cficode=None, subscription=fix.SubscriptionRequestType_SNAPSHOT, venue=None):
         """
         Security List Request
         
@@ -2027,6 +2745,7 @@ class Application(fix.Application):
             - symbol: strings (default: None)
             - cficode: string (default: None)
             - subscription: int (default: fix.SubscriptionRequestType_SNAPSHOT)
+            - venue: string (default: the default venue)
         
         Fields:
             - Header Group:
@@ -2059,10 +2778,10 @@ class Application(fix.Application):
         
         # ---- Header
         
+        venue = self.getVenue(venue=venue)
+        
         msg = fix50.SecurityListRequest()
-        header = msg.getHeader()
-        header.setField(fix.SenderCompID(self.senderCompID))
-        header.setField(fix.TargetCompID(self.targetCompID))
+        self.setHeader(msg, venue)
         
         # ---- Body
         
@@ -2085,7 +2804,7 @@ class Application(fix.Application):
         
         fix.Session.sendToTarget(msg) 
         
-    def securityStatusRequest(self, subscription=fix.SubscriptionRequestType_SNAPSHOT, symbol='[N/A]'):
+    def securityStatusRequest(self, subscription=fix.SubscriptionRequestType_SNAPSHOT, symbol='[N/A]', venue=None):
         """
         Security Status Request
         
@@ -2096,6 +2815,7 @@ class Application(fix.Application):
         Arguments:
             - subscription: int (default: fix.SubscriptionRequestType_SNAPSHOT)
             - symbol: list of strings (default: '[N/A]')            
+            - venue: string (default: the default venue)
         
         Fields:
             - Header Group:
@@ -2117,10 +2837,10 @@ class Application(fix.Application):
         
         # ---- Header
         
+        venue = self.getVenue(venue=venue)
+        
         msg = fix50.SecurityStatusRequest()
-        header = msg.getHeader()
-        header.setField(fix.SenderCompID(self.senderCompID))
-        header.setField(fix.TargetCompID(self.targetCompID))
+        self.setHeader(msg, venue)
         
         # ---- Body
         
@@ -2130,7 +2850,7 @@ class Application(fix.Application):
         
         fix.Session.sendToTarget(msg) 
         
-    def tradeCaptureReportRequest(self, symbol=None):
+    def tradeCaptureReportRequest(self, symbol=None, since=None, venue=None, account=None):
         """
         Trade Capture Report Request for Regular Trades by Account
         
@@ -2138,14 +2858,29 @@ class Application(fix.Application):
         Request one or more trade capture reports based upon selection criteria provided on the trade capture
         report request.
         
+        Arguments:
+            - symbol: string (default: None - all the account trades)
+            - since: UTC Timestamp string (default: TransactTime of the last journaled report)
+            - venue: string (default: venue of the symbol, else the default venue)
+            - account: string (default: the session account)
+        
+        Fields:
+            - (568) - TradeRequestID = (string)
+            - (569) - TradeRequestType = 1 (Matched trades matching criteria)
+            - Block TrdCapDtGrp:
+                - (580) - NoDates = 1 (Start of the range)
+                    - (60) - TransactTime = UTC Timestamp
         """
         
+        if since is None:
+            since = self.tradeJournal.lastTransactTime()
+        
         # ---- Header
         
+        venue = self.getVenue(symbol, venue)
+        
         msg = fix50.TradeCaptureReportRequest()
-        header = msg.getHeader()
-        header.setField(fix.SenderCompID(self.senderCompID))
-        header.setField(fix.TargetCompID(self.targetCompID))
+        self.setHeader(msg, venue)
         
         # ---- Body
         
@@ -2156,7 +2891,7 @@ class Application(fix.Application):
         if symbol is None:        
             noPartyIds = fix50.TradeCaptureReportRequest().NoPartyIDs()     
             
-            noPartyIds.setField(fix.PartyID(self.account))
+            noPartyIds.setField(fix.PartyID(account or self.account))
             noPartyIds.setField(fix.PartyIDSource(fix.PartyIDSource_PROPRIETARY))
             noPartyIds.setField(fix.PartyRole(fix.PartyRole_CUSTOMER_ACCOUNT))
             
@@ -2164,9 +2899,16 @@ class Application(fix.Application):
         else:
             msg.setField(fix.Symbol(symbol))
         
+        if since is not None:
+            noDates = fix50.TradeCaptureReportRequest().NoDates()
+            transactTime = fix.TransactTime()
+            transactTime.setString(since)
+            noDates.setField(transactTime)
+            msg.addGroup(noDates)
+        
         fix.Session.sendToTarget(msg) 
         
-    def allocationInstruction(self, symbol, quantity, side):
+    def allocationInstruction(self, symbol, quantity, side, venue=None):
         """
         Allocation Instruction
         
@@ -2179,10 +2921,10 @@ class Application(fix.Application):
         
         # ---- Header
         
+        venue = self.getVenue(symbol, venue)
+        
         msg = fix50.AllocationInstruction()
-        header = msg.getHeader()
-        header.setField(fix.SenderCompID(self.senderCompID))
-        header.setField(fix.TargetCompID(self.targetCompID))
+        self.setHeader(msg, venue)
         
         # ---- Body
         
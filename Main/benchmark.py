@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+Latency Benchmark
+
+End-to-end benchmark of Application against the local simulator (Main/simulator.py):
+
+    - tick: simulator book update -> onMessage_MarketDataSnapshotFullRefresh -> WebSocket broadcast
+    - order: newOrderSingle -> Execution Report (New) -> WebSocket broadcast
+    - rest: HTTP round trip through the bottle routes
+
+Latencies are reported as percentiles (microseconds) and throughput (operations per second),
+and saved as JSON under Benchmarks/results/ (one file per commit) to compare runs.
+
+The client runs on an anonymous books segment, so a benchmark never shares the 'rofex-books' segment of a
+live client.
+
+Requirements (besides the client ones): requests (REST benchmark) - pip install requests
+"""
+
+import sys, os
+import argparse
+import contextlib
+import datetime
+import json
+import platform
+import subprocess
+import time
+from queue import Queue, Empty
+
+import numpy as np
+import quickfix as fix
+import requests
+import texttable
+
+sys.path.insert(0, os.path.join(os.path.dirname(sys.path[0]), 'model'))
+
+from logger import setup_logger
+from simulator import startSimulator
+import client
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+class BroadcastProbe(object):
+    """
+    ### Broadcast Probe
+
+        - Wraps server_md.broadcast and timestamps (perf_counter_ns) every message once it has been written
+        - wait(predicate): first broadcast matching predicate
+    """
+
+    def __init__(self, server):
+        self.queue = Queue()
+        self.broadcast = server.broadcast
+        server.broadcast = self.wrapper
+
+    def wrapper(self, msg, account=None, timed=False):
+        self.broadcast(msg, account, timed)
+        self.queue.put((time.perf_counter_ns(), msg))
+
+    def wait(self, predicate, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                stamp, msg = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except Empty:
+                raise TimeoutError('No broadcast within %s seconds' % timeout)
+            if predicate(msg):
+                return stamp
+
+    def drain(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+def summary(samples, elapsed):
+    """
+    Percentiles (us) of a list of latencies (ns) and throughput (ops/s)
+    """
+    samples = np.asarray(samples, dtype=np.float64) / 1000.0
+    result = {'count'      : int(len(samples)),
+              'throughput' : float(len(samples) / elapsed) if elapsed > 0 else None
+              }
+    if len(samples):
+        result['mean'] = float(samples.mean())
+        result['max'] = float(samples.max())
+        for percentile, value in zip(PERCENTILES, np.percentile(samples, PERCENTILES)):
+            result['p%s' % str(percentile).replace('.', '')] = float(value)
+    return result
+
+def gitCommit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+"""
+Benchmarks
+"""
+
+def benchTicks(simulator, probe, symbols, count, warmup):
+    """
+    Tick to broadcast: one book update at a time (latency), then a burst of updates (throughput)
+    """
+    latencies = []
+    for i in range(warmup + count):
+        symbol = symbols[i % len(symbols)]
+        start = time.perf_counter_ns()
+        with simulator.lock:
+            simulator.publish(symbol)
+        stamp = probe.wait(lambda msg: "'marketData'" in msg)
+        if i >= warmup:
+            latencies.append(stamp - start)
+
+    probe.drain()
+    start = time.perf_counter()
+    for i in range(count):
+        with simulator.lock:
+            simulator.publish(symbols[i % len(symbols)])
+    for i in range(count):
+        probe.wait(lambda msg: "'marketData'" in msg)
+    elapsed = time.perf_counter() - start
+
+    result = summary(latencies, elapsed)
+    result['throughput'] = count / elapsed
+    return result
+
+def benchOrders(application, probe, instrument, count, warmup):
+    """
+    Order to ack: newOrderSingle until the Execution Report (New) has been broadcast
+
+    Orders rest at the low limit price (no trades) and are mass canceled at the end.
+    """
+    latencies = []
+    start = time.perf_counter()
+    for i in range(warmup + count):
+        begin = time.perf_counter_ns()
+        clOrdId = application.newOrderSingle(symbol=instrument['symbol'], side=fix.Side_BUY, quantity=1,
+                                             price=instrument['lowLimitPrice'], orderType=fix.OrdType_LIMIT)
+        if clOrdId is None:
+            raise RuntimeError('Order rejected locally: %s' % instrument['symbol'])
+        stamp = probe.wait(lambda msg: "'clOrdId': '%s'" % clOrdId in msg)
+        if i >= warmup:
+            latencies.append(stamp - begin)
+        if i == warmup - 1:
+            start = time.perf_counter()
+    elapsed = time.perf_counter() - start
+
+    application.orderMassCancelRequest(marketSegment=instrument['marketSegmentId'])
+    return summary(latencies, elapsed)
+
+def benchRest(url, routes, count, warmup):
+    """
+    REST round trip (keep-alive session), per route
+    """
+    results = {}
+    session = requests.Session()
+    for route in routes:
+        latencies = []
+        for i in range(warmup):
+            session.get(url + route, data='{}')
+        start = time.perf_counter()
+        for i in range(count):
+            begin = time.perf_counter_ns()
+            response = session.get(url + route, data='{}')
+            latencies.append(time.perf_counter_ns() - begin)
+            response.raise_for_status()
+        results[route] = summary(latencies, time.perf_counter() - start)
+    return results
+
+"""
+Report
+"""
+
+def printReport(results, baseline=None):
+    table = texttable.Texttable(max_width=0)
+    table.set_deco(texttable.Texttable.BORDER|texttable.Texttable.HEADER)
+    columns = ['p50', 'p90', 'p99', 'p999', 'max', 'throughput']
+    table.header(['Path'] + columns)
+    table.set_cols_dtype(['t'] + ['t'] * len(columns))
+
+    def rows(results, prefix=''):
+        for name, result in sorted(results.items()):
+            if 'count' in result:
+                yield prefix + name, result
+            else:
+                yield from rows(result, prefix + name + ' ')
+
+    previous = dict(rows(baseline['results'])) if baseline else {}
+    for name, result in rows(results):
+        row = [name]
+        for column in columns:
+            value = result.get(column)
+            if value is None:
+                row.append('-')
+                continue
+            cell = '%.1f' % value
+            if name in previous and previous[name].get(column):
+                cell += ' (%+.1f%%)' % (100.0 * (value / previous[name][column] - 1))
+            row.append(cell)
+        table.add_row(row)
+
+    print(table.draw())
+    print('Latencies in microseconds, throughput in operations per second.')
+
+"""
+Main
+"""
+
+if __name__=='__main__':
+
+    parser = argparse.ArgumentParser(description='Latency Benchmark')
+    parser.add_argument('--config', type=str, default='conf/rofex_simulator.cfg', help='Client configuration file')
+    parser.add_argument('--simulator', type=str, default='conf/simulator.cfg', help='Simulator configuration file')
+    parser.add_argument('--instruments', type=str, default='conf/simulator_instruments.json', help='Simulator instruments')
+    parser.add_argument('--ticks', type=int, default=5000, help='Market data updates')
+    parser.add_argument('--orders', type=int, default=500, help='Orders')
+    parser.add_argument('--requests', type=int, default=1000, help='REST requests per route')
+    parser.add_argument('--warmup', type=int, default=100, help='Warmup iterations (not measured)')
+    parser.add_argument('--routes', type=str, nargs='+', default=['/tradingstatus', '/instruments'], help='REST routes')
+    parser.add_argument('--port', type=int, default=1235, help='REST port')
+    parser.add_argument('--output', type=str, default='Benchmarks/results', help='Results directory')
+    parser.add_argument('--baseline', type=str, help='Previous results file to compare with')
+    parser.add_argument('--verbose', action='store_true', help='Keep the console output of the handlers')
+    args = parser.parse_args()
+
+    setup_logger('SIM', './Logs/simulator.log')
+
+    with open(args.instruments) as f:
+        instruments = json.load(f)
+    symbols = [instrument['symbol'] for instrument in instruments]
+
+    ## Exchange (static book: only the benchmark moves the market)
+    acceptor, simulator, marketMaker = startSimulator(args.simulator, args.instruments, rate=0.0)
+
+    ## Client
+    fixMain = client.main(args.config, 'ROFX', 'USER', 'benchmark', 'BENCH', books=None)
+    client.fixMain = fixMain
+    fixMain.daemon = True
+    fixMain.start()
+    bottleFW = client.bottle_framework(host='localhost', port=args.port)
+    bottleFW.daemon = True
+    bottleFW.start()
+
+    application = fixMain.application
+    deadline = time.monotonic() + 30
+    while not (getattr(application, 'sessions', {}).get('ROFX', {}).get('connected') and len(application.instruments) == len(instruments)):
+        if time.monotonic() > deadline:
+            sys.exit('Client did not log on to the simulator')
+        time.sleep(0.1)
+    time.sleep(1)
+
+    ## Market data subscription of every symbol
+    probe = BroadcastProbe(application.server_md)
+    output = open(os.devnull, 'w') if not args.verbose else sys.stdout
+    with contextlib.redirect_stdout(output):
+        application.marketDataRequest(entries=[fix.MDEntryType_BID, fix.MDEntryType_OFFER, fix.MDEntryType_TRADE_VOLUME], symbols=symbols)
+        for symbol in symbols:
+            probe.wait(lambda msg: "'marketData'" in msg)
+        results = {'tick'  : benchTicks(simulator, probe, symbols, args.ticks, args.warmup),
+                   'order' : benchOrders(application, probe, instruments[0], args.orders, args.warmup),
+                   'rest'  : benchRest('http://localhost:%s' % args.port, args.routes, args.requests, args.warmup)
+                   }
+
+    report = {'commit'    : gitCommit(),
+              'date'      : datetime.datetime.now().isoformat(),
+              'python'    : platform.python_version(),
+              'platform'  : platform.platform(),
+              'arguments' : vars(args),
+              'results'   : results
+              }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    printReport(results, baseline)
+
+    if not os.path.exists(args.output):
+        os.makedirs(args.output)
+    path = os.path.join(args.output, '%s.json' % report['commit'])
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('Results saved >> (%s)' % path)
+
+    application.logout()
+    fixMain.initiator.stop()
+    acceptor.stop()
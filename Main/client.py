@@ -8,6 +8,11 @@ Created on Mon Nov 25 12:23:56 2019
 import argparse
 import quickfix as fix
 from application import Application
+from recorder import FixRecorder
+from shmbook import BookWriter
+from instrumentcache import InstrumentCache
+from rttmonitor import RttMonitor
+from tophistory import toRecords
 from threading import Thread
 from getpass import getpass
 import time
@@ -18,12 +23,18 @@ import json
 import bottle
 
 def signal_handler(sig, frame):
+    fixMain.application.latency.dump('./Logs/latency.json')
     fixMain.application.logout()    
     fixMain.initiator.stop()
+    if fixMain.application.recorder is not None:
+        fixMain.application.recorder.close()
+    if fixMain.pipeline is not None:
+        fixMain.pipeline.stop()
+    fixMain.books.close()
     sys.exit(0)
                 
 class main(Thread):
-    def __init__(self, config_file, market, user, passwd, account):
+    def __init__(self, config_file, market, user, passwd, account, record=None, venues=(), mdWorkers=0, mdPort=8081, books='rofex-books', rtt=None, booksCapacity=None, barIntervals=(1, 60, 300)):
         Thread.__init__(self)
         self.config_file = config_file
         self.market = market
@@ -32,8 +43,25 @@ class main(Thread):
         self.account = account
         
         self.settings = fix.SessionSettings(self.config_file)
-        self.application = Application(self.market, self.user, self.passwd, self.account)
+        self.recorder = FixRecorder(record) if record else None
+        ## Book slots for every listed instrument (instrument cache, room for the day's new listings)
+        if not booksCapacity:
+            cache = InstrumentCache()
+            booksCapacity = max(2048, 2 * cache.count())
+            cache.close()
+        self.books = BookWriter(books, capacity=booksCapacity)
+        ## Market data pipeline: the segment is kept here and written by its fan-out process
+        self.pipeline = None
+        if mdWorkers:
+            from mdpipeline import MarketDataPipeline
+            defaults = self.settings.get()
+            self.pipeline = MarketDataPipeline(defaults.getString('TransportDataDictionary'), defaults.getString('AppDataDictionary'),
+                                               workers=mdWorkers, port=mdPort, books=self.books.name).start()
         self.storefactory = fix.FileStoreFactory(self.settings)
+        self.application = Application(self.market, self.user, self.passwd, self.account, recorder=self.recorder, pipeline=self.pipeline,
+                                       books=self.books, rtt=rtt, barIntervals=barIntervals)
+        for venue, venueUser, venuePasswd in venues:
+            self.application.addVenue(venue, venueUser, venuePasswd)
         self.logfactory = fix.FileLogFactory(self.settings)
         self.initiator = fix.SocketInitiator(self.application, self.storefactory, self.settings, self.logfactory)
             
@@ -58,14 +86,32 @@ app = bottle.Bottle()
 @app.get('/marketdata')
 def marketData():
   req_obj = json.loads(bottle.request.body.read())
-  fixMain.application.marketDataRequest(entries=req_obj['entries'], symbols=req_obj['symbol'])
+  fixMain.application.marketDataRequest(entries=req_obj['entries'], symbols=req_obj['symbol'], venue=req_obj.get('venue'),
+                                        consumer=req_obj.get('consumer', 'rest'))
   return {'type':'md', 'data':{'symbols': req_obj['symbol'], 'entries':req_obj['entries']}}
 
+@app.get('/unsubscribe')
+def unsubscribe():
+    req_obj = json.loads(bottle.request.body.read())
+    fixMain.application.marketDataUnsubscribe(entries=req_obj['entries'], symbols=req_obj['symbol'], depth=req_obj.get('depth', 5),
+                                              venue=req_obj.get('venue'), consumer=req_obj.get('consumer', 'rest'))
+    return {'type':'unsubscribe', 'data':{'symbols': req_obj['symbol'], 'entries':req_obj['entries']}}
+
+@app.get('/subscriptions')
+def subscriptions():
+    req_obj = json.loads(bottle.request.body.read() or '{}')
+    return {'type':'subscriptions', 'data': fixMain.application.subscriptions.snapshot(venue=req_obj.get('venue'), consumer=req_obj.get('consumer'))}
+
 @app.get('/newordersingle')
 def newOrderSingle():
     req_obj = json.loads(bottle.request.body.read())
+    tradable, reason = fixMain.application.canTrade(req_obj['symbol'], venue=req_obj.get('venue'))
+    if not tradable:
+        return {'type':'reject', 'data':{'symbol':req_obj['symbol'], 'side':req_obj['side'], 'quantity':req_obj['quantity'],
+                                         'price':req_obj['price'], 'orderType':req_obj['orderType'], 'text': reason}}
     fixMain.application.newOrderSingle(symbol=req_obj['symbol'], side=req_obj['side'], quantity=req_obj['quantity'], 
-                                       price=req_obj['price'], orderType=req_obj['orderType'])
+                                       price=req_obj['price'], orderType=req_obj['orderType'], venue=req_obj.get('venue'),
+                                       account=req_obj.get('account'))
     time.sleep(0.3)
     return {'type':'new', 'data':{'symbol':req_obj['symbol'], 'side':req_obj['side'], 'quantity':req_obj['quantity'], 
                                   'price':req_obj['price'], 'orderType':req_obj['orderType'], 'orderID': str(fixMain.application.orderID)}}
@@ -73,21 +119,106 @@ def newOrderSingle():
 @app.get('/ordercancel')
 def orderCancel():
     req_obj = json.loads(bottle.request.body.read())
-    fixMain.application.orderCancelRequest(orderId=req_obj['orderID'], side=req_obj['side'], quantity=req_obj['quantity'], symbol=req_obj['symbol'])
+    fixMain.application.orderCancelRequest(orderId=req_obj['orderID'], side=req_obj['side'], quantity=req_obj['quantity'], symbol=req_obj['symbol'],
+                                           venue=req_obj.get('venue'), account=req_obj.get('account'))
     return {'type':'cancel', 'data':{'symbol':req_obj['symbol'], 'orderID':req_obj['orderID']}}
 
 @app.get('/masscancel')
 def massCancel():
     req_obj = json.loads(bottle.request.body.read())
-    fixMain.application.orderMassCancelRequest(marketSegment=req_obj['marketSegment'])
+    fixMain.application.orderMassCancelRequest(marketSegment=req_obj['marketSegment'], venue=req_obj.get('venue'))
     return {'type':'massCancel', 'marketSegment' : req_obj['marketSegment']}
 
 @app.get('/orderstatus')
 def orderStatus():
     req_obj = json.loads(bottle.request.body.read())
-    fixMain.application.orderStatusRequest(orderId=req_obj['orderID'], symbol=req_obj['symbol'], side=req_obj['side'])
+    fixMain.application.orderStatusRequest(orderId=req_obj['orderID'], symbol=req_obj['symbol'], side=req_obj['side'], venue=req_obj.get('venue'))
     return {'type':'orderStatus'}
 
+@app.get('/orders')
+def orders():
+    req_obj = json.loads(bottle.request.body.read() or '{}')
+    return {'type':'orders', 'data': fixMain.application.getOrders(account=req_obj.get('account'))}
+
+@app.get('/positions')
+def positions():
+    req_obj = json.loads(bottle.request.body.read() or '{}')
+    return {'type':'positions', 'data': fixMain.application.getPositions(account=req_obj.get('account'))}
+
+@app.get('/tradingstatus')
+def tradingStatus():
+    return {'type':'tradingStatus', 'data': fixMain.application.tradingStatus.snapshot()}
+
+@app.get('/tradeanalytics')
+def tradeAnalytics():
+    req_obj = json.loads(bottle.request.body.read() or '{}')
+    return {'type':'tradeAnalytics', 'data': fixMain.application.getTradeAnalytics(account=req_obj.get('account'))}
+
+@app.get('/latency')
+def latency():
+    req_obj = json.loads(bottle.request.body.read() or '{}')
+    return {'type':'latency', 'unit':'ns', 'data': fixMain.application.latency.snapshot(reset=req_obj.get('reset', False))}
+
+@app.get('/bars')
+def bars():
+    req_obj = json.loads(bottle.request.body.read())
+    data = fixMain.application.bars.history(req_obj['symbol'], req_obj.get('interval', 60), start=req_obj.get('start'), end=req_obj.get('end'),
+                                            limit=req_obj.get('limit'), current=req_obj.get('current', False))
+    return {'type':'bars', 'symbol': req_obj['symbol'], 'interval': req_obj.get('interval', 60), 'data': data}
+
+@app.get('/tophistory')
+def topHistory():
+    req_obj = json.loads(bottle.request.body.read())
+    history = fixMain.application.topHistory
+    if req_obj.get('step'):
+        rows = history.resample(req_obj['symbol'], req_obj['start'], req_obj['end'], req_obj['step'])
+    else:
+        rows = history.query(req_obj['symbol'], start=req_obj.get('start'), end=req_obj.get('end'), limit=req_obj.get('limit'))
+    return {'type':'topHistory', 'symbol': req_obj['symbol'], 'unit':'ns', 'data': toRecords(rows),
+            'stats': history.stats(req_obj['symbol'], start=req_obj.get('start'), end=req_obj.get('end'))}
+
+@app.get('/implied')
+def implied():
+    req_obj = json.loads(bottle.request.body.read() or '{}')
+    engine = fixMain.application.implied
+    return {'type':'implied', 'underlying': req_obj.get('underlying'), 'curves': engine.definitions(), 'data': engine.quotes(req_obj.get('underlying'))}
+
+@app.get('/greeks')
+def greeks():
+    req_obj = json.loads(bottle.request.body.read() or '{}')
+    chains = fixMain.application.optionChains.snapshot(req_obj.get('underlying'), req_obj.get('maturityDate'))
+    return {'type':'greeks', 'underlying': req_obj.get('underlying'), 'maturityDate': req_obj.get('maturityDate'), 'data': chains}
+
+@app.get('/rtt')
+def rtt():
+    req_obj = json.loads(bottle.request.body.read() or '{}')
+    venue = req_obj.get('venue')
+    stats = fixMain.application.rtt.stats(venue) if venue else fixMain.application.rtt.stats()
+    return {'type':'rtt', 'unit':'ns', 'data': stats}
+
+@app.get('/metrics')
+def metrics():
+    bottle.response.content_type = fixMain.application.metrics.CONTENT_TYPE
+    return fixMain.application.metrics.render()
+
+@app.get('/instruments')
+def instruments():
+    req_obj = json.loads(bottle.request.body.read() or '{}')
+    data = fixMain.application.instruments.query(prefix=req_obj.get('prefix'), underlying=req_obj.get('underlying'), cfiCode=req_obj.get('cfiCode'),
+                                                 maturityDate=req_obj.get('maturityDate'), segment=req_obj.get('segment'))
+    return {'type':'instruments', 'data': data}
+
+@app.get('/futures')
+def futures():
+    req_obj = json.loads(bottle.request.body.read())
+    return {'type':'futures', 'underlying': req_obj['underlying'], 'data': fixMain.application.instruments.futures(req_obj['underlying'])}
+
+@app.get('/optionchain')
+def optionChain():
+    req_obj = json.loads(bottle.request.body.read())
+    chain = fixMain.application.instruments.optionChain(req_obj['underlying'], req_obj.get('maturityDate'))
+    return {'type':'optionChain', 'underlying': req_obj['underlying'], 'maturityDate': req_obj.get('maturityDate'), 'data': chain}
+
 """
 Main
 """
@@ -96,12 +227,28 @@ if __name__=='__main__':
     
     parser = argparse.ArgumentParser(description='FIX Client')
     parser.add_argument('file_name', type=str, help='Name of configuration file')
+    parser.add_argument('--record', type=str, help='Record the inbound FIX messages in this directory (i.e. ./Recordings)')
+    parser.add_argument('--venue', action='append', default=[], help='Additional venue MARKET:USER (one [SESSION] per venue in the configuration file)')
+    parser.add_argument('--md-workers', type=int, default=0, help='Decode and broadcast the market data in this many worker processes (0 = in process)')
+    parser.add_argument('--md-port', type=int, default=8081, help='WebSocket port of the market data when --md-workers is set')
+    parser.add_argument('--books', type=str, default='rofex-books', help='Shared memory segment of the books (model/shmbook.BookReader)')
+    parser.add_argument('--books-capacity', type=int, default=0, help='Symbols of the books segment (0 = twice the cached instruments, at least 2048)')
+    parser.add_argument('--rtt-interval', type=float, default=10.0, help='Seconds between Test Request probes')
+    parser.add_argument('--rtt-threshold', type=float, default=0.5, help='Alert when a probe round trip exceeds these seconds')
+    parser.add_argument('--bar-intervals', type=int, nargs='+', default=[1, 60, 300], help='Bar sizes in seconds (i.e. 1 60 300)')
     args = parser.parse_args()
     market = input('Market (i.e. ROFX, BYMA): ')
     user = input('Username (SenderCompID): ')
     passwd = getpass(prompt="Password: ")
     account = input('Cuenta: ')
-    fixMain = main(args.file_name, market, user, passwd, account)
+    venues = []
+    for venue in args.venue:
+        venueMarket, venueUser = venue.split(':', 1)
+        venues.append((venueMarket, venueUser, getpass(prompt="Password (%s): " % venueMarket)))
+    fixMain = main(args.file_name, market, user, passwd, account, record=args.record, venues=venues,
+                   mdWorkers=args.md_workers, mdPort=args.md_port, books=args.books,
+                   rtt=RttMonitor(interval=args.rtt_interval, threshold=args.rtt_threshold), booksCapacity=args.books_capacity,
+                   barIntervals=args.bar_intervals)
     
     fixMain.daemon = True
     fixMain.start()
@@ -146,6 +293,7 @@ if __name__=='__main__':
         time.sleep(1)
     
     
+    fixMain.application.latency.dump('./Logs/latency.json')
     fixMain.application.logout()
     
     fixMain.initiator.stop()
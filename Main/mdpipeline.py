@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+Market Data Pipeline
+
+Out of process market data: the FIX callback thread only copies the raw Market Data
+Snapshot / Full Refresh (35=W) into a shared memory ring; decoding, logging and the
+WebSocket fan-out run in worker processes, outside the GIL of the order entry process.
+
+    FIX process --(ring per decoder, partitioned by symbol)--> decoders --(ring per decoder)--> fan-out (WebSocket, shared memory books)
+                                                                        --(ring per decoder)--> FIX process consumer thread (top of book)
+
+The fan-out process writes the shared memory books. The FIX process only gets a fixed size top of book record
+per book (no JSON) for its top of book consumers (bars, top of book history, implied prices, option chains):
+its consumer thread sleeps on an event the decoders set after each batch. Order reports keep their path
+(handlers and WebSocket of the FIX process).
+"""
+
+import sys, os
+import json
+import logging
+import multiprocessing
+import re
+import struct
+import threading
+import time
+import zlib
+
+import quickfix as fix
+import quickfix50sp2 as fix50
+
+sys.path.insert(0, os.path.join(os.path.dirname(sys.path[0]), 'model'))
+
+from logger import setup_logger
+from shmring import SharedRing
+from shmbook import BookWriter
+from bookanalytics import bookAnalytics
+
+SYMBOL = re.compile(b'\x0155=([^\x01]*)\x01')
+
+## Idle workers spin this many empty polls before sleeping
+SPIN = 1000
+IDLE = 0.0005
+## Records taken from a ring at a time
+BATCH = 256
+## Wake up period of the FIX process consumer thread (checks stop)
+WAIT = 0.5
+
+## Top of book record: bid price / size, offer price / size, last price / size, trade volume (NaN when missing) + symbol
+TOP = struct.Struct('<7d')
+NAN = float('nan')
+
+def partition(raw, workers):
+    """
+    Decoder of a raw message: every message of a symbol goes to the same decoder (in order)
+    """
+    match = SYMBOL.search(raw)
+    return zlib.crc32(match.group(1)) % workers if match is not None else 0
+
+def decodeSnapshot(message):
+    """
+    Market Data Snapshot / Full Refresh as broadcast by Application.onMessage_MarketDataSnapshotFullRefresh
+
+    Return:
+        - dict: {'instrumentId': {'symbol', 'marketId'}, 'marketData': {'BI': [...], 'OF': [...], 'LA': {...}, 'TV': {...}}, 'analytics': {...}}
+    """
+    noMDEntries = int(message.getField(fix.NoMDEntries()).getString())
+    symbol = message.getField(fix.Symbol()).getString()
+    marketId = message.getField(fix.SecurityExchange()).getString()
+
+    data = {}
+    data["instrumentId"] = {"symbol": symbol, "marketId": marketId}
+    data["marketData"] = {"BI": [], "OF": []}
+
+    group = fix50.MarketDataSnapshotFullRefresh().NoMDEntries()
+    MDEntryType = fix.MDEntryType()
+    MDEntryPx = fix.MDEntryPx()
+    MDEntrySize = fix.MDEntrySize()
+    MDEntryPositionNo = fix.MDEntryPositionNo()
+
+    for entry in range(1, noMDEntries + 1):
+        try:
+            md = {}
+            message.getGroup(entry, group)
+            entry_type = group.getField(MDEntryType).getString()
+
+            if entry_type in '01245678w':
+                md['price'] = float(group.getField(MDEntryPx).getString())
+            if entry_type in '012BCx':
+                md['size'] = int(group.getField(MDEntrySize).getString())
+            if entry_type in '01':
+                md['position'] = int(group.getField(MDEntryPositionNo).getString())
+
+            if entry_type == '0':
+                data["marketData"]["BI"].append(md)
+            elif entry_type == '1':
+                data["marketData"]["OF"].append(md)
+            elif entry_type == '2':
+                data["marketData"]["LA"] = md
+            elif entry_type == 'B':
+                data["marketData"]["TV"] = md
+        except:
+            pass
+
+    data["analytics"] = bookAnalytics(data["marketData"]["BI"], data["marketData"]["OF"])
+    return data
+
+def packTop(data):
+    """
+    Top of book record of a decoded book (see TOP)
+    """
+    marketData = data["marketData"]
+    bids, offers, trade = marketData["BI"], marketData["OF"], marketData.get("LA", {})
+    return TOP.pack(bids[0]['price'] if bids else NAN, bids[0]['size'] if bids else 0.0,
+                    offers[0]['price'] if offers else NAN, offers[0]['size'] if offers else 0.0,
+                    trade.get('price', NAN), trade.get('size', 0.0), marketData.get("TV", {}).get('size', NAN)) + \
+           data["instrumentId"]["symbol"].encode('utf-8')
+
+def unpackTop(record):
+    """
+    Return:
+        - tuple: (symbol, bidPx, bidSize, offerPx, offerSize, lastPx, lastSize, volume) - None on missing prices / volume
+    """
+    bidPx, bidSize, offerPx, offerSize, lastPx, lastSize, volume = TOP.unpack_from(record)
+    return (record[TOP.size:].decode('utf-8'), bidPx if bidPx == bidPx else None, bidSize, offerPx if offerPx == offerPx else None,
+            offerSize, lastPx if lastPx == lastPx else None, lastSize, volume if volume == volume else None)
+
+def drain(ring, limit=BATCH):
+    """
+    Up to limit records of ring (list of bytes, empty if the ring is empty)
+    """
+    records = []
+    while len(records) < limit:
+        record = ring.get()
+        if record is None:
+            break
+        records.append(record)
+    return records
+
+def poll(rings, stop):
+    """
+    Batches of records of rings (round robin) until stop is set
+
+    Return:
+        - generator of (ring index, list of record bytes)
+    """
+    idle = 0
+    while not stop.is_set():
+        empty = True
+        for index, ring in enumerate(rings):
+            records = drain(ring)
+            if records:
+                empty = False
+                yield index, records
+        if empty:
+            idle += 1
+            if idle > SPIN:
+                time.sleep(IDLE)
+        else:
+            idle = 0
+
+"""
+Worker processes
+"""
+
+def decoder(index, inName, outName, localName, transportDictionary, appDictionary, ready, stop):
+    """
+    Decoder process: raw FIX (input ring) -> JSON book (fan-out ring) and top of book (local ring, then ready is set)
+    """
+    setup_logger('MD-%s' % index, './Logs/marketdata-%s.log' % index)
+    logmd = logging.getLogger('MD-%s' % index)
+
+    inRing, outRing, localRing = SharedRing(inName), SharedRing(outName), SharedRing(localName)
+    transportDictionary = fix.DataDictionary(transportDictionary)
+    appDictionary = fix.DataDictionary(appDictionary)
+
+    try:
+        for _, records in poll([inRing], stop):
+            for raw in records:
+                raw = raw.decode('utf-8')
+                try:
+                    message = fix.Message(raw, transportDictionary, appDictionary, False)
+                    data = decodeSnapshot(message)
+                except Exception as error:
+                    logmd.error("Decode error (%s) >> (%s)" % (error, raw.replace('\x01', '|')))
+                    continue
+                logmd.info("onMessage, R app (%s)" % raw.replace('\x01', '|'))
+                outRing.put(json.dumps(data).encode('utf-8'))
+                localRing.put(packTop(data))
+            ## One wake up of the FIX process consumer per batch
+            ready.set()
+    finally:
+        inRing.close()
+        outRing.close()
+        localRing.close()
+
+def fanout(names, host, port, books, stop):
+    """
+    Fan-out process: JSON books of every decoder -> WebSocket clients and shared memory books (the only writer)
+    """
+    from WebSocket.BroadcasterWebsocketServer import BroadcasterWebsocketServer
+
+    setup_logger('MD-Fanout', './Logs/marketdata-fanout.log')
+    logmd = logging.getLogger('MD-Fanout')
+
+    server = BroadcasterWebsocketServer(host, port)
+    server.start()
+
+    writer = None
+    if books is not None:
+        writer = BookWriter.attach(books, onSkip=lambda symbol, reason: logmd.warning("Shared books skip >> (%s): %s" % (symbol, reason)))
+
+    rings = [SharedRing(name) for name in names]
+    try:
+        for _, records in poll(rings, stop):
+            for record in records:
+                server.broadcast(record.decode('utf-8'))
+            if writer is not None:
+                for record in records:
+                    data = json.loads(record)
+                    writer.update(data["instrumentId"]["symbol"], data["marketData"]["BI"], data["marketData"]["OF"], data["analytics"])
+    finally:
+        for ring in rings:
+            ring.close()
+        if writer is not None:
+            writer.close()
+        server.stop()
+
+class MarketDataPipeline(object):
+    """
+    ### Market Data Pipeline
+
+        - workers: decoder processes (messages partitioned by symbol, so each symbol stays in order)
+        - host/port: WebSocket of the market data (the order reports stay on the WebSocket of the FIX process)
+        - books: name of the shared memory books segment, created by the FIX process and written by the fan-out
+        - publish(raw): called on the FIX callback thread, one copy into a ring (a full ring drops the message:
+          the next full refresh of the symbol supersedes it)
+        - consume(callback): top of book of the decoded books back in the FIX process, callback(symbol, bidPx, bidSize,
+          offerPx, offerSize, lastPx, lastSize, volume) on a consumer thread that sleeps until a decoder batch is ready
+        - Processes are spawned (not forked) from the multithreaded FIX process
+    """
+
+    def __init__(self, transportDictionary, appDictionary, workers=2, host='', port=8081, books=None, size=16 * 2**20):
+        self.transportDictionary = transportDictionary
+        self.appDictionary = appDictionary
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.books = books
+
+        self.context = multiprocessing.get_context('spawn')
+        self.stopEvent = self.context.Event()
+        self.inRings = [SharedRing(size=size) for _ in range(workers)]
+        self.outRings = [SharedRing(size=size) for _ in range(workers)]
+        self.localRings = [SharedRing(size=size) for _ in range(workers)]
+        self.localReady = self.context.Event()
+        self.localStop = threading.Event()
+        self.consumer = None
+        self.processes = []
+
+    def start(self):
+        for index in range(self.workers):
+            self.processes.append(self.context.Process(target=decoder, name='MD-Decoder-%s' % index,
+                                                       args=(index, self.inRings[index].name, self.outRings[index].name,
+                                                             self.localRings[index].name, self.transportDictionary, self.appDictionary,
+                                                             self.localReady, self.stopEvent)))
+        self.processes.append(self.context.Process(target=fanout, name='MD-Fanout',
+                                                   args=([ring.name for ring in self.outRings], self.host, self.port, self.books, self.stopEvent)))
+        for process in self.processes:
+            process.daemon = True
+            process.start()
+        return self
+
+    def consume(self, callback):
+        """
+        Start the consumer thread of the local rings: callback(*unpackTop(record)) for every decoded book (in order per symbol)
+        """
+        def run():
+            while not self.localStop.is_set():
+                if not self.localReady.wait(WAIT):
+                    continue
+                ## Clear before draining: a batch published meanwhile sets it again
+                self.localReady.clear()
+                for ring in self.localRings:
+                    for record in iter(ring.get, None):
+                        try:
+                            callback(*unpackTop(record))
+                        except Exception as error:
+                            logging.getLogger('FIX').error("Market data consumer error (%s)" % error)
+
+        self.consumer = threading.Thread(target=run, name='MD-Consumer', daemon=True)
+        self.consumer.start()
+        return self.consumer
+
+    def publish(self, raw):
+        """
+        Raw FIX message (string) to its decoder
+        """
+        raw = raw.encode('utf-8')
+        return self.inRings[partition(raw, self.workers)].put(raw)
+
+    def stats(self):
+        """
+        Ring usage (0-1) and dropped messages of each decoder
+        """
+        return {index : {'input'   : self.inRings[index].usage(),
+                         'output'  : self.outRings[index].usage(),
+                         'local'   : self.localRings[index].usage(),
+                         'dropped' : self.inRings[index].dropped,
+                         'alive'   : self.processes[index].is_alive() if self.processes else False
+                         }
+                for index in range(self.workers)}
+
+    def stop(self, timeout=2.0):
+        self.stopEvent.set()
+        self.localStop.set()
+        self.localReady.set()
+        if self.consumer is not None:
+            self.consumer.join(timeout)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        for ring in self.inRings + self.outRings + self.localRings:
+            ring.close()
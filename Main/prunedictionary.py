@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Data Dictionary Pruner
+
+Writes an application data dictionary with only the messages exchanged with ROFEX and the
+components and fields they reach (ROFEX custom fields included), so QuickFIX parses a fraction
+of the full FIX.5.0SP2 specification when the sessions are created.
+
+    python prunedictionary.py ../conf/spec/FIX50SP2_rofex_full.xml ../conf/spec/FIX50SP2_rofex.xml
+"""
+
+import os
+import argparse
+import xml.etree.ElementTree as ET
+
+## Messages sent by Application and answers / unsolicited messages of the exchange
+MESSAGES = ['8', '9', 'B', 'D', 'F', 'G', 'H', 'J', 'P', 'V', 'W', 'X', 'Y',
+            'AD', 'AE', 'AF', 'AQ', 'AR', 'AS', 'BK', 'BZ', 'CA',
+            'e', 'f', 'h', 'j', 'q', 'r', 'x', 'y',
+            'NT', 'NTR']
+
+def references(element, fields, components):
+    """
+    Field and component names used by element (groups walked recursively)
+    """
+    for child in element:
+        if child.tag == 'field':
+            fields.add(child.get('name'))
+        elif child.tag == 'component':
+            components.add(child.get('name'))
+        elif child.tag == 'group':
+            fields.add(child.get('name'))
+            references(child, fields, components)
+
+def prune(root, messages=MESSAGES):
+    """
+    Prune a data dictionary tree in place
+
+    Return:
+        - root
+    """
+    messages = set(messages)
+    fields, components = set(), set()
+
+    for section in ('header', 'trailer'):
+        if root.find(section) is not None:
+            references(root.find(section), fields, components)
+
+    messagesElement = root.find('messages')
+    for message in list(messagesElement):
+        if message.get('msgtype') in messages:
+            references(message, fields, components)
+        else:
+            messagesElement.remove(message)
+
+    ## Components can use other components: resolve until no new one appears
+    definitions = {component.get('name') : component for component in root.find('components')}
+    pending = list(components)
+    while pending:
+        name = pending.pop()
+        found = set()
+        references(definitions[name], fields, found)
+        for component in found - components:
+            components.add(component)
+            pending.append(component)
+
+    componentsElement = root.find('components')
+    for component in list(componentsElement):
+        if component.get('name') not in components:
+            componentsElement.remove(component)
+
+    fieldsElement = root.find('fields')
+    for field in list(fieldsElement):
+        if field.get('name') not in fields:
+            fieldsElement.remove(field)
+
+    return root
+
+def isStale(source, target):
+    return not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(source)
+
+def write(source, target, messages=MESSAGES):
+    """
+    Prune source into target (one element per line)
+
+    Return:
+        - tuple: (messages, components, fields) kept
+    """
+    root = prune(ET.parse(source).getroot(), messages)
+    ET.indent(root, space='  ')
+    with open(target, 'wb') as f:
+        f.write(ET.tostring(root, encoding='utf-8', xml_declaration=False))
+        f.write(b'\n')
+    return len(root.find('messages')), len(root.find('components')), len(root.find('fields'))
+
+"""
+Main
+"""
+
+if __name__=='__main__':
+
+    parser = argparse.ArgumentParser(description='Data Dictionary Pruner')
+    parser.add_argument('source', type=str, help='Full application data dictionary')
+    parser.add_argument('target', type=str, help='Pruned data dictionary (AppDataDictionary of the configuration file)')
+    parser.add_argument('--message', action='append', help='MsgType to keep (default: the ROFEX messages)')
+    parser.add_argument('--force', action='store_true', help='Write even if the target is newer than the source')
+    args = parser.parse_args()
+
+    if args.force or isStale(args.source, args.target):
+        print('Messages: %s, components: %s, fields: %s' % write(args.source, args.target, args.message or MESSAGES))
+    else:
+        print('Up to date: %s' % args.target)
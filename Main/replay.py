@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+FIX Replay
+
+Drives recorded inbound FIX messages through Application.fromApp (handlers, state and WebSocket broadcast)
+without a live session, at maximum speed or at a multiple of the recorded wall-clock speed.
+
+Inputs (merged by receive time):
+    - Recorder segments (*.seg, see model/recorder.py)
+    - QuickFIX FileLog message logs (*.messages.*.log), keeping the messages sent by the counterparty
+"""
+
+import sys, os
+import argparse
+import contextlib
+import heapq
+import re
+import time
+
+import quickfix as fix
+
+sys.path.insert(0, os.path.join(os.path.dirname(sys.path[0]), 'model'))
+
+from application import Application
+from recorder import SegmentReader, listSegments
+from tradestore import parseTransactTime
+
+## Session level messages are handled by the engine, not by fromApp
+ADMIN = {'0', '1', '2', '3', '4', '5', 'A'}
+
+MSGTYPE = re.compile('\x0135=([^\x01]*)\x01')
+SENDER = re.compile('\x0149=([^\x01]*)\x01')
+
+def readLog(path, sender, symbol=None, start=None, end=None):
+    """
+    Messages of a QuickFIX FileLog ('YYYYMMDD-HH:MM:SS.fff : <raw>') sent by sender
+
+    Return:
+        - generator of (time ns, raw FIX string)
+    """
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            stamp, separator, raw = line.rstrip('\n').partition(' : ')
+            if not separator:
+                continue
+            match = SENDER.search(raw)
+            if match is None or match.group(1) != sender:
+                continue
+            if symbol is not None and '\x0155=%s\x01' % symbol not in raw:
+                continue
+            timestamp = parseTransactTime(stamp)
+            if (start is not None and timestamp < start) or (end is not None and timestamp >= end):
+                continue
+            yield timestamp, raw
+
+def readFiles(paths, sender, symbol=None, start=None, end=None):
+    """
+    Messages of every file merged by receive time
+
+    Return:
+        - generator of (time ns, raw FIX string)
+    """
+    streams = []
+    for path in paths:
+        if os.path.isdir(path):
+            streams += [SegmentReader(segment).messages(symbol, start, end) for segment in listSegments(path)]
+        elif path.endswith('.seg'):
+            streams.append(SegmentReader(path).messages(symbol, start, end))
+        else:
+            streams.append(readLog(path, sender, symbol, start, end))
+    return heapq.merge(*streams, key=lambda message: message[0])
+
+class Replayer(object):
+    """
+    ### Replayer
+
+        - Decodes raw messages with the session (FIXT.1.1) and application (FIX.5.0SP2) dictionaries
+        - speed: 0 (as fast as possible) or multiple of the recorded speed (1 = real time)
+    """
+
+    def __init__(self, application, sessionID, transportDictionary, appDictionary, speed=0.0):
+        self.application = application
+        self.sessionID = sessionID
+        self.transportDictionary = fix.DataDictionary(transportDictionary)
+        self.appDictionary = fix.DataDictionary(appDictionary)
+        self.speed = speed
+
+        ## Session created and logged on, without a counterparty
+        application.onCreate(sessionID)
+        application.sessions[sessionID.getTargetCompID().getValue()]['connected'] = True
+
+    def run(self, messages, limit=None):
+        """
+        Replay messages (time ns, raw)
+
+        Return:
+            - dict: count, skipped, errors, elapsed (s), rate (messages/s)
+        """
+        count, skipped, errors = 0, 0, 0
+        first, begin = None, time.perf_counter()
+
+        for timestamp, raw in messages:
+            match = MSGTYPE.search(raw)
+            if match is None or match.group(1) in ADMIN:
+                skipped += 1
+                continue
+
+            if self.speed > 0:
+                if first is None:
+                    first = timestamp
+                delay = (timestamp - first) / 1e9 / self.speed - (time.perf_counter() - begin)
+                if delay > 0:
+                    time.sleep(delay)
+
+            try:
+                message = fix.Message(raw, self.transportDictionary, self.appDictionary, False)
+                self.application.fromApp(message, self.sessionID)
+            except Exception as error:
+                errors += 1
+                print('Replay error (%s) >> (%s)' % (error, raw.replace('\x01', '|')), file=sys.stderr)
+
+            count += 1
+            if limit is not None and count >= limit:
+                break
+
+        elapsed = time.perf_counter() - begin
+        return {'count'   : count,
+                'skipped' : skipped,
+                'errors'  : errors,
+                'elapsed' : elapsed,
+                'rate'    : count / elapsed if elapsed > 0 else None
+                }
+
+"""
+Main
+"""
+
+if __name__=='__main__':
+
+    parser = argparse.ArgumentParser(description='FIX Replay')
+    parser.add_argument('files', type=str, nargs='+', help='Recorder segments / directories or QuickFIX message logs')
+    parser.add_argument('--speed', type=float, default=0.0, help='0 = maximum speed, 1 = recorded speed, 10 = ten times faster')
+    parser.add_argument('--symbol', type=str, help='Only messages of this symbol (segments)')
+    parser.add_argument('--start', type=str, help='From UTC timestamp (YYYYMMDD-HH:MM:SS)')
+    parser.add_argument('--end', type=str, help='Up to UTC timestamp (YYYYMMDD-HH:MM:SS)')
+    parser.add_argument('--limit', type=int, help='Maximum number of messages')
+    parser.add_argument('--market', type=str, default='ROFX', help='Counterparty (TargetCompID)')
+    parser.add_argument('--user', type=str, default='USER', help='SenderCompID')
+    parser.add_argument('--account', type=str, default='REPLAY', help='Account')
+    parser.add_argument('--transport', type=str, default='conf/spec/FIXT11.xml', help='Transport data dictionary')
+    parser.add_argument('--dictionary', type=str, default='conf/spec/FIX50SP2_rofex.xml', help='Application data dictionary')
+    parser.add_argument('--journal', type=str, default=os.path.join('./Replay', time.strftime('%Y%m%d-%H%M%S')), help='Trade journal of the replay')
+    parser.add_argument('--verbose', action='store_true', help='Keep the console output of the handlers')
+    args = parser.parse_args()
+
+    start = parseTransactTime(args.start) if args.start else None
+    end = parseTransactTime(args.end) if args.end else None
+
+    ## Replayed instruments and trade reports must not end up in the live cache / journal; no WebSocket server
+    application = Application(args.market, args.user, '', args.account, cachePath=':memory:', journalDirectory=args.journal, live=False)
+
+    sessionID = fix.SessionID('FIXT.1.1', args.user, args.market)
+    replayer = Replayer(application, sessionID, args.transport, args.dictionary, args.speed)
+
+    output = open(os.devnull, 'w') if not args.verbose else sys.stdout
+    with contextlib.redirect_stdout(output):
+        result = replayer.run(readFiles(args.files, args.market, args.symbol, start, end), args.limit)
+
+    print(result)
+    application.latency.dump('./Logs/latency-replay.json')
@@ -0,0 +1,688 @@
+# -*- coding: utf-8 -*-
+"""
+ROFEX Simulator
+
+Local FIX acceptor (FIXT.1.1 / FIX.5.0SP2, same conf/spec dictionaries) answering the messages sent by
+Application: Logon (553/554), orders, market data, security list, security status and trade capture.
+Orders are matched by a price-time priority matching engine.
+"""
+
+import sys, os
+import argparse
+import datetime
+import itertools
+import json
+import logging
+import random
+import time
+from threading import Thread, RLock
+
+import quickfix as fix
+import quickfix50sp2 as fix50
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'model'))
+
+from logger import setup_logger
+from matchingengine import MatchingEngine, Order, BUY, SELL
+
+logsim = logging.getLogger('SIM')
+
+def utcTimestamp():
+    return datetime.datetime.utcnow().strftime('%Y%m%d-%H:%M:%S.%f')[:-3]
+
+class Simulator(fix.Application):
+    """Exchange Simulator (FIX Acceptor)"""
+
+    def __init__(self, instruments, users=None, fragmentSize=100):
+        """
+        ### Start Simulator
+
+            - instruments: list of dicts (conf/simulator_instruments.json)
+            - users: dict username -> password (None accepts any credentials)
+            - fragmentSize: instruments per Security List message
+        """
+
+        super().__init__()
+
+        self.instruments = {instrument['symbol'] : instrument for instrument in instruments}
+        self.users = users
+        self.fragmentSize = fragmentSize
+
+        self.lock = RLock()
+        self.engine = MatchingEngine(self.instruments)
+        self.sessions = {}
+        self.subscriptions = {}
+        self.execIds = itertools.count(1)
+        self.responseIds = itertools.count(1)
+
+    def onCreate(self, session):
+        self.sessions[session.toString()] = session
+        logsim.info("onCreate, sessionID >> (%s)" % session)
+
+    def onLogon(self, session):
+        logsim.info("Client (%s) has logged in >>" % session.getTargetCompID().getValue())
+
+        ## Every segment is open
+        for segment in sorted(set(instrument['marketSegmentId'] for instrument in self.instruments.values())):
+            msg = fix50.TradingSessionStatus()
+            msg.setField(fix.TradingSessionID('1'))
+            msg.setField(fix.TradSesStatus(fix.TradSesStatus_OPEN))
+            msg.setField(fix.MarketID(session.getSenderCompID().getValue()))
+            msg.setField(fix.MarketSegmentID(segment))
+            fix.Session.sendToTarget(msg, session)
+
+    def onLogout(self, session):
+        with self.lock:
+            for subscribers in self.subscriptions.values():
+                for key in [key for key in subscribers if key[0] == session.toString()]:
+                    del subscribers[key]
+        logsim.info("Client (%s) has logged out >>" % session.getTargetCompID().getValue())
+
+    def toAdmin(self, message, session):
+        pass
+
+    def fromAdmin(self, message, session):
+        """
+        Logon: validate (553) Username / (554) Password
+        """
+        if self.getHeaderValue(message, fix.MsgType()) != fix.MsgType_Logon or self.users is None:
+            return
+
+        username, password = self.getRaw(message, 553), self.getRaw(message, 554)
+        if username not in self.users or self.users[username] != password:
+            logsim.info("Logon rejected >> (%s)" % username)
+            raise fix.RejectLogon('Invalid username or password')
+
+    def toApp(self, message, session):
+        pass
+
+    def fromApp(self, message, session):
+
+        msgType = self.getHeaderValue(message, fix.MsgType())
+
+        with self.lock:
+            ## Message Type = 'D' - New Order Single
+            if msgType == fix.MsgType_NewOrderSingle:
+                self.onNewOrderSingle(message, session)
+            ## Message Type = 'F' - Order Cancel Request
+            elif msgType == fix.MsgType_OrderCancelRequest:
+                self.onOrderCancelRequest(message, session)
+            ## Message Type = 'G' - Order Cancel/Replace Request
+            elif msgType == fix.MsgType_OrderCancelReplaceRequest:
+                self.onOrderCancelReplaceRequest(message, session)
+            ## Message Type = 'H' - Order Status Request
+            elif msgType == fix.MsgType_OrderStatusRequest:
+                self.onOrderStatusRequest(message, session)
+            ## Message Type = 'AF' - Order Mass Status Request
+            elif msgType == fix.MsgType_OrderMassStatusRequest:
+                self.onOrderMassStatusRequest(message, session)
+            ## Message Type = 'q' - Order Mass Cancel Request
+            elif msgType == fix.MsgType_OrderMassCancelRequest:
+                self.onOrderMassCancelRequest(message, session)
+            ## Message Type = 'V' - Market Data Request
+            elif msgType == fix.MsgType_MarketDataRequest:
+                self.onMarketDataRequest(message, session)
+            ## Message Type = 'x' - Security List Request
+            elif msgType == fix.MsgType_SecurityListRequest:
+                self.onSecurityListRequest(message, session)
+            ## Message Type = 'e' - Security Status Request
+            elif msgType == fix.MsgType_SecurityStatusRequest:
+                self.onSecurityStatusRequest(message, session)
+            ## Message Type = 'AD' - Trade Capture Report Request
+            elif msgType == fix.MsgType_TradeCaptureReportRequest:
+                self.onTradeCaptureReportRequest(message, session)
+            else:
+                self.businessMessageReject(msgType, fix.BusinessRejectReason_UNSUPPORTED_MESSAGE_TYPE, 'Unsupported message type', session)
+
+    """
+    Orders
+    """
+
+    def onNewOrderSingle(self, message, session):
+
+        clOrdId = self.getValue(message, fix.ClOrdID())
+        symbol  = self.getValue(message, fix.Symbol())
+        side    = self.getValue(message, fix.Side())
+        ordType = self.getValue(message, fix.OrdType())
+        account = self.getOptional(message, fix.Account(), '')
+        price   = self.getOptional(message, fix.Price())
+
+        order = Order(self.engine.nextOrderId(), clOrdId, session.toString(), account, symbol, side,
+                      int(self.getValue(message, fix.OrderQty())), price if ordType != fix.OrdType_MARKET else None, ordType)
+
+        reason = self.validate(order)
+        if reason is not None:
+            order.orderId, order.status = 'NONE', fix.OrdStatus_REJECTED
+            self.send(self.executionReport(order, fix.ExecType_REJECTED, reason), session)
+            return
+
+        self.send(self.executionReport(order, fix.ExecType_NEW, 'Order accepted'), session)
+        self.process(order, self.engine.submit(order, utcTimestamp()))
+
+    def onOrderCancelRequest(self, message, session):
+
+        clOrdId = self.getValue(message, fix.ClOrdID())
+        orderId = self.getValue(message, fix.OrderID())
+        order = self.engine.orders.get(orderId)
+
+        if order is None or order.owner != session.toString() or self.engine.cancel(orderId) is None:
+            self.orderCancelReject(clOrdId, order, orderId, fix.CxlRejResponseTo_ORDER_CANCEL_REQUEST, session)
+            return
+
+        order.origClOrdId, order.clOrdId = order.clOrdId, clOrdId
+        self.send(self.executionReport(order, fix.ExecType_CANCELED, 'Order canceled'), session)
+        self.publish(order.symbol)
+
+    def onOrderCancelReplaceRequest(self, message, session):
+
+        clOrdId = self.getValue(message, fix.ClOrdID())
+        orderId = self.getValue(message, fix.OrderID())
+        order = self.engine.orders.get(orderId)
+        quantity = self.getOptional(message, fix.OrderQty())
+
+        if order is None or order.owner != session.toString():
+            self.orderCancelReject(clOrdId, order, orderId, fix.CxlRejResponseTo_ORDER_CANCEL_REPLACE_REQUEST, session)
+            return
+
+        replaced, trades = self.engine.replace(orderId, clOrdId, self.getOptional(message, fix.Price()),
+                                               int(quantity) if quantity is not None else None, utcTimestamp())
+        if replaced is None:
+            self.orderCancelReject(clOrdId, order, orderId, fix.CxlRejResponseTo_ORDER_CANCEL_REPLACE_REQUEST, session)
+            return
+
+        self.send(self.executionReport(replaced, fix.ExecType_REPLACE, 'Order replaced'), session)
+        self.process(replaced, trades)
+
+    def onOrderStatusRequest(self, message, session):
+
+        orderId = self.getValue(message, fix.OrderID())
+        order = self.engine.orders.get(orderId)
+
+        if order is None or order.owner != session.toString():
+            self.businessMessageReject(fix.MsgType_OrderStatusRequest, fix.BusinessRejectReason_UNKNOWN_ID, 'Unknown order %s' % orderId, session)
+            return
+
+        self.send(self.executionReport(order, fix.ExecType_ORDER_STATUS, 'Order status'), session)
+
+    def onOrderMassStatusRequest(self, message, session):
+
+        massStatusReqId = self.getValue(message, fix.MassStatusReqID())
+        securityStatus = self.getOptional(message, fix.SecurityStatus(), '0')
+
+        orders = [order for order in self.engine.orders.values() if order.owner == session.toString()
+                  and (securityStatus == '0' or (securityStatus == '1') == order.isActive())]
+
+        if not orders:
+            ## Empty report (TotNumReports = 0)
+            empty = Order('NONE', 'NONE', None, '', '[N/A]', BUY, 0, 0.0, fix.OrdType_LIMIT)
+            orders, empty.status = [empty], fix.OrdStatus_REJECTED
+            total = 0
+        else:
+            total = len(orders)
+
+        for number, order in enumerate(orders, 1):
+            msg = self.executionReport(order, fix.ExecType_ORDER_STATUS, 'Order status')
+            msg.setField(fix.MassStatusReqID(massStatusReqId))
+            msg.setField(fix.TotNumReports(total))
+            msg.setField(fix.LastRptRequested(number == len(orders)))
+            self.send(msg, session)
+
+    def onOrderMassCancelRequest(self, message, session):
+
+        clOrdId = self.getValue(message, fix.ClOrdID())
+        segment = self.getOptional(message, fix.MarketSegmentID())
+
+        symbols = set()
+        for order in list(self.engine.orders.values()):
+            if order.owner != session.toString() or not order.isActive():
+                continue
+            if segment is not None and self.instruments[order.symbol]['marketSegmentId'] != segment:
+                continue
+            self.engine.cancel(order.orderId)
+            order.origClOrdId, order.clOrdId = order.clOrdId, clOrdId
+            self.send(self.executionReport(order, fix.ExecType_CANCELED, 'Mass cancel'), session)
+            symbols.add(order.symbol)
+
+        for symbol in symbols:
+            self.publish(symbol)
+
+    def validate(self, order):
+        """
+        Reason to reject an order (None if valid)
+        """
+        instrument = self.instruments.get(order.symbol)
+        if instrument is None:
+            return 'Unknown symbol %s' % order.symbol
+        if order.quantity <= 0 or order.quantity > instrument['maxTradeVol']:
+            return 'Invalid quantity %s' % order.quantity
+        if order.price is not None and not instrument['lowLimitPrice'] <= order.price <= instrument['highLimitPrice']:
+            return 'Price %s out of limits' % order.price
+        return None
+
+    def process(self, order, trades):
+        """
+        Execution reports of the trades of an incoming order and market data of its book
+        """
+        for trade in trades:
+            for filled in (trade['aggressor'], trade['resting']):
+                session = self.sessions.get(filled.owner)
+                if session is None:
+                    continue
+                filled.lastPx, filled.lastQty = trade['price'], trade['quantity']
+                self.send(self.executionReport(filled, fix.ExecType_TRADE, 'Trade'), session)
+        self.publish(order.symbol)
+
+    def executionReport(self, order, execType, text):
+        """
+        Execution Report (35=8) with every field read by Application
+        """
+        msg = fix50.ExecutionReport()
+        msg.setField(fix.OrderID(order.orderId))
+        msg.setField(fix.ClOrdID(order.clOrdId))
+        msg.setField(fix.OrigClOrdID(order.origClOrdId))
+        msg.setField(fix.ExecID(str(next(self.execIds))))
+        msg.setField(fix.ExecType(execType))
+        msg.setField(fix.OrdStatus(order.status))
+        msg.setField(fix.Account(order.account or '[N/A]'))
+        msg.setField(fix.Symbol(order.symbol))
+        msg.setField(fix.SecurityExchange('ROFX'))
+        msg.setField(fix.Side(order.side))
+        msg.setField(fix.OrdType(order.ordType))
+        msg.setField(fix.Price(order.price if order.price is not None else 0.0))
+        msg.setField(fix.OrderQty(order.quantity))
+        msg.setField(fix.LeavesQty(order.leavesQty if order.isActive() else 0))
+        msg.setField(fix.CumQty(order.cumQty))
+        msg.setField(fix.AvgPx(order.avgPx))
+        msg.setField(fix.LastPx(order.lastPx))
+        msg.setField(fix.LastQty(order.lastQty))
+        msg.setField(fix.TransactTime())
+        msg.setField(fix.Text(text))
+        return msg
+
+    def orderCancelReject(self, clOrdId, order, orderId, responseTo, session):
+        msg = fix50.OrderCancelReject()
+        msg.setField(fix.ClOrdID(clOrdId))
+        msg.setField(fix.OrigClOrdID(order.clOrdId if order is not None else 'NONE'))
+        msg.setField(fix.OrderID(orderId))
+        msg.setField(fix.OrdStatus(order.status if order is not None else fix.OrdStatus_REJECTED))
+        msg.setField(fix.CxlRejResponseTo(responseTo))
+        msg.setField(fix.CxlRejReason(fix.CxlRejReason_UNKNOWN_ORDER if order is None else fix.CxlRejReason_TOO_LATE_TO_CANCEL))
+        msg.setField(fix.Text('Unknown order' if order is None else 'Order not active'))
+        self.send(msg, session)
+
+    def businessMessageReject(self, refMsgType, reason, text, session):
+        msg = fix50.BusinessMessageReject()
+        msg.setField(fix.RefMsgType(refMsgType))
+        msg.setField(fix.BusinessRejectReason(reason))
+        msg.setField(fix.Text(text))
+        self.send(msg, session)
+
+    """
+    Market Data
+    """
+
+    def onMarketDataRequest(self, message, session):
+
+        mdReqId = self.getValue(message, fix.MDReqID())
+        subscription = self.getValue(message, fix.SubscriptionRequestType())
+        depth = self.getOptional(message, fix.MarketDepth(), 5) or 5
+
+        entries = []
+        group = fix50.MarketDataRequest().NoMDEntryTypes()
+        for entry in range(1, self.getOptional(message, fix.NoMDEntryTypes(), 0)+1):
+            message.getGroup(entry, group)
+            entries.append(self.getValueGroup(group, fix.MDEntryType()))
+
+        symbols = []
+        group = fix50.MarketDataRequest().NoRelatedSym()
+        for relatedSym in range(1, self.getOptional(message, fix.NoRelatedSym(), 0)+1):
+            message.getGroup(relatedSym, group)
+            symbols.append(self.getValueGroup(group, fix.Symbol()))
+
+        for symbol in symbols:
+            if symbol not in self.instruments:
+                msg = fix50.MarketDataRequestReject()
+                msg.setField(fix.MDReqID(mdReqId))
+                msg.setField(fix.MDReqRejReason(fix.MDReqRejReason_UNKNOWN_SYMBOL))
+                self.send(msg, session)
+                continue
+
+            key = (session.toString(), mdReqId)
+            subscribers = self.subscriptions.setdefault(symbol, {})
+            if subscription == fix.SubscriptionRequestType_DISABLE_PREVIOUS_SNAPSHOT_PLUS_UPDATE_REQUEST:
+                subscribers.pop(key, None)
+                continue
+            if subscription == fix.SubscriptionRequestType_SNAPSHOT_PLUS_UPDATES:
+                subscribers[key] = (session, entries, depth)
+            self.send(self.marketDataSnapshot(symbol, mdReqId, entries, depth), session)
+
+    def publish(self, symbol):
+        """
+        Send a Market Data Snapshot to every subscriber of symbol
+        """
+        for (_, mdReqId), (session, entries, depth) in list(self.subscriptions.get(symbol, {}).items()):
+            self.send(self.marketDataSnapshot(symbol, mdReqId, entries, depth), session)
+
+    def marketDataSnapshot(self, symbol, mdReqId, entries, depth):
+        """
+        Market Data Snapshot / Full Refresh (35=W)
+        """
+        book = self.engine.books[symbol]
+        bids, offers = book.depth(depth)
+
+        msg = fix50.MarketDataSnapshotFullRefresh()
+        msg.setField(fix.MDReqID(mdReqId))
+        msg.setField(fix.Symbol(symbol))
+        msg.setField(fix.SecurityExchange('ROFX'))
+
+        rows = []
+        if fix.MDEntryType_BID in entries:
+            rows += [(fix.MDEntryType_BID, price, size, position) for position, (price, size) in enumerate(bids, 1)]
+        if fix.MDEntryType_OFFER in entries:
+            rows += [(fix.MDEntryType_OFFER, price, size, position) for position, (price, size) in enumerate(offers, 1)]
+        if fix.MDEntryType_TRADE in entries and book.lastPx is not None:
+            rows.append((fix.MDEntryType_TRADE, book.lastPx, book.lastQty, None))
+        if fix.MDEntryType_TRADE_VOLUME in entries:
+            rows.append((fix.MDEntryType_TRADE_VOLUME, None, book.volume, None))
+
+        msg.setField(fix.NoMDEntries(0))
+        group = fix50.MarketDataSnapshotFullRefresh().NoMDEntries()
+        for entryType, price, size, position in rows:
+            group = fix50.MarketDataSnapshotFullRefresh().NoMDEntries()
+            group.setField(fix.MDEntryType(entryType))
+            if price is not None:
+                group.setField(fix.MDEntryPx(price))
+            if size is not None:
+                group.setField(fix.MDEntrySize(size))
+            if position is not None:
+                group.setField(fix.MDEntryPositionNo(position))
+            msg.addGroup(group)
+
+        return msg
+
+    """
+    Security Definition
+    """
+
+    def onSecurityListRequest(self, message, session):
+
+        securityReqId = self.getValue(message, fix.SecurityReqID())
+        requestType = self.getValue(message, fix.SecurityListRequestType())
+        symbol = self.getOptional(message, fix.Symbol())
+        cfiCode = self.getOptional(message, fix.CFICode(), symbol)
+
+        instruments = sorted(self.instruments.values(), key=lambda instrument: (instrument['marketSegmentId'], instrument['symbol']))
+        if requestType == fix.SecurityListRequestType_SYMBOL:
+            instruments = [instrument for instrument in instruments if instrument['symbol'] == symbol]
+        elif requestType == fix.SecurityListRequestType_SECURITYTYPE_AND_OR_CFICODE:
+            instruments = [instrument for instrument in instruments if instrument['cfiCode'].startswith(cfiCode or '')]
+
+        ## One fragment per segment and fragmentSize instruments (MarketSegmentID is message level)
+        fragments = []
+        for instrument in instruments:
+            if not fragments or len(fragments[-1]) == self.fragmentSize or fragments[-1][0]['marketSegmentId'] != instrument['marketSegmentId']:
+                fragments.append([])
+            fragments[-1].append(instrument)
+
+        for number, fragment in enumerate(fragments, 1):
+            msg = fix50.SecurityList()
+            msg.setField(fix.SecurityReqID(securityReqId))
+            msg.setField(fix.SecurityResponseID(str(next(self.responseIds))))
+            msg.setField(fix.SecurityListRequestType(requestType))
+            msg.setField(fix.SecurityRequestResult(fix.SecurityRequestResult_VALID_REQUEST))
+            msg.setField(fix.TotNoRelatedSym(len(instruments)))
+            msg.setField(fix.LastFragment(number == len(fragments)))
+            msg.setField(fix.MarketSegmentID(fragment[0]['marketSegmentId']))
+            for instrument in fragment:
+                msg.addGroup(self.securityListGroup(instrument))
+            self.send(msg, session)
+
+    def securityListGroup(self, instrument):
+        """
+        NoRelatedSym entry of a Security List (every field read by Application.getInstrument)
+        """
+        group = fix50.SecurityList().NoRelatedSym()
+        group.setField(fix.Symbol(instrument['symbol']))
+        group.setField(fix.SecurityDesc(instrument['securityDesc']))
+        group.setField(fix.Factor(instrument['factor']))
+        group.setField(fix.CFICode(instrument['cfiCode']))
+        group.setField(fix.ContractMultiplier(instrument['contractMultiplier']))
+        group.setField(fix.MaturityDate(instrument['maturityDate']))
+        if 'strikePrice' in instrument:
+            group.setField(fix.StrikePrice(instrument['strikePrice']))
+            group.setField(fix.StrikeCurrency(instrument['currency']))
+        group.setField(fix.MinPriceIncrement(instrument['minPriceIncrement']))
+        group.setField(5023, str(instrument['tickSize']))
+        group.setField(5514, str(instrument['instrumentPricePrecision']))
+        group.setField(7117, str(instrument['instrumentSizePrecision']))
+        group.setField(fix.Currency(instrument['currency']))
+        group.setField(fix.MaxTradeVol(instrument['maxTradeVol']))
+        group.setField(fix.MinTradeVol(instrument['minTradeVol']))
+        group.setField(fix.LowLimitPrice(instrument['lowLimitPrice']))
+        group.setField(fix.HighLimitPrice(instrument['highLimitPrice']))
+
+        underlying = fix50.SecurityList().NoRelatedSym().NoUnderlyings()
+        underlying.setField(fix.UnderlyingSymbol(instrument['underlyingSymbol']))
+        group.addGroup(underlying)
+
+        return group
+
+    def onSecurityStatusRequest(self, message, session):
+
+        securityStatusReqId = self.getValue(message, fix.SecurityStatusReqID())
+        symbol = self.getOptional(message, fix.Symbol(), '[N/A]')
+
+        for instrument in sorted(self.instruments):
+            if symbol != '[N/A]' and instrument != symbol:
+                continue
+            msg = fix50.SecurityStatus()
+            msg.setField(fix.SecurityStatusReqID(securityStatusReqId))
+            msg.setField(fix.Symbol(instrument))
+            msg.setField(fix.SecurityTradingStatus(fix.SecurityTradingStatus_READY_TO_TRADE))
+            self.send(msg, session)
+
+    """
+    Post Trade
+    """
+
+    def onTradeCaptureReportRequest(self, message, session):
+
+        tradeRequestId = self.getValue(message, fix.TradeRequestID())
+        symbol = self.getOptional(message, fix.Symbol())
+
+        account = None
+        group = fix50.TradeCaptureReportRequest().NoPartyIDs()
+        for party in range(1, self.getOptional(message, fix.NoPartyIDs(), 0)+1):
+            message.getGroup(party, group)
+            account = self.getValueGroup(group, fix.PartyID())
+
+        since = None
+        group = fix50.TradeCaptureReportRequest().NoDates()
+        for date in range(1, min(self.getOptional(message, fix.NoDates(), 0), 1)+1):
+            message.getGroup(date, group)
+            since = self.getStringGroup(group, fix.TransactTime())
+
+        reports = []
+        for trade in self.engine.trades:
+            if (symbol is not None and trade['symbol'] != symbol) or (since is not None and trade['transactTime'] < since):
+                continue
+            for side, order in ((BUY, trade['buy']), (SELL, trade['sell'])):
+                if order.owner == session.toString() and (account is None or order.account == account):
+                    reports.append((trade, side, order))
+
+        for number, (trade, side, order) in enumerate(reports, 1):
+            msg = fix50.TradeCaptureReport()
+            msg.setField(fix.TradeRequestID(tradeRequestId))
+            msg.setField(fix.TotNumTradeReports(len(reports)))
+            msg.setField(fix.LastRptRequested(number == len(reports)))
+            msg.setField(fix.TradeReportID('%s-%s' % (trade['tradeId'], side)))
+            msg.setField(fix.TrdType(fix.TrdType_REGULAR_TRADE))
+            transactTime = fix.TransactTime()
+            transactTime.setString(trade['transactTime'])
+            msg.setField(transactTime)
+            msg.setField(fix.PreviouslyReported(False))
+            msg.setField(fix.LastPx(trade['price']))
+            msg.setField(fix.LastQty(trade['quantity']))
+            msg.setField(fix.Symbol(trade['symbol']))
+            msg.setField(fix.ExecID(trade['tradeId']))
+            msg.setField(fix.SecurityExchange('ROFX'))
+            msg.setField(fix.CFICode(self.instruments[trade['symbol']]['cfiCode']))
+
+            sides = fix50.TradeCaptureReport().NoSides()
+            sides.setField(fix.Side(side))
+            sides.setField(fix.OrderID(order.orderId))
+            sides.setField(fix.Account(order.account or '[N/A]'))
+            sides.setField(fix.AggressorIndicator(trade['aggressor'] is order))
+            msg.addGroup(sides)
+
+            self.send(msg, session)
+
+    """
+    Wrappers
+    """
+
+    def send(self, msg, session):
+        fix.Session.sendToTarget(msg, session)
+
+    def getValue(self, message, field):
+        message.getField(field)
+        return field.getValue()
+
+    def getOptional(self, message, field, default=None):
+        if not message.isSetField(field.getTag()):
+            return default
+        message.getField(field)
+        return field.getValue()
+
+    def getHeaderValue(self, message, field):
+        message.getHeader().getField(field)
+        return field.getValue()
+
+    def getValueGroup(self, group, field):
+        group.getField(field)
+        return field.getValue()
+
+    def getStringGroup(self, group, field):
+        group.getField(field)
+        return field.getString()
+
+    def getRaw(self, message, tag):
+        for fields in (message.getHeader(), message):
+            if fields.isSetField(tag):
+                return fields.getField(tag)
+        return None
+
+class MarketMaker(Thread):
+    """
+    ### Market Maker
+
+    Keeps two-sided quotes around a random-walk reference price and crosses the spread from time to time,
+    generating market data (and trades) at a given rate.
+    """
+
+    def __init__(self, simulator, rate=10.0, levels=5, tradeRatio=0.2):
+        Thread.__init__(self)
+        self.daemon = True
+        self.simulator = simulator
+        self.rate = rate
+        self.levels = levels
+        self.tradeRatio = tradeRatio
+        self.quotes = {}
+        self.reference = {symbol : instrument['referencePrice'] for symbol, instrument in simulator.instruments.items()}
+        self.running = True
+
+    def quote(self, symbol):
+        """
+        Replace the quotes of symbol around its reference price
+        """
+        engine = self.simulator.engine
+        tick = self.simulator.instruments[symbol]['minPriceIncrement']
+        for order in self.quotes.get(symbol, []):
+            engine.cancel(order.orderId)
+
+        reference = self.reference[symbol]
+        orders = []
+        for level in range(1, self.levels+1):
+            for side, sign in ((BUY, -1), (SELL, 1)):
+                price = round(reference + sign * level * tick, 6)
+                order = Order(engine.nextOrderId(), 'MM', None, 'SIM', symbol, side, random.randint(1, 50), price, fix.OrdType_LIMIT)
+                trades = engine.submit(order, utcTimestamp())
+                ## A quote crossing a resting user order fills it: execution reports like any other order
+                if trades:
+                    self.simulator.process(order, trades)
+                orders.append(order)
+        self.quotes[symbol] = orders
+
+    def step(self):
+        symbol = random.choice(list(self.reference))
+        tick = self.simulator.instruments[symbol]['minPriceIncrement']
+        with self.simulator.lock:
+            if random.random() < self.tradeRatio:
+                side = random.choice((BUY, SELL))
+                order = Order(self.simulator.engine.nextOrderId(), 'MM', None, 'SIM', symbol, side, random.randint(1, 5), None, fix.OrdType_MARKET)
+                self.simulator.process(order, self.simulator.engine.submit(order, utcTimestamp()))
+            else:
+                self.reference[symbol] = round(self.reference[symbol] + random.choice((-1, 0, 1)) * tick, 6)
+                self.quote(symbol)
+                self.simulator.publish(symbol)
+
+    def run(self):
+        with self.simulator.lock:
+            for symbol in self.reference:
+                self.quote(symbol)
+        while self.running:
+            if self.rate > 0:
+                self.step()
+                time.sleep(1.0 / self.rate)
+            else:
+                time.sleep(0.5)
+
+    def stop(self):
+        self.running = False
+
+def startSimulator(config_file='conf/simulator.cfg', instruments_file='conf/simulator_instruments.json', users=None, rate=0.0):
+    """
+    Start the acceptor (and the market maker)
+
+    Return:
+        - tuple: (acceptor, simulator, marketMaker)
+    """
+    with open(instruments_file) as f:
+        instruments = json.load(f)
+
+    settings = fix.SessionSettings(config_file)
+    simulator = Simulator(instruments, users)
+    storefactory = fix.MemoryStoreFactory()
+    logfactory = fix.FileLogFactory(settings)
+    acceptor = fix.SocketAcceptor(simulator, storefactory, settings, logfactory)
+    acceptor.start()
+
+    marketMaker = MarketMaker(simulator, rate)
+    marketMaker.start()
+
+    return acceptor, simulator, marketMaker
+
+"""
+Main
+"""
+
+if __name__=='__main__':
+
+    parser = argparse.ArgumentParser(description='ROFEX Simulator')
+    parser.add_argument('file_name', type=str, nargs='?', default='conf/simulator.cfg', help='Name of configuration file')
+    parser.add_argument('--instruments', type=str, default='conf/simulator_instruments.json', help='Instrument definitions (JSON)')
+    parser.add_argument('--user', action='append', default=[], help='USER:PASSWORD accepted on Logon (any if not given)')
+    parser.add_argument('--rate', type=float, default=10.0, help='Market maker updates per second (0 = static book)')
+    args = parser.parse_args()
+
+    setup_logger('SIM', './Logs/simulator.log')
+
+    users = dict(user.split(':', 1) for user in args.user) if args.user else None
+    acceptor, simulator, marketMaker = startSimulator(args.file_name, args.instruments, users, args.rate)
+
+    try:
+        while 1:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        marketMaker.stop()
+        acceptor.stop()
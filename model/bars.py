@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+OHLCV Bars
+
+Bars per symbol and interval (i.e. 1s, 1m, 5m) built from the trade entries of the market data,
+kept in fixed capacity NumPy ring buffers. A bar is closed by the first trade of the next period
+or by the clock when the period ends without trades.
+"""
+
+import time
+import threading
+
+import numpy as np
+
+BAR = np.dtype([('start', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+                ('volume', '<f8'), ('trades', '<i8')])
+
+def barDict(bar, interval):
+    return {'start'    : int(bar['start']),
+            'interval' : interval,
+            'open'     : float(bar['open']),
+            'high'     : float(bar['high']),
+            'low'      : float(bar['low']),
+            'close'    : float(bar['close']),
+            'volume'   : float(bar['volume']),
+            'trades'   : int(bar['trades'])
+            }
+
+class BarRing(object):
+    """
+    ### Bar Ring
+
+        - Last capacity closed bars (oldest overwritten), chronological reads
+    """
+
+    def __init__(self, capacity):
+        self.bars = np.zeros(capacity, dtype=BAR)
+        self.capacity = capacity
+        self.position = 0
+        self.count = 0
+
+    def append(self, bar):
+        self.bars[self.position] = bar
+        self.position = (self.position + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def view(self, start=None, end=None, limit=None):
+        """
+        Closed bars with start <= bar start < end (copy, oldest first)
+        """
+        indexes = (self.position - self.count + np.arange(self.count)) % self.capacity
+        bars = self.bars[indexes]
+        if start is not None:
+            bars = bars[bars['start'] >= start]
+        if end is not None:
+            bars = bars[bars['start'] < end]
+        if limit is not None:
+            bars = bars[-limit:]
+        return bars
+
+class BarAggregator(object):
+    """
+    ### Bar Aggregator
+
+        - intervals: bar sizes in seconds; capacity: closed bars kept per symbol and interval
+        - onTrade(symbol, price, size, volume): a snapshot repeats the last trade, so a trade counts only when the
+          cumulative trade volume (entry B) grows, or without it when the trade differs from the previous one
+        - onClose(symbol, interval, bar): called for every closed bar (dict, start in seconds since epoch)
+        - Times are receive times (seconds since epoch)
+    """
+
+    def __init__(self, intervals=(1, 60, 300), capacity=1440, onClose=None):
+        self.intervals = tuple(intervals)
+        self.capacity = capacity
+        self.onClose = onClose
+
+        self.rings = {}
+        self.current = {}
+        self.lastTrade = {}
+        self.lock = threading.Lock()
+
+    def ring(self, symbol, interval):
+        try:
+            return self.rings[(symbol, interval)]
+        except KeyError:
+            return self.rings.setdefault((symbol, interval), BarRing(self.capacity))
+
+    def onTrade(self, symbol, price, size, volume=None, timestamp=None):
+        """
+        Trade entry of a snapshot
+
+        Return:
+            - bool: True if it was a new trade
+        """
+        previous = self.lastTrade.get(symbol)
+        self.lastTrade[symbol] = (price, size, volume)
+        if previous is None:
+            ## First snapshot: the last trade happened before the subscription
+            return False
+        if volume is not None and previous[2] is not None:
+            if volume <= previous[2]:
+                return False
+            size = volume - previous[2]
+        elif (price, size) == previous[:2]:
+            return False
+
+        now = timestamp if timestamp is not None else time.time()
+        closed = []
+        with self.lock:
+            for interval in self.intervals:
+                start = int(now // interval * interval)
+                bar = self.current.get((symbol, interval))
+                if bar is not None and bar['start'] != start:
+                    closed.append(self.close(symbol, interval))
+                    bar = None
+                if bar is None:
+                    self.current[(symbol, interval)] = {'start' : start, 'open' : price, 'high' : price, 'low' : price,
+                                                        'close' : price, 'volume' : size, 'trades' : 1}
+                else:
+                    bar['high'] = max(bar['high'], price)
+                    bar['low'] = min(bar['low'], price)
+                    bar['close'] = price
+                    bar['volume'] += size
+                    bar['trades'] += 1
+        self.publish(closed)
+        return True
+
+    def close(self, symbol, interval):
+        bar = self.current.pop((symbol, interval))
+        self.ring(symbol, interval).append(tuple(bar[name] for name in BAR.names))
+        return symbol, interval, dict(bar, interval=interval)
+
+    def flush(self, now=None):
+        """
+        Close the bars whose period has ended (clock)
+        """
+        now = now if now is not None else time.time()
+        with self.lock:
+            closed = [self.close(symbol, interval) for (symbol, interval), bar in list(self.current.items())
+                      if now >= bar['start'] + interval]
+        self.publish(closed)
+
+    def publish(self, closed):
+        if self.onClose is not None:
+            for symbol, interval, bar in closed:
+                self.onClose(symbol, interval, bar)
+
+    def history(self, symbol, interval, start=None, end=None, limit=None, current=False):
+        """
+        Closed bars of symbol (oldest first), plus the bar in progress if current
+
+        Return:
+            - list of dicts: start, interval, open, high, low, close, volume, trades (empty for a symbol without
+              trades or an interval not aggregated)
+        """
+        with self.lock:
+            ring = self.rings.get((symbol, interval))
+            bars = [barDict(bar, interval) for bar in ring.view(start, end, limit)] if ring is not None else []
+            if current and (symbol, interval) in self.current:
+                bars.append(dict(self.current[(symbol, interval)], interval=interval))
+        return bars
+
+class BarClock(threading.Thread):
+    """
+    ### Bar Clock
+
+        - Closes the bars of the aggregator every resolution seconds even without trades
+    """
+
+    def __init__(self, aggregator, resolution=0.25):
+        threading.Thread.__init__(self, name='BarClock')
+        self.daemon = True
+        self.aggregator = aggregator
+        self.resolution = resolution
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.resolution):
+            self.aggregator.flush()
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Book Analytics
+
+Derived values of a book computed once per update by the engine: spread, mid, microprice,
+top of book imbalance and depth weighted prices, in plain Python (a few levels per book: packing
+them into NumPy arrays costs more than the arithmetic, even for batches of books).
+"""
+
+FIELDS = ('spread', 'mid', 'microprice', 'imbalance', 'bidVwap', 'offerVwap', 'depthImbalance')
+
+def bookAnalytics(bids, offers):
+    """
+    Analytics of a book
+
+    Arguments:
+        - bids / offers: [{'price', 'size'}] best first (as broadcast in marketData BI / OF)
+
+    Return:
+        - dict: FIELDS -> float (the fields of a missing side are left out)
+    """
+    result = {}
+
+    bidSize = offerSize = bidNotional = offerNotional = 0.0
+    for level in bids:
+        bidSize += level['size']
+        bidNotional += level['price'] * level['size']
+    for level in offers:
+        offerSize += level['size']
+        offerNotional += level['price'] * level['size']
+
+    if bidSize:
+        result['bidVwap'] = bidNotional / bidSize
+    if offerSize:
+        result['offerVwap'] = offerNotional / offerSize
+    if bidSize + offerSize:
+        result['depthImbalance'] = (bidSize - offerSize) / (bidSize + offerSize)
+
+    if not bids or not offers:
+        return result
+
+    bid, offer = bids[0], offers[0]
+    result['spread'] = offer['price'] - bid['price']
+    result['mid'] = (offer['price'] + bid['price']) / 2
+    top = bid['size'] + offer['size']
+    if top:
+        ## Microprice: each side weighted by the size of the opposite side
+        result['microprice'] = (bid['price'] * offer['size'] + offer['price'] * bid['size']) / top
+        result['imbalance'] = (bid['size'] - offer['size']) / top
+    return result
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Implied Calendar Spreads
+
+Futures curves (outrights of an underlying ordered by maturity, from the instrument registry) with
+their implied prices, published as synthetic instruments:
+
+    - implied spreads (implied out): far - near from the tops of the two outrights, for every pair of
+      consecutive maturities and every listed calendar spread
+    - implied outrights (implied in): an outright from a listed calendar spread and its other leg
+
+Synthetic instruments have their own instrumentId symbol ('implied:' + the spread or outright they
+price, in the 'symbol' field), so consumers keyed on instrumentId never mix them with the real books.
+
+A top of book change only recomputes the prices that use it (the pairs of the leg), in plain Python
+over preindexed lists: a few levels per curve, where NumPy call overhead would dominate.
+"""
+
+import threading
+
+from instruments import maturityKey
+
+## Missing sides: -inf bid / +inf offer (sums and differences stay missing, max / min skip them)
+INF = float('inf')
+
+IMPLIED = 'implied:'
+
+def impliedId(symbol):
+    """
+    instrumentId symbol of the implied price of symbol (never the one of a real book)
+    """
+    return IMPLIED + symbol
+
+def spreadLegs(symbol, outrights):
+    """
+    Legs of a listed calendar spread ('DLR/OCT23/NOV23' -> 'DLR/OCT23', 'DLR/NOV23')
+
+    Return:
+        - tuple: (near, far) or None when symbol is not a spread of outrights
+    """
+    parts = [part.strip() for part in symbol.split('/')]
+    if len(parts) < 3:
+        return None
+    near, far = '/'.join(parts[:-1]), '/'.join(parts[:-2] + parts[-1:])
+    if near in outrights and far in outrights:
+        return outrights[near], outrights[far]
+    return None
+
+def quoteDict(quote):
+    """
+    Synthetic book in the layout of the market data (a missing side is an empty list)
+    """
+    bidPx, bidSize, offerPx, offerSize = quote
+    return {'BI' : [{'price' : bidPx, 'size' : bidSize, 'position' : 1}] if bidPx != -INF else [],
+            'OF' : [{'price' : offerPx, 'size' : offerSize, 'position' : 1}] if offerPx != INF else []
+            }
+
+class Curve(object):
+    """
+    ### Curve
+
+        - outrights: symbols ordered by maturity; tops as parallel lists (bidPx, bidSize, offerPx, offerSize)
+        - pairs: (near index, far index, symbol, listed spread index or None) of the implied spreads
+        - listed: (near index, far index, symbol) of the listed calendar spreads, with their tops
+        - pairsByLeg / listedByLeg: outright index -> pairs / listed spreads using it
+    """
+
+    def __init__(self, underlying, venue, outrights, listed):
+        self.underlying = underlying
+        self.venue = venue
+        self.outrights = outrights
+        count = len(outrights)
+        self.bidPx, self.bidSize = [-INF] * count, [0.0] * count
+        self.offerPx, self.offerSize = [INF] * count, [0.0] * count
+
+        self.listed = listed
+        self.spreadTops = [[-INF, 0.0, INF, 0.0] for _ in listed]
+        self.listedByLeg = [[] for _ in range(count)]
+        for index, (near, far, _) in enumerate(listed):
+            self.listedByLeg[near].append(index)
+            self.listedByLeg[far].append(index)
+
+        ## Consecutive maturities and listed spreads (named after the listed spread if there is one)
+        bySpread = {(near, far) : index for index, (near, far, _) in enumerate(listed)}
+        keys = sorted(set((index, index + 1) for index in range(count - 1)) | set(bySpread))
+        self.pairs = [(near, far, listed[bySpread[(near, far)]][2] if (near, far) in bySpread else '%s/%s' % (outrights[near], outrights[far]),
+                       bySpread.get((near, far))) for near, far in keys]
+        self.pairsByLeg = [[] for _ in range(count)]
+        for index, (near, far, _, _) in enumerate(self.pairs):
+            self.pairsByLeg[near].append(index)
+            self.pairsByLeg[far].append(index)
+
+        ## Last published quote of every synthetic instrument (and its static fields)
+        self.spreads = [None] * len(self.pairs)
+        self.implied = [None] * count
+        self.spreadFields = [{'instrumentId' : {'symbol' : impliedId(symbol), 'marketId' : venue},
+                              'symbol'       : symbol,
+                              'kind'         : 'spread',
+                              'underlying'   : underlying,
+                              'listed'       : int(listed is not None),
+                              'legs'         : [outrights[near], outrights[far]]
+                              } for near, far, symbol, listed in self.pairs]
+        self.outrightFields = [{'instrumentId' : {'symbol' : impliedId(outrights[leg]), 'marketId' : venue},
+                                'symbol'       : outrights[leg],
+                                'kind'         : 'outright',
+                                'underlying'   : underlying,
+                                'legs'         : [self.listed[index][2] for index in self.listedByLeg[leg]]
+                                } for leg in range(count)]
+
+    def impliedSpread(self, index):
+        """
+        Buy the spread = buy far / sell near (price far - near)
+        """
+        near, far = self.pairs[index][:2]
+        return (self.bidPx[far] - self.offerPx[near], min(self.bidSize[far], self.offerSize[near]),
+                self.offerPx[far] - self.bidPx[near], min(self.offerSize[far], self.bidSize[near]))
+
+    def impliedOutright(self, leg):
+        """
+        Best implied top of an outright over the listed spreads using it
+        """
+        bidPx, bidSize, offerPx, offerSize = -INF, 0.0, INF, 0.0
+        for index in self.listedByLeg[leg]:
+            near, far, _ = self.listed[index]
+            spreadBid, spreadBidSize, spreadOffer, spreadOfferSize = self.spreadTops[index]
+            if leg == far:
+                ## Sell far = sell the spread + sell near; buy far = buy the spread + buy near
+                bid, bidQty = self.bidPx[near] + spreadBid, min(self.bidSize[near], spreadBidSize)
+                offer, offerQty = self.offerPx[near] + spreadOffer, min(self.offerSize[near], spreadOfferSize)
+            else:
+                ## Sell near = buy the spread + sell far; buy near = sell the spread + buy far
+                bid, bidQty = self.bidPx[far] - spreadOffer, min(self.bidSize[far], spreadOfferSize)
+                offer, offerQty = self.offerPx[far] - spreadBid, min(self.offerSize[far], spreadBidSize)
+            if bid > bidPx or (bid == bidPx and bidQty > bidSize):
+                bidPx, bidSize = bid, bidQty
+            if offer < offerPx or (offer == offerPx and offerQty > offerSize):
+                offerPx, offerSize = offer, offerQty
+        return (bidPx, bidSize, offerPx, offerSize)
+
+    def spreadInstrument(self, index):
+        return dict(self.spreadFields[index], marketData=quoteDict(self.spreads[index]))
+
+    def outrightInstrument(self, leg):
+        return dict(self.outrightFields[leg], marketData=quoteDict(self.implied[leg]))
+
+class ImpliedEngine(object):
+    """
+    ### Implied Engine
+
+        - load(instruments): curves of the futures (CFICode F...) grouped by underlying, ordered by maturity;
+          a future whose symbol is '<near outright>/<far month>' is a listed calendar spread
+        - onTop(symbol, bidPx, bidSize, offerPx, offerSize): top of book of a leg (None price on a missing side)
+        - Return of onTop: synthetic instruments whose price changed (nothing for symbols outside every curve)
+        - quotes(underlying) / definitions(): current synthetic instruments and curve definitions
+    """
+
+    def __init__(self):
+        self.curves = {}
+        self.legs = {}
+        self.tops = {}
+        self.lock = threading.Lock()
+
+    def load(self, instruments):
+        """
+        Rebuild the curves (tops received so far are kept)
+        """
+        byUnderlying = {}
+        for instrument in instruments:
+            underlying = instrument.get('underlyingSymbol')
+            if underlying and str(instrument.get('cfiCode', '')).startswith('F'):
+                byUnderlying.setdefault(underlying, []).append(instrument)
+
+        curves, legs = {}, {}
+        for underlying, futures in byUnderlying.items():
+            symbols = {instrument['symbol'].strip() : instrument['symbol'] for instrument in futures}
+            spreads = {instrument['symbol'] : spreadLegs(instrument['symbol'], symbols) for instrument in futures}
+            outrights = sorted((instrument for instrument in futures if spreads[instrument['symbol']] is None),
+                               key=lambda instrument: (maturityKey(instrument), instrument['symbol']))
+            if len(outrights) < 2:
+                continue
+            outrights = [instrument['symbol'] for instrument in outrights]
+            indexes = {symbol : index for index, symbol in enumerate(outrights)}
+            listed = sorted((indexes[pair[0]], indexes[pair[1]], symbol) for symbol, pair in spreads.items() if pair is not None)
+
+            curve = curves[underlying] = Curve(underlying, futures[0].get('venue'), outrights, listed)
+            for index, symbol in enumerate(outrights):
+                legs[symbol] = (curve, False, index)
+            for index, (_, _, symbol) in enumerate(listed):
+                legs[symbol] = (curve, True, index)
+
+        with self.lock:
+            self.curves, self.legs = curves, legs
+            tops, self.tops = self.tops, {}
+        for symbol, (bidPx, bidSize, offerPx, offerSize) in tops.items():
+            self.onTop(symbol, bidPx if bidPx != -INF else None, bidSize, offerPx if offerPx != INF else None, offerSize)
+
+    def onTop(self, symbol, bidPx, bidSize, offerPx, offerSize):
+        leg = self.legs.get(symbol)
+        if leg is None:
+            return ()
+        curve, isSpread, index = leg
+        top = (bidPx if bidPx is not None else -INF, bidSize or 0.0, offerPx if offerPx is not None else INF, offerSize or 0.0)
+        with self.lock:
+            if self.tops.get(symbol) == top:
+                return ()
+            self.tops[symbol] = top
+
+            changed = []
+            if isSpread:
+                curve.spreadTops[index][:] = top
+                near, far, _ = curve.listed[index]
+                outrights = (near, far)
+            else:
+                curve.bidPx[index], curve.bidSize[index], curve.offerPx[index], curve.offerSize[index] = top
+                for pair in curve.pairsByLeg[index]:
+                    quote = curve.impliedSpread(pair)
+                    if quote != curve.spreads[pair]:
+                        curve.spreads[pair] = quote
+                        changed.append(curve.spreadInstrument(pair))
+                ## The other legs of the listed spreads of the outright
+                outrights = [other for spread in curve.listedByLeg[index] for other in curve.listed[spread][:2] if other != index]
+
+            for other in outrights:
+                quote = curve.impliedOutright(other)
+                if quote != curve.implied[other]:
+                    curve.implied[other] = quote
+                    changed.append(curve.outrightInstrument(other))
+            return changed
+
+    def quotes(self, underlying=None):
+        with self.lock:
+            curves = [self.curves[underlying]] if underlying in self.curves else [] if underlying is not None else list(self.curves.values())
+            result = []
+            for curve in curves:
+                result += [curve.spreadInstrument(index) for index in range(len(curve.pairs)) if curve.spreads[index] is not None]
+                result += [curve.outrightInstrument(leg) for leg in range(len(curve.outrights)) if curve.implied[leg] is not None]
+            return result
+
+    def definitions(self):
+        """
+        Curve definitions: underlying -> outrights (by maturity), synthetic spreads and listed spreads
+        """
+        with self.lock:
+            return {underlying : {'outrights' : list(curve.outrights),
+                                  'spreads'   : [pair[2] for pair in curve.pairs],
+                                  'listed'    : [spread[2] for spread in curve.listed]
+                                  }
+                    for underlying, curve in self.curves.items()}
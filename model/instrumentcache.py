@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Instrument Cache
+
+Local SQLite store of the instrument definitions received in Security List messages.
+"""
+
+import os
+import json
+import sqlite3
+import datetime
+from threading import Lock
+
+class InstrumentCache(object):
+    """
+    ### Instrument Cache
+
+        - One row per symbol with the parsed instrument definition (JSON) and its venue
+        - Daily validity stamp per venue (tradeDate/<venue>) stored in the meta table: a venue is valid once its
+          complete Security List was received on the current trade date
+    """
+
+    def __init__(self, path='./Cache/instruments.db'):
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.path = path
+        self.lock = Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+
+        with self.lock, self.conn:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS instruments (symbol TEXT PRIMARY KEY, marketSegmentId TEXT, data TEXT)')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            ## Caches of a single venue had no venue column
+            if 'venue' not in [row[1] for row in self.conn.execute('PRAGMA table_info(instruments)')]:
+                self.conn.execute('ALTER TABLE instruments ADD COLUMN venue TEXT')
+                self.conn.execute("UPDATE instruments SET venue = json_extract(data, '$.venue')")
+            self.conn.execute('CREATE INDEX IF NOT EXISTS instruments_venue ON instruments (venue)')
+
+    def getTradeDate(self, venue):
+        """
+        Trade date of the last complete download of venue (None if never stamped)
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key=?", ('tradeDate/%s' % venue,)).fetchone()
+        return row[0] if row else None
+
+    def isValid(self, venue, today=None):
+        """
+        The instruments of venue are valid when they were stamped on the current trade date
+        """
+        if today is None:
+            today = datetime.date.today().isoformat()
+        return self.getTradeDate(venue) == today
+
+    def stamp(self, venue, today=None):
+        """
+        Mark the instruments of venue as valid for the current trade date
+        """
+        if today is None:
+            today = datetime.date.today().isoformat()
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", ('tradeDate/%s' % venue, today))
+
+    def validVenues(self, today=None):
+        """
+        Venues stamped on the current trade date
+        """
+        if today is None:
+            today = datetime.date.today().isoformat()
+        with self.lock:
+            rows = self.conn.execute("SELECT key FROM meta WHERE key LIKE 'tradeDate/%' AND value=?", (today,)).fetchall()
+        return [key[len('tradeDate/'):] for key, in rows]
+
+    def load(self, venues=None):
+        """
+        Load the cached instruments (of venues, default: every venue)
+
+        Return:
+            - dict: symbol -> instrument details
+        """
+        with self.lock:
+            if venues is None:
+                rows = self.conn.execute('SELECT symbol, data FROM instruments').fetchall()
+            else:
+                venues = list(venues)
+                rows = self.conn.execute('SELECT symbol, data FROM instruments WHERE venue IN (%s)' % ','.join('?' * len(venues)), venues).fetchall()
+        return {symbol : json.loads(data) for symbol, data in rows}
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM instruments').fetchone()[0]
+
+    def upsert(self, tickers):
+        """
+        Insert or replace instruments in a single transaction
+
+        Arguments:
+            - tickers: list of dicts (as parsed in onMessage_SecurityList)
+        """
+        rows = [(ticker['symbol'], ticker.get('marketSegmentId'), ticker.get('venue'), json.dumps(ticker)) for ticker in tickers]
+        with self.lock, self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO instruments (symbol, marketSegmentId, venue, data) VALUES (?, ?, ?, ?)', rows)
+
+    def delete(self, symbols):
+        """
+        Remove instruments no longer listed by the exchange
+        """
+        with self.lock, self.conn:
+            self.conn.executemany('DELETE FROM instruments WHERE symbol = ?', [(symbol,) for symbol in symbols])
+
+    def clear(self, venue=None):
+        """
+        Drop the instruments and the validity stamp of venue (default: every venue) before a full download
+        """
+        with self.lock, self.conn:
+            if venue is None:
+                self.conn.execute('DELETE FROM instruments')
+                self.conn.execute("DELETE FROM meta WHERE key LIKE 'tradeDate%'")
+            else:
+                self.conn.execute('DELETE FROM instruments WHERE venue = ?', (venue,))
+                self.conn.execute('DELETE FROM meta WHERE key = ?', ('tradeDate/%s' % venue,))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
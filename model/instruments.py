@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Instrument Registry
+
+In-memory instrument definitions with secondary indexes (underlying, CFI code, maturity, segment)
+and symbol prefix search.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from threading import RLock
+
+def maturityKey(instrument):
+    """
+    Sortable maturity ('YYYYMMDD'), instruments without maturity go last
+    """
+    maturity = instrument.get('maturityDate')
+    if maturity:
+        return str(maturity)
+    maturity = instrument.get('maturityMonthYear')
+    if maturity:
+        return str(maturity) + '00'
+    return '99999999'
+
+def sortKey(instrument):
+    return (maturityKey(instrument), float(instrument.get('strikePrice') or 0), instrument['symbol'])
+
+class InstrumentRegistry(object):
+    """
+    ### Instrument Registry
+
+        - bySymbol: symbol -> instrument details
+        - Secondary indexes: key -> sorted list of (maturity, strike, symbol)
+        - symbols: sorted list of symbols for prefix search
+    """
+
+    INDEXES = {'underlying'  : 'underlyingSymbol',
+               'cfiCode'     : 'cfiCode',
+               'maturity'    : 'maturityDate',
+               'segment'     : 'marketSegmentId'
+               }
+
+    def __init__(self, instruments=None):
+        self.lock = RLock()
+        self.load(instruments or {})
+
+    def load(self, instruments):
+        """
+        Rebuild every index from a dict of symbol -> instrument details
+        """
+        with self.lock:
+            self.bySymbol = {}
+            self.indexes = {name : {} for name in self.INDEXES}
+            for instrument in instruments.values():
+                self.bySymbol[instrument['symbol']] = instrument
+                for name, field in self.INDEXES.items():
+                    value = instrument.get(field)
+                    if value is not None:
+                        self.indexes[name].setdefault(value, []).append(sortKey(instrument))
+            for index in self.indexes.values():
+                for entries in index.values():
+                    entries.sort()
+            self.symbols = sorted(self.bySymbol)
+
+    def add(self, instrument):
+        """
+        Insert or replace an instrument
+        """
+        with self.lock:
+            symbol = instrument['symbol']
+            if symbol in self.bySymbol:
+                self.remove(symbol)
+            self.bySymbol[symbol] = instrument
+            insort(self.symbols, symbol)
+            for name, field in self.INDEXES.items():
+                value = instrument.get(field)
+                if value is not None:
+                    insort(self.indexes[name].setdefault(value, []), sortKey(instrument))
+
+    def remove(self, symbol):
+        with self.lock:
+            instrument = self.bySymbol.pop(symbol, None)
+            if instrument is None:
+                return None
+            del self.symbols[bisect_left(self.symbols, symbol)]
+            key = sortKey(instrument)
+            for name, field in self.INDEXES.items():
+                value = instrument.get(field)
+                if value is None:
+                    continue
+                entries = self.indexes[name][value]
+                del entries[bisect_left(entries, key)]
+                if not entries:
+                    del self.indexes[name][value]
+            return instrument
+
+    def clear(self):
+        self.load({})
+
+    def get(self, symbol, default=None):
+        return self.bySymbol.get(symbol, default)
+
+    def __getitem__(self, symbol):
+        return self.bySymbol[symbol]
+
+    def __contains__(self, symbol):
+        return symbol in self.bySymbol
+
+    def __len__(self):
+        return len(self.bySymbol)
+
+    def values(self):
+        return list(self.bySymbol.values())
+
+    """
+    Queries
+    """
+
+    def lookup(self, index, value):
+        """
+        Instruments of one index entry, ordered by maturity, strike and symbol
+        """
+        with self.lock:
+            return [self.bySymbol[key[2]] for key in self.indexes[index].get(value, [])]
+
+    def search(self, prefix):
+        """
+        Symbols starting with prefix (sorted)
+        """
+        with self.lock:
+            start = bisect_left(self.symbols, prefix)
+            end = bisect_right(self.symbols, prefix + '\uffff')
+            return self.symbols[start:end]
+
+    def byCfiCode(self, prefix):
+        """
+        Instruments whose CFICode starts with prefix (i.e. 'F' futures, 'OC' calls, 'OP' puts)
+        """
+        with self.lock:
+            codes = [code for code in self.indexes['cfiCode'] if code.startswith(prefix)]
+            keys = sorted(key for code in codes for key in self.indexes['cfiCode'][code])
+            return [self.bySymbol[key[2]] for key in keys]
+
+    def futures(self, underlying):
+        """
+        Futures on an underlying ordered by maturity
+        """
+        return [instrument for instrument in self.lookup('underlying', underlying) if str(instrument.get('cfiCode', '')).startswith('F')]
+
+    def maturities(self, underlying):
+        """
+        Distinct maturities listed for an underlying (sorted)
+        """
+        with self.lock:
+            return sorted(set(key[0] for key in self.indexes['underlying'].get(underlying, []) if key[0] != '99999999'))
+
+    def optionChain(self, underlying, maturityDate=None):
+        """
+        Option chain of an underlying (optionally for one expiry)
+
+        Return:
+            - dict: {'calls': [...], 'puts': [...]} ordered by maturity and strike
+        """
+        chain = {'calls' : [], 'puts' : []}
+        for instrument in self.lookup('underlying', underlying):
+            if maturityDate is not None and maturityKey(instrument) != str(maturityDate):
+                continue
+            cfiCode = str(instrument.get('cfiCode', ''))
+            if cfiCode.startswith('OC'):
+                chain['calls'].append(instrument)
+            elif cfiCode.startswith('OP'):
+                chain['puts'].append(instrument)
+        return chain
+
+    def query(self, prefix=None, underlying=None, cfiCode=None, maturityDate=None, segment=None):
+        """
+        Instruments matching every given criteria (starting from the most selective index)
+        """
+        with self.lock:
+            if underlying is not None:
+                candidates = self.lookup('underlying', underlying)
+            elif maturityDate is not None:
+                candidates = self.lookup('maturity', maturityDate)
+            elif segment is not None:
+                candidates = self.lookup('segment', segment)
+            elif cfiCode is not None:
+                candidates = self.byCfiCode(cfiCode)
+            elif prefix is not None:
+                candidates = [self.bySymbol[symbol] for symbol in self.search(prefix)]
+            else:
+                candidates = [self.bySymbol[symbol] for symbol in self.symbols]
+
+            return [instrument for instrument in candidates
+                    if (prefix is None or instrument['symbol'].startswith(prefix))
+                    and (underlying is None or instrument.get('underlyingSymbol') == underlying)
+                    and (cfiCode is None or str(instrument.get('cfiCode', '')).startswith(cfiCode))
+                    and (maturityDate is None or instrument.get('maturityDate') == maturityDate)
+                    and (segment is None or instrument.get('marketSegmentId') == segment)]
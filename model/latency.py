@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Latency Recorder
+
+HDR-style (log-linear) latency histograms per message type and processing stage,
+fed with monotonic timestamps (perf_counter_ns) taken along the FIX callbacks.
+"""
+
+import json
+import time
+import threading
+
+class LatencyHistogram(object):
+    """
+    ### Latency Histogram
+
+        - Values in nanoseconds, 2^precision linear sub-buckets per power of two (relative error < 2^-(precision-1))
+        - record is O(1) (one list increment), percentiles walk the buckets
+    """
+
+    def __init__(self, precision=8, maxValue=60 * 10**9):
+        self.precision = precision
+        self.subBuckets = 1 << precision
+        self.halfBuckets = self.subBuckets >> 1
+        self.counts = [0] * (self.index(maxValue) + 1)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def index(self, value):
+        shift = value.bit_length() - self.precision
+        if shift <= 0:
+            return value
+        return self.subBuckets + (shift - 1) * self.halfBuckets + (value >> shift) - self.halfBuckets
+
+    def value(self, index):
+        """
+        Highest value of a bucket
+        """
+        if index < self.subBuckets:
+            return index
+        shift, sub = divmod(index - self.subBuckets, self.halfBuckets)
+        shift += 1
+        return ((sub + self.halfBuckets + 1) << shift) - 1
+
+    def record(self, value):
+        if value < 0:
+            return
+        index = self.index(value)
+        if index >= len(self.counts):
+            index = len(self.counts) - 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if self.min is None or value < self.min:
+            self.min = value
+
+    def percentile(self, percentile):
+        if self.count == 0:
+            return None
+        target = max(1, int(round(self.count * percentile / 100.0)))
+        accumulated = 0
+        for index, count in enumerate(self.counts):
+            accumulated += count
+            if accumulated >= target:
+                return min(self.value(index), self.max)
+        return self.max
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.count, self.total, self.min, self.max = 0, 0, None, 0
+
+    def summary(self):
+        """
+        Count, mean, min, max and percentiles (nanoseconds)
+        """
+        return {'count' : self.count,
+                'mean'  : self.total / self.count if self.count else None,
+                'min'   : self.min,
+                'max'   : self.max,
+                'p50'   : self.percentile(50),
+                'p90'   : self.percentile(90),
+                'p99'   : self.percentile(99),
+                'p999'  : self.percentile(99.9)
+                }
+
+class LatencyRecorder(object):
+    """
+    ### Latency Recorder
+
+        - begin(msgType): callback entry (thread local)
+        - mark(stage): records the time elapsed since the previous mark as stage
+        - stage(stage, value): records an already measured duration (does not move the mark)
+        - end(): records 'total' since begin
+        - histograms: msgType -> stage -> LatencyHistogram
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def histogram(self, msgType, stage):
+        try:
+            return self.histograms[msgType][stage]
+        except KeyError:
+            with self.lock:
+                return self.histograms.setdefault(msgType, {}).setdefault(stage, LatencyHistogram())
+
+    def record(self, msgType, stage, value):
+        if self.enabled:
+            self.histogram(msgType, stage).record(value)
+
+    def begin(self, msgType):
+        if self.enabled:
+            local = self.local
+            local.msgType = msgType
+            local.start = local.last = time.perf_counter_ns()
+
+    def mark(self, stage):
+        local = self.local
+        if self.enabled and getattr(local, 'msgType', None) is not None:
+            now = time.perf_counter_ns()
+            self.histogram(local.msgType, stage).record(now - local.last)
+            local.last = now
+
+    def stage(self, stage, value):
+        msgType = getattr(self.local, 'msgType', None)
+        if self.enabled and msgType is not None:
+            self.histogram(msgType, stage).record(value)
+
+    def end(self):
+        local = self.local
+        if self.enabled and getattr(local, 'msgType', None) is not None:
+            self.histogram(local.msgType, 'total').record(time.perf_counter_ns() - local.start)
+            local.msgType = None
+
+    def snapshot(self, reset=False):
+        """
+        Summary of every histogram (nanoseconds)
+
+        Return:
+            - dict: msgType -> stage -> summary
+        """
+        with self.lock:
+            result = {msgType : {stage : histogram.summary() for stage, histogram in stages.items()}
+                      for msgType, stages in self.histograms.items()}
+            if reset:
+                for stages in self.histograms.values():
+                    for histogram in stages.values():
+                        histogram.reset()
+        return result
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Matching Engine
+
+Price-time priority limit order books used by the local exchange simulator.
+"""
+
+import itertools
+from bisect import bisect_left, insort
+
+BUY = '1'
+SELL = '2'
+
+class Order(object):
+    """
+    ### Order
+
+        - Sides '1' (Buy) / '2' (Sell), OrdStatus '0' (New) / '1' (Partially Filled) / '2' (Filled) / '4' (Canceled)
+    """
+
+    def __init__(self, orderId, clOrdId, owner, account, symbol, side, quantity, price, ordType):
+        self.orderId   = orderId
+        self.clOrdId   = clOrdId
+        self.origClOrdId = clOrdId
+        self.owner     = owner
+        self.account   = account
+        self.symbol    = symbol
+        self.side      = side
+        self.quantity  = quantity
+        self.price     = price
+        self.ordType   = ordType
+        self.leavesQty = quantity
+        self.cumQty    = 0
+        self.avgPx     = 0.0
+        self.lastPx    = 0.0
+        self.lastQty   = 0
+        self.status    = '0'
+
+    def fill(self, price, quantity):
+        self.avgPx = (self.avgPx * self.cumQty + price * quantity) / (self.cumQty + quantity)
+        self.cumQty += quantity
+        self.leavesQty -= quantity
+        self.lastPx = price
+        self.lastQty = quantity
+        self.status = '2' if self.leavesQty == 0 else '1'
+
+    def isActive(self):
+        return self.status in ('0', '1')
+
+class OrderBook(object):
+    """
+    ### Order Book
+
+        - bids/offers: sorted list of price levels, levels: price -> list of orders (time priority)
+    """
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.levels = {BUY : {}, SELL : {}}
+        self.prices = {BUY : [], SELL : []}   # ascending
+        self.lastPx = None
+        self.lastQty = None
+        self.volume = 0
+
+    def best(self, side):
+        prices = self.prices[side]
+        if not prices:
+            return None
+        return prices[-1] if side == BUY else prices[0]
+
+    def add(self, order):
+        level = self.levels[order.side].get(order.price)
+        if level is None:
+            level = self.levels[order.side][order.price] = []
+            insort(self.prices[order.side], order.price)
+        level.append(order)
+
+    def remove(self, order):
+        level = self.levels[order.side].get(order.price)
+        if level is None or order not in level:
+            return False
+        level.remove(order)
+        if not level:
+            del self.levels[order.side][order.price]
+            prices = self.prices[order.side]
+            del prices[bisect_left(prices, order.price)]
+        return True
+
+    def match(self, order):
+        """
+        Match an incoming order against the opposite side
+
+        Return:
+            - list of (resting order, price, quantity)
+        """
+        fills = []
+        opposite = SELL if order.side == BUY else BUY
+        while order.leavesQty > 0:
+            price = self.best(opposite)
+            if price is None:
+                break
+            if order.price is not None and ((order.side == BUY and price > order.price) or (order.side == SELL and price < order.price)):
+                break
+            level = self.levels[opposite][price]
+            resting = level[0]
+            quantity = min(order.leavesQty, resting.leavesQty)
+            order.fill(price, quantity)
+            resting.fill(price, quantity)
+            if resting.leavesQty == 0:
+                self.remove(resting)
+            self.lastPx, self.lastQty = price, quantity
+            self.volume += quantity
+            fills.append((resting, price, quantity))
+        return fills
+
+    def depth(self, levels=5):
+        """
+        Aggregated price levels
+
+        Return:
+            - tuple: (bids, offers) lists of (price, size) from most to least competitive
+        """
+        bids = [(price, sum(order.leavesQty for order in self.levels[BUY][price])) for price in reversed(self.prices[BUY][-levels:])]
+        offers = [(price, sum(order.leavesQty for order in self.levels[SELL][price])) for price in self.prices[SELL][:levels]]
+        return bids, offers
+
+class MatchingEngine(object):
+    """
+    ### Matching Engine
+
+        - books: symbol -> OrderBook
+        - orders: orderId -> Order
+        - trades: list of executed trades (buy order, sell order, price, quantity, transactTime)
+    """
+
+    def __init__(self, symbols=()):
+        self.books = {symbol : OrderBook(symbol) for symbol in symbols}
+        self.orders = {}
+        self.trades = []
+        self.orderIds = itertools.count(1)
+        self.tradeIds = itertools.count(1)
+
+    def nextOrderId(self):
+        return str(next(self.orderIds))
+
+    def submit(self, order, transactTime=None):
+        """
+        New order: match and rest the remaining quantity (limit orders)
+
+        Return:
+            - list of trades generated (dict)
+        """
+        book = self.books[order.symbol]
+        self.orders[order.orderId] = order
+        trades = []
+        for resting, price, quantity in book.match(order):
+            buy, sell = (order, resting) if order.side == BUY else (resting, order)
+            trade = {'tradeId'      : str(next(self.tradeIds)),
+                     'symbol'       : order.symbol,
+                     'price'        : price,
+                     'quantity'     : quantity,
+                     'buy'          : buy,
+                     'sell'         : sell,
+                     'aggressor'    : order,
+                     'resting'      : resting,
+                     'transactTime' : transactTime
+                     }
+            self.trades.append(trade)
+            trades.append(trade)
+        if order.leavesQty > 0:
+            if order.price is None:
+                ## Market order: the remaining quantity is canceled
+                order.status = '4'
+            else:
+                book.add(order)
+        return trades
+
+    def cancel(self, orderId):
+        """
+        Cancel an active order (None if unknown or no longer active)
+        """
+        order = self.orders.get(orderId)
+        if order is None or not order.isActive():
+            return None
+        self.books[order.symbol].remove(order)
+        order.status = '4'
+        return order
+
+    def replace(self, orderId, clOrdId, price=None, quantity=None, transactTime=None):
+        """
+        Cancel/Replace: the original order is canceled and a new one (new OrderID, lost priority) is submitted
+
+        Return:
+            - tuple: (new order, trades) or (None, []) if the order cannot be replaced
+        """
+        original = self.cancel(orderId)
+        if original is None:
+            return None, []
+        order = Order(self.nextOrderId(), clOrdId, original.owner, original.account, original.symbol, original.side,
+                      quantity if quantity is not None else original.leavesQty,
+                      price if price is not None else original.price, original.ordType)
+        order.origClOrdId = original.clOrdId
+        return order, self.submit(order, transactTime)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Metrics
+
+Counters and gauges rendered in the Prometheus text exposition format (version 0.0.4).
+"""
+
+import threading
+
+def formatLabels(names, values):
+    if not names:
+        return ''
+    pairs = ('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+             for name, value in zip(names, values))
+    return '{%s}' % ','.join(pairs)
+
+def formatValue(value):
+    if value is None:
+        return 'NaN'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+class Counter(object):
+    """
+    ### Counter
+
+        - Counts per thread (label values -> int), only written by their own thread: inc never takes a lock
+          (but on the first increment of a thread)
+        - Scrapes sum the counts of every thread (threads gone included)
+        - inc(*labels)
+    """
+
+    type = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.shards = []
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def shard(self):
+        counts = self.local.counts = {}
+        with self.lock:
+            self.shards.append(counts)
+        return counts
+
+    def inc(self, *labels):
+        try:
+            counts = self.local.counts
+        except AttributeError:
+            counts = self.shard()
+        counts[labels] = counts.get(labels, 0) + 1
+
+    def totals(self):
+        with self.lock:
+            shards = list(self.shards)
+        totals = {}
+        for counts in shards:
+            for labels, count in list(counts.items()):
+                totals[labels] = totals.get(labels, 0) + count
+        return totals
+
+    def value(self, *labels):
+        return self.totals().get(labels, 0)
+
+    def samples(self):
+        return iter(self.totals().items())
+
+class Gauge(object):
+    """
+    ### Gauge
+
+        - Evaluated on scrape by a callback: nothing is computed on the hot path
+        - callback returns a value (no labels) or a dict label value(s) -> value
+    """
+
+    type = 'gauge'
+
+    def __init__(self, name, help, callback, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.callback = callback
+
+    def samples(self):
+        value = self.callback()
+        if not self.labels:
+            yield (), value
+            return
+        for labels, sample in value.items():
+            yield labels if isinstance(labels, tuple) else (labels,), sample
+
+class MetricsRegistry(object):
+    """
+    ### Metrics Registry
+
+        - counter / gauge: register (or return the already registered) metric
+        - render: Prometheus text format
+    """
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self, prefix=''):
+        self.prefix = prefix
+        self.metrics = {}
+
+    def counter(self, name, help, labels=()):
+        return self.metrics.setdefault(name, Counter(self.prefix + name, help, labels))
+
+    def gauge(self, name, help, callback, labels=()):
+        return self.metrics.setdefault(name, Gauge(self.prefix + name, help, callback, labels))
+
+    def render(self):
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append('# HELP %s %s' % (metric.name, metric.help))
+            lines.append('# TYPE %s %s' % (metric.name, metric.type))
+            try:
+                for labels, value in metric.samples():
+                    lines.append('%s%s %s' % (metric.name, formatLabels(metric.labels, labels), formatValue(value)))
+            except Exception:
+                ## A failing callback must not break the whole scrape
+                continue
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+Option Chain Analytics
+
+Implied volatility and greeks of whole option chains (options of an underlying and maturity, from the
+instrument registry) with Black-76 (options on futures), vectorized with NumPy: every strike, call and
+put, and the bid / offer / mid prices of a chain are solved at once.
+
+Books only mark their chain; a clock recomputes the marked chains at most once per interval and
+publishes each chain as a whole.
+"""
+
+import math
+import time
+import threading
+
+import numpy as np
+
+from instruments import maturityKey
+
+SQRT2PI = math.sqrt(2 * math.pi)
+
+def normPdf(x):
+    return np.exp(-0.5 * x * x) / SQRT2PI
+
+def normCdf(x):
+    """
+    Standard normal CDF (Abramowitz & Stegun 26.2.17, error < 7.5e-8)
+    """
+    t = 1.0 / (1.0 + 0.2316419 * np.abs(x))
+    poly = t * (0.319381530 + t * (-0.356563782 + t * (1.781477937 + t * (-1.821255978 + t * 1.330274429))))
+    upper = normPdf(x) * poly
+    return np.where(x >= 0, 1.0 - upper, upper)
+
+def black76(forward, strike, expiry, rate, sigma, isCall):
+    """
+    Black-76 price and vega (per 1.00 of volatility)
+
+    Arguments:
+        - forward, strike, expiry (years), rate, sigma: arrays (broadcast)
+        - isCall: bool array
+    """
+    discount = np.exp(-rate * expiry)
+    deviation = sigma * np.sqrt(expiry)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d1 = (np.log(forward / strike) + 0.5 * deviation * deviation) / deviation
+    d2 = d1 - deviation
+    call = discount * (forward * normCdf(d1) - strike * normCdf(d2))
+    ## Put-call parity
+    price = np.where(isCall, call, call - discount * (forward - strike))
+    vega = discount * forward * normPdf(d1) * np.sqrt(expiry)
+    return price, vega
+
+def impliedVolatility(price, forward, strike, expiry, rate, isCall, iterations=40, tolerance=1e-9, low=1e-4, high=5.0):
+    """
+    Black-76 implied volatility: Newton steps kept inside a bisection bracket (the price grows with the volatility),
+    until every step is below tolerance (volatility units)
+
+    Return:
+        - array: volatility (NaN for prices outside the no arbitrage bounds, missing prices or no convergence)
+    """
+    price, forward, strike, expiry = np.broadcast_arrays(*(np.asarray(value, dtype=np.float64) for value in (price, forward, strike, expiry)))
+    isCall = np.broadcast_to(isCall, price.shape)
+    discount = np.exp(-rate * expiry)
+    intrinsic = discount * np.where(isCall, np.maximum(forward - strike, 0.0), np.maximum(strike - forward, 0.0))
+    upper = discount * np.where(isCall, forward, strike)
+    with np.errstate(invalid='ignore'):
+        valid = (price > intrinsic) & (price < upper) & (expiry > 0) & (forward > 0)
+
+    ## Solve the out of the money option of the strike (put-call parity): in the money ones have almost no vega
+    isCall, price = strike >= forward, price + discount * (forward - strike) * ((strike >= forward) & ~isCall) \
+                                           - discount * (forward - strike) * ((strike < forward) & isCall)
+
+    lo, hi = np.full(price.shape, low), np.full(price.shape, high)
+    ## Brenner-Subrahmanyam (at the money) as first guess
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma = np.clip(np.sqrt(2 * np.pi / expiry) * price / (discount * forward), low, high)
+    sigma = np.where(valid, sigma, 0.2)
+    for _ in range(iterations):
+        value, vega = black76(forward, strike, expiry, rate, sigma, isCall)
+        diff = value - price
+        hi = np.where(diff > 0, sigma, hi)
+        lo = np.where(diff > 0, lo, sigma)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            step = diff / vega
+            newton = (sigma - step >= lo) & (sigma - step <= hi)
+        sigma = np.where(newton, sigma - step, 0.5 * (lo + hi))
+        if not np.any(valid & ~(np.abs(step) < tolerance)):
+            break
+    value, _ = black76(forward, strike, expiry, rate, sigma, isCall)
+    converged = np.abs(value - price) <= 1e-6 * np.maximum(price, 1.0)
+    return np.where(valid & converged, sigma, np.nan)
+
+def greeks(forward, strike, expiry, rate, sigma, isCall):
+    """
+    Black-76 greeks: delta, gamma, vega (per volatility point) and theta (per calendar day)
+    """
+    discount = np.exp(-rate * expiry)
+    root = np.sqrt(expiry)
+    deviation = sigma * root
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d1 = (np.log(forward / strike) + 0.5 * deviation * deviation) / deviation
+        density = normPdf(d1)
+        price, _ = black76(forward, strike, expiry, rate, sigma, isCall)
+        return {'delta' : discount * np.where(isCall, normCdf(d1), normCdf(d1) - 1.0),
+                'gamma' : discount * density / (forward * deviation),
+                'vega'  : discount * forward * density * root / 100,
+                'theta' : (rate * price - discount * forward * density * sigma / (2 * root)) / 365
+                }
+
+def expiryTime(maturity):
+    """
+    Expiry as seconds since epoch: end of the maturity date ('YYYYMMDD', local time)
+    """
+    return time.mktime(time.strptime(maturity[:8], '%Y%m%d')) + 86400
+
+class Chain(object):
+    """
+    ### Chain
+
+        - Options of an underlying and maturity ordered by strike: symbols, strikes, isCall and
+          bid / offer arrays (NaN on a missing side)
+        - dirty: a book of the chain (or its underlying) moved since the last computation
+    """
+
+    def __init__(self, underlying, maturity, options):
+        self.underlying = underlying
+        self.maturity = maturity
+        self.expiry = expiryTime(maturity)
+        self.symbols = [option['symbol'] for option in options]
+        self.strikes = np.array([float(option['strikePrice']) for option in options])
+        self.isCall = np.array([str(option.get('cfiCode', '')).startswith('OC') for option in options])
+        self.bid = np.full(len(options), np.nan)
+        self.offer = np.full(len(options), np.nan)
+        self.dirty = False
+        self.computed = 0.0
+        self.result = None
+
+class OptionChainEngine(object):
+    """
+    ### Option Chain Engine
+
+        - load(instruments): chains of the options (CFICode OC... / OP...) grouped by underlying and maturity
+        - onTop(symbol, bidPx, offerPx, lastPx): top of book of an option or an underlying (None on a missing side);
+          stores the prices and marks the chains, nothing is computed on the market data thread
+        - flush(): recomputes the marked chains computed more than interval seconds ago, onUpdate(result) for each
+        - Underlying price: mid of its book (last trade while a side is missing); option IV on bid, offer and mid
+        - rate: continuously compounded rate of the Black-76 discount factor
+    """
+
+    def __init__(self, interval=0.5, rate=0.0, onUpdate=None):
+        self.interval = interval
+        self.rate = rate
+        self.onUpdate = onUpdate
+
+        self.chains = {}
+        self.options = {}
+        self.underlyings = {}
+        self.prices = {}
+        self.tops = {}
+        self.lock = threading.Lock()
+
+    def load(self, instruments):
+        """
+        Rebuild the chains (prices received so far are kept)
+        """
+        byChain = {}
+        for instrument in instruments:
+            cfiCode = str(instrument.get('cfiCode', ''))
+            if (cfiCode.startswith('OC') or cfiCode.startswith('OP')) and instrument.get('underlyingSymbol') \
+                    and instrument.get('strikePrice') is not None and maturityKey(instrument) != '99999999':
+                byChain.setdefault((instrument['underlyingSymbol'], maturityKey(instrument)), []).append(instrument)
+
+        chains, options, underlyings = {}, {}, {}
+        for key, group in byChain.items():
+            group.sort(key=lambda option: (float(option['strikePrice']), str(option.get('cfiCode', '')), option['symbol']))
+            chain = chains[key] = Chain(key[0], key[1], group)
+            for index, symbol in enumerate(chain.symbols):
+                options[symbol] = (chain, index)
+            underlyings.setdefault(key[0], []).append(chain)
+
+        with self.lock:
+            for symbol, (chain, index) in options.items():
+                if symbol in self.tops:
+                    chain.bid[index], chain.offer[index] = self.tops[symbol]
+                    chain.dirty = True
+            self.chains, self.options, self.underlyings = chains, options, underlyings
+
+    def onTop(self, symbol, bidPx, offerPx, lastPx=None):
+        option = self.options.get(symbol)
+        chains = self.underlyings.get(symbol)
+        if option is None and chains is None:
+            return False
+        bidPx = bidPx if bidPx is not None else np.nan
+        offerPx = offerPx if offerPx is not None else np.nan
+        with self.lock:
+            if option is not None:
+                chain, index = option
+                chain.bid[index], chain.offer[index] = self.tops[symbol] = (bidPx, offerPx)
+                chain.dirty = True
+            if chains is not None:
+                if bidPx == bidPx and offerPx == offerPx:
+                    price = (bidPx + offerPx) / 2
+                else:
+                    price = lastPx if lastPx is not None else self.prices.get(symbol)
+                if price != self.prices.get(symbol):
+                    self.prices[symbol] = price
+                    for chain in chains:
+                        chain.dirty = True
+        return True
+
+    def flush(self, now=None):
+        now = now if now is not None else time.time()
+        with self.lock:
+            chains = [chain for chain in self.chains.values() if chain.dirty and now - chain.computed >= self.interval]
+            inputs = []
+            for chain in chains:
+                chain.dirty = False
+                chain.computed = now
+                inputs.append((chain, self.prices.get(chain.underlying), chain.bid.copy(), chain.offer.copy()))
+
+        for chain, forward, bid, offer in inputs:
+            chain.result = self.compute(chain, forward, bid, offer, now)
+            if self.onUpdate is not None:
+                self.onUpdate(chain.result)
+
+    def compute(self, chain, forward, bid, offer, now):
+        """
+        IV (bid, offer, mid) and greeks (at the mid IV) of every option of the chain
+
+        Return:
+            - dict: underlying, maturityDate, underlyingPrice, timeToExpiry (years), rate, time,
+              options: [{symbol, strike, putCall, bid, offer, iv, bidIv, offerIv, delta, gamma, vega, theta}]
+              (values that cannot be computed are left out)
+        """
+        expiry = max(chain.expiry - now, 0.0) / (365 * 86400)
+        count = len(chain.symbols)
+        result = {'underlying'      : chain.underlying,
+                  'maturityDate'    : chain.maturity,
+                  'timeToExpiry'    : expiry,
+                  'rate'            : self.rate,
+                  'time'            : now
+                  }
+        columns = {'bid' : bid, 'offer' : offer}
+        if forward is not None:
+            result['underlyingPrice'] = forward
+            mid = (bid + offer) / 2
+            ## One solve for the three prices of every option
+            ivs = impliedVolatility(np.concatenate((mid, bid, offer)), forward, np.tile(chain.strikes, 3), expiry, self.rate,
+                                    np.tile(chain.isCall, 3)).reshape(3, count)
+            columns.update(iv=ivs[0], bidIv=ivs[1], offerIv=ivs[2])
+            columns.update(greeks(forward, chain.strikes, expiry, self.rate, ivs[0], chain.isCall))
+
+        names = list(columns)
+        rows = zip(*(columns[name].tolist() for name in names))
+        result['options'] = [dict([('symbol', symbol), ('strike', strike), ('putCall', 'C' if isCall else 'P')] +
+                                  [(name, value) for name, value in zip(names, row) if value == value])
+                             for symbol, strike, isCall, row in zip(chain.symbols, chain.strikes.tolist(), chain.isCall.tolist(), rows)]
+        return result
+
+    def snapshot(self, underlying=None, maturity=None):
+        """
+        Last computed chains (optionally of one underlying / maturity)
+        """
+        with self.lock:
+            chains = list(self.chains.values())
+        return [chain.result for chain in chains if chain.result is not None
+                and (underlying is None or chain.underlying == underlying) and (maturity is None or chain.maturity == str(maturity))]
+
+class ChainClock(threading.Thread):
+    """
+    ### Chain Clock
+
+        - Recomputes the marked chains of the engine every resolution seconds (off the market data thread)
+    """
+
+    def __init__(self, engine, resolution=0.1):
+        threading.Thread.__init__(self, name='ChainClock')
+        self.daemon = True
+        self.engine = engine
+        self.resolution = resolution
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.resolution):
+            self.engine.flush()
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+FIX Recorder
+
+Raw inbound FIX messages with their receive timestamp, written by a background thread
+into rotating append-only segments of zlib compressed blocks, with a per-segment index
+(block offset, time range and symbols) to seek by symbol and time.
+"""
+
+import os
+import re
+import json
+import time
+import zlib
+import datetime
+import threading
+from bisect import bisect_right
+from collections import deque
+
+SYMBOL = re.compile(b'\x0155=([^\x01]*)')
+
+class FixRecorder(object):
+    """
+    ### FIX Recorder
+
+        - record(raw): O(1) append to a deque with the receive time (ns), nothing else on the callback thread
+        - Segment <directory>/fix-YYYYMMDD-HHMMSS-N.seg: concatenated zlib blocks
+        - Index <segment>.idx: one JSON line per block {offset, length, count, first, last, symbols}
+        - Block record: '<time ns>' TAB '<raw FIX>' LF
+        - A block is written when it reaches blockSize bytes or flushInterval seconds,
+          a new segment is started when the current one reaches segmentSize bytes
+    """
+
+    def __init__(self, directory='./Recordings', segmentSize=64 * 2**20, blockSize=256 * 2**10, flushInterval=1.0, level=6):
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.directory = directory
+        self.segmentSize = segmentSize
+        self.blockSize = blockSize
+        self.flushInterval = flushInterval
+        self.level = level
+
+        self.queue = deque()
+        self.event = threading.Event()
+        self.running = True
+        self.segments = 0
+        self.segment = None
+        self.index = None
+        self.dropped = 0
+
+        self.thread = threading.Thread(target=self.run, name='FixRecorder')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def record(self, raw, timestamp=None):
+        """
+        Queue a raw FIX message (string) received at timestamp (ns since epoch, default: now)
+        """
+        self.queue.append((timestamp if timestamp is not None else time.time_ns(), raw))
+
+    """
+    Writer (background thread)
+    """
+
+    def open(self):
+        self.segments += 1
+        name = 'fix-%s-%04d' % (datetime.datetime.now().strftime('%Y%m%d-%H%M%S'), self.segments)
+        path = os.path.join(self.directory, name + '.seg')
+        self.segment = open(path, 'ab')
+        self.index = open(path[:-4] + '.idx', 'a')
+
+    def rotate(self):
+        self.segment.close()
+        self.index.close()
+        self.open()
+
+    def write(self, block, count, first, last, symbols):
+        if self.segment is None:
+            self.open()
+        data = zlib.compress(b''.join(block), self.level)
+        offset = self.segment.tell()
+        self.segment.write(data)
+        self.segment.flush()
+        ## The index line goes after the block: an indexed block is always complete
+        self.index.write(json.dumps({'offset'  : offset,
+                                     'length'  : len(data),
+                                     'count'   : count,
+                                     'first'   : first,
+                                     'last'    : last,
+                                     'symbols' : sorted(symbols)
+                                     }) + '\n')
+        self.index.flush()
+        if self.segment.tell() >= self.segmentSize:
+            self.rotate()
+
+    def run(self):
+        block, size, count, first, last, symbols = [], 0, 0, None, None, set()
+        deadline = time.monotonic() + self.flushInterval
+        queue = self.queue
+
+        while self.running or queue:
+            if not queue:
+                self.event.wait(0.05)
+            while queue:
+                timestamp, raw = queue.popleft()
+                line = b'%d\t%s\n' % (timestamp, raw.encode('utf-8') if isinstance(raw, str) else raw)
+                block.append(line)
+                size += len(line)
+                count += 1
+                if first is None:
+                    first = timestamp
+                last = timestamp
+                symbols.update(symbol.decode('utf-8') for symbol in SYMBOL.findall(line))
+                if size >= self.blockSize:
+                    break
+
+            if block and (size >= self.blockSize or time.monotonic() >= deadline or not self.running):
+                try:
+                    self.write(block, count, first, last, symbols)
+                except (IOError, OSError):
+                    self.dropped += count
+                block, size, count, first, last, symbols = [], 0, 0, None, None, set()
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flushInterval
+
+    def close(self):
+        """
+        Write the pending messages and close the current segment
+        """
+        self.running = False
+        self.event.set()
+        self.thread.join()
+        if self.segment is not None:
+            self.segment.close()
+            self.index.close()
+
+class SegmentReader(object):
+    """
+    ### Segment Reader
+
+        - Loads the index of a segment (blocks sorted by first receive time)
+        - messages(symbol, start, end): decompresses only the blocks whose index matches
+    """
+
+    def __init__(self, path):
+        self.path = path if path.endswith('.seg') else path + '.seg'
+        self.blocks = []
+        with open(self.path[:-4] + '.idx') as f:
+            for line in f:
+                try:
+                    self.blocks.append(json.loads(line))
+                except ValueError:
+                    ## Incomplete last line
+                    break
+        self.blocks.sort(key=lambda block: block['first'])
+        self.firsts = [block['first'] for block in self.blocks]
+
+    def __len__(self):
+        return sum(block['count'] for block in self.blocks)
+
+    def symbols(self):
+        return sorted(set(symbol for block in self.blocks for symbol in block['symbols']))
+
+    def timeRange(self):
+        if not self.blocks:
+            return None, None
+        return self.blocks[0]['first'], max(block['last'] for block in self.blocks)
+
+    def select(self, symbol=None, start=None, end=None):
+        """
+        Index entries of the blocks that may hold messages of symbol in [start, end)
+        """
+        begin = 0
+        if start is not None:
+            ## Blocks are contiguous in time: the first candidate is the last one starting at or before start
+            begin = max(bisect_right(self.firsts, start) - 1, 0)
+        for block in self.blocks[begin:]:
+            if end is not None and block['first'] >= end:
+                break
+            if start is not None and block['last'] < start:
+                continue
+            if symbol is not None and symbol not in block['symbols']:
+                continue
+            yield block
+
+    def messages(self, symbol=None, start=None, end=None):
+        """
+        Recorded messages in receive order
+
+        Return:
+            - generator of (time ns, raw FIX string)
+        """
+        tag = ('\x0155=%s\x01' % symbol).encode('utf-8') if symbol is not None else None
+        with open(self.path, 'rb') as f:
+            for block in self.select(symbol, start, end):
+                f.seek(block['offset'])
+                for line in zlib.decompress(f.read(block['length'])).split(b'\n')[:-1]:
+                    timestamp, raw = line.split(b'\t', 1)
+                    timestamp = int(timestamp)
+                    if (start is not None and timestamp < start) or (end is not None and timestamp >= end):
+                        continue
+                    if tag is not None and tag not in raw:
+                        continue
+                    yield timestamp, raw.decode('utf-8')
+
+def listSegments(directory='./Recordings'):
+    """
+    Segment files of a directory, oldest first
+    """
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.seg'))
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+RTT Monitor
+
+Round trip of periodic Test Requests: the TestReqID carries the monotonic send time
+('RTT-<perf_counter_ns>'), so the matching Heartbeat gives the RTT without any lookup table.
+Rolling distribution per session and alerts on a threshold breach or an unanswered probe.
+"""
+
+import time
+import threading
+from collections import deque
+
+import numpy as np
+
+PREFIX = 'RTT-'
+
+class RttMonitor(object):
+    """
+    ### RTT Monitor
+
+        - requestId(session): TestReqID of a probe (and pending probe of the session)
+        - onHeartbeat(session, testReqID): RTT (ns) of a probe or None (not one of ours)
+        - window: RTT samples kept per session for the distribution
+        - threshold (s): alert when a RTT is higher; timeout (s): alert when a probe is not answered
+        - onAlert(session, kind, value ns, stats): kind 'threshold' or 'timeout'
+        - Pending probes and samples are shared by the prober, the FIX threads and stats readers: all under lock
+    """
+
+    def __init__(self, interval=10.0, window=1024, threshold=0.5, timeout=5.0, onAlert=None):
+        self.interval = interval
+        self.window = window
+        self.threshold = int(threshold * 1e9) if threshold else None
+        self.timeout = int(timeout * 1e9) if timeout else None
+        self.onAlert = onAlert
+
+        self.samples = {}
+        self.pending = {}
+        self.alerts = {}
+        self.lock = threading.Lock()
+
+    def requestId(self, session):
+        sent = time.perf_counter_ns()
+        with self.lock:
+            self.pending.setdefault(session, set()).add(sent)
+        return '%s%d' % (PREFIX, sent)
+
+    def onHeartbeat(self, session, testReqID):
+        if not testReqID.startswith(PREFIX):
+            return None
+        try:
+            sent = int(testReqID[len(PREFIX):])
+        except ValueError:
+            return None
+        rtt = time.perf_counter_ns() - sent
+        with self.lock:
+            self.pending.get(session, set()).discard(sent)
+        self.record(session, rtt)
+        return rtt
+
+    def record(self, session, rtt):
+        with self.lock:
+            self.samples.setdefault(session, deque(maxlen=self.window)).append(rtt)
+        if self.threshold is not None and rtt > self.threshold:
+            self.alert(session, 'threshold', rtt)
+
+    def check(self):
+        """
+        Alert on every probe older than timeout (then forget it)
+        """
+        if self.timeout is None:
+            return
+        now = time.perf_counter_ns()
+        expired = []
+        with self.lock:
+            for session, pending in self.pending.items():
+                for sent in [sent for sent in pending if now - sent > self.timeout]:
+                    pending.discard(sent)
+                    expired.append((session, sent))
+        ## Alerts outside the lock (onAlert reads the stats)
+        for session, sent in expired:
+            self.alert(session, 'timeout', now - sent)
+
+    def alert(self, session, kind, value):
+        with self.lock:
+            self.alerts[(session, kind)] = self.alerts.get((session, kind), 0) + 1
+        if self.onAlert is not None:
+            self.onAlert(session, kind, value, self.stats(session))
+
+    def reset(self, session):
+        """
+        Forget the pending probes of a session (logout)
+        """
+        with self.lock:
+            self.pending.pop(session, None)
+
+    def stats(self, session=None):
+        """
+        RTT distribution (ns) of a session (default: every session)
+
+        Return:
+            - dict: count, last, min, mean, p50, p90, p99, max, pending, alerts
+        """
+        if session is None:
+            with self.lock:
+                sessions = list(self.samples)
+            return {session : self.stats(session) for session in sessions}
+        with self.lock:
+            samples = np.array(self.samples.get(session, ()), dtype=np.int64)
+            pending = len(self.pending.get(session, ()))
+            alerts = {kind : count for (name, kind), count in self.alerts.items() if name == session}
+        stats = {'count'   : len(samples),
+                 'pending' : pending,
+                 'alerts'  : alerts
+                 }
+        if len(samples):
+            p50, p90, p99 = np.percentile(samples, [50, 90, 99])
+            stats.update({'last' : int(samples[-1]),
+                          'min'  : int(samples.min()),
+                          'mean' : float(samples.mean()),
+                          'p50'  : float(p50),
+                          'p90'  : float(p90),
+                          'p99'  : float(p99),
+                          'max'  : int(samples.max())
+                          })
+        return stats
+
+class RttProber(threading.Thread):
+    """
+    ### RTT Prober
+
+        - Every monitor.interval seconds sends a probe to each session returned by sessions()
+        - send(testReqID, session): sends the Test Request (i.e. Application.testRequest)
+    """
+
+    def __init__(self, monitor, sessions, send):
+        threading.Thread.__init__(self, name='RttProber')
+        self.daemon = True
+        self.monitor = monitor
+        self.sessions = sessions
+        self.send = send
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.monitor.interval):
+            self.monitor.check()
+            for session in self.sessions():
+                try:
+                    self.send(self.monitor.requestId(session), session)
+                except Exception:
+                    ## Session going down: the next round retries
+                    self.monitor.reset(session)
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Security List Assembler
+
+Tracks multi-message Security List responses (TotNoRelatedSym spread over several 'y' messages)
+keyed by SecurityReqID.
+"""
+
+import time
+
+class SecurityListAssembler(object):
+    """
+    ### Security List Assembler
+
+        - ingest: account for one fragment, return the assembled list once complete
+        - pending: lists still waiting for fragments
+    """
+
+    def __init__(self):
+        self.lists = {}
+
+    def ingest(self, securityReqId, details, symbols, lastFragment=None):
+        """
+        Account for one Security List fragment
+
+        Arguments:
+            - securityReqId: string
+            - details: dict (message level fields of the fragment)
+            - symbols: list of strings (symbols of the fragment)
+            - lastFragment: bool (tag 893, None when not sent)
+
+        Return:
+            - dict with the consolidated list when complete, otherwise None
+        """
+        entry = self.lists.get(securityReqId)
+        if entry is None:
+            entry = {'securityReqId'   : securityReqId,
+                     'details'         : details,
+                     'totNoRelatedSym' : details['totNoRelatedSym'],
+                     'symbols'         : [],
+                     'fragments'       : 0,
+                     'started'         : time.time()
+                     }
+            self.lists[securityReqId] = entry
+
+        entry['symbols'].extend(symbols)
+        entry['fragments'] += 1
+
+        if lastFragment or (lastFragment is None and len(entry['symbols']) >= entry['totNoRelatedSym']):
+            entry['elapsed'] = time.time() - entry['started']
+            return self.lists.pop(securityReqId)
+
+        return None
+
+    def pending(self):
+        """
+        In progress lists: securityReqId -> (received, total)
+        """
+        return {reqId : (len(entry['symbols']), entry['totNoRelatedSym']) for reqId, entry in list(self.lists.items())}
@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""
+Shared Memory Books
+
+Book of every subscribed symbol in a named multiprocessing.shared_memory segment with a fixed
+NumPy layout, written by the FIX process (or the fan-out of its market data pipeline) and read in
+place by local consumers (no socket, no JSON).
+
+Each book slot is protected by a seqlock: the writer makes the sequence odd, writes the levels and
+makes it even again; a reader retries while the sequence is odd or changed during its read.
+"""
+
+import os
+import time
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+
+from bookanalytics import FIELDS as ANALYTICS
+
+MAGIC = 0x524F4258
+VERSION = 3
+NAME_SIZE = 32
+
+HEADER = np.dtype([('magic', '<u4'), ('version', '<u4'), ('depth', '<u4'), ('capacity', '<u4'),
+                   ('count', '<u4'), ('slotSize', '<u4'), ('created', '<i8'), ('pid', '<u4')])
+HEADER_SIZE = 64
+
+def slotType(depth):
+    """
+    Layout of a book slot (padded to a multiple of 64 bytes, one slot never shares a cache line)
+    """
+    dtype = np.dtype([('seq', '<u8'), ('time', '<i8'),
+                      ('bidPx', '<f8', (depth,)), ('bidSize', '<f8', (depth,)),
+                      ('offerPx', '<f8', (depth,)), ('offerSize', '<f8', (depth,)),
+                      ('bidDepth', '<u4'), ('offerDepth', '<u4')] +
+                     [(name, '<f8') for name in ANALYTICS], align=True)
+    return np.dtype({'names'    : dtype.names,
+                     'formats'  : [dtype.fields[name][0] for name in dtype.names],
+                     'offsets'  : [dtype.fields[name][1] for name in dtype.names],
+                     'itemsize' : (dtype.itemsize + 63) // 64 * 64})
+
+class SharedBooks(object):
+    """
+    ### Shared Books (layout)
+
+        - Header (64 bytes): magic, version, depth, capacity, count, slotSize, created (ns), pid (writer)
+        - Directory: capacity symbols (NAME_SIZE bytes, utf-8), slot i belongs to symbol i
+        - Slots: capacity book slots (see slotType)
+    """
+
+    def map(self, shm):
+        self.shm = shm
+        self.header = np.ndarray((), HEADER, buffer=shm.buf)
+        self.depth = int(self.header['depth'])
+        self.capacity = int(self.header['capacity'])
+        self.dtype = slotType(self.depth)
+        self.directory = np.ndarray((self.capacity,), 'S%s' % NAME_SIZE, buffer=shm.buf, offset=HEADER_SIZE)
+        self.slots = np.ndarray((self.capacity,), self.dtype, buffer=shm.buf, offset=HEADER_SIZE + self.capacity * NAME_SIZE)
+
+        ## Field views (plain arrays, no per access record lookup)
+        self.seq = self.slots['seq']
+        self.time = self.slots['time']
+        self.bidPx, self.bidSize = self.slots['bidPx'], self.slots['bidSize']
+        self.offerPx, self.offerSize = self.slots['offerPx'], self.slots['offerSize']
+        self.bidDepth, self.offerDepth = self.slots['bidDepth'], self.slots['offerDepth']
+        self.analyticsFields = {name : self.slots[name] for name in ANALYTICS}
+
+    @staticmethod
+    def size(depth, capacity):
+        return HEADER_SIZE + capacity * NAME_SIZE + capacity * slotType(depth).itemsize
+
+    def release(self):
+        ## Every NumPy view must go before the mapping is closed
+        for name in ('header', 'directory', 'slots', 'seq', 'time', 'bidPx', 'bidSize', 'offerPx', 'offerSize', 'bidDepth', 'offerDepth', 'analyticsFields'):
+            setattr(self, name, None)
+        self.shm.close()
+
+def processAlive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class BookWriter(SharedBooks):
+    """
+    ### Book Writer
+
+        - name=None: anonymous segment (private to the process, i.e. replay)
+        - A stale segment with the same name (writer of a previous run gone) is replaced; a segment whose writer is
+          still running, or that is not a books segment, is left alone (FileExistsError)
+        - capacity: symbols of the segment; symbols beyond it, or longer than NAME_SIZE bytes (utf-8), are skipped:
+          update returns None and onSkip(symbol, reason) is called once per symbol
+        - update(symbol, bids, offers, analytics): bids / offers as broadcast ([{'price', 'size', 'position'}], best first),
+          analytics as computed by bookAnalytics (NaN when missing)
+        - attach(name): writer of a segment created by the process that spawned this one (the owner keeps and removes
+          it); a segment has a single writer, the owner does not write while it is attached
+    """
+
+    def __init__(self, name=None, depth=5, capacity=2048, onSkip=None):
+        size = self.size(depth, capacity)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            self.replaceStale(name)
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:size] = bytes(size)
+
+        header = np.ndarray((), HEADER, buffer=shm.buf)
+        header['depth'], header['capacity'], header['slotSize'] = depth, capacity, slotType(depth).itemsize
+        header['created'] = time.time_ns()
+        header['pid'] = os.getpid()
+        header['version'] = VERSION
+        ## Magic last: a reader never maps a half initialized header
+        header['magic'] = MAGIC
+        del header
+
+        self.map(shm)
+        self.name = shm.name
+        self.owner = True
+        self.symbols = {}
+        self.skipped = {}
+        self.onSkip = onSkip
+
+    @classmethod
+    def attach(cls, name, onSkip=None):
+        ## Spawned processes share the resource tracker of the owner: the registration stays the owner's
+        shm = shared_memory.SharedMemory(name=name)
+        if int(np.ndarray((), HEADER, buffer=shm.buf)['magic']) != MAGIC:
+            shm.close()
+            raise ValueError('Not a shared books segment: %s' % name)
+        writer = cls.__new__(cls)
+        writer.map(shm)
+        writer.name = name
+        writer.owner = False
+        writer.symbols = {}
+        writer.skipped = {}
+        writer.onSkip = onSkip
+        return writer
+
+    @staticmethod
+    def replaceStale(name):
+        """
+        Remove the segment left by a writer that is gone (never one in use or unknown)
+        """
+        stale = shared_memory.SharedMemory(name=name)
+        header = np.ndarray((), HEADER, buffer=stale.buf) if stale.size >= HEADER_SIZE else None
+        magic = int(header['magic']) if header is not None else None
+        pid = int(header['pid']) if header is not None and int(header['version']) >= 3 else 0
+        del header
+        stale.close()
+        if magic != MAGIC or (pid and processAlive(pid)):
+            ## Not ours to remove: keep the resource tracker away from it too
+            resource_tracker.unregister(stale._name, 'shared_memory')
+            raise FileExistsError('Shared memory segment %s in use (%s)' % (name, 'writer pid %s' % pid if magic == MAGIC else 'not a books segment'))
+        stale.unlink()
+
+    def slot(self, symbol):
+        """
+        Slot of symbol (allocated on the first update), None if the symbol is skipped
+        """
+        try:
+            return self.symbols[symbol]
+        except KeyError:
+            if symbol in self.skipped:
+                return None
+            name = symbol.encode('utf-8')
+            index = len(self.symbols)
+            if len(name) > NAME_SIZE:
+                return self.skip(symbol, 'name longer than %s bytes' % NAME_SIZE)
+            if index >= self.capacity:
+                return self.skip(symbol, 'shared books full (%s symbols)' % self.capacity)
+            self.directory[index] = name
+            self.bidPx[index] = self.offerPx[index] = np.nan
+            for field in self.analyticsFields.values():
+                field[index] = np.nan
+            ## Count after the name: a listed slot always has its symbol
+            self.header['count'] = index + 1
+            self.symbols[symbol] = index
+            return index
+
+    def skip(self, symbol, reason):
+        self.skipped[symbol] = reason
+        if self.onSkip is not None:
+            self.onSkip(symbol, reason)
+        return None
+
+    def update(self, symbol, bids, offers, analytics=None, timestamp=None):
+        index = self.slot(symbol)
+        if index is None:
+            return None
+        depth = self.depth
+        bids, offers = bids[:depth], offers[:depth]
+        nBids, nOffers = len(bids), len(offers)
+
+        seq = self.seq
+        sequence = int(seq[index])
+        seq[index] = sequence + 1
+
+        self.time[index] = timestamp if timestamp is not None else time.time_ns()
+        self.bidPx[index, :nBids] = [level['price'] for level in bids]
+        self.bidSize[index, :nBids] = [level['size'] for level in bids]
+        self.bidPx[index, nBids:] = np.nan
+        self.bidSize[index, nBids:] = 0
+        self.offerPx[index, :nOffers] = [level['price'] for level in offers]
+        self.offerSize[index, :nOffers] = [level['size'] for level in offers]
+        self.offerPx[index, nOffers:] = np.nan
+        self.offerSize[index, nOffers:] = 0
+        self.bidDepth[index] = nBids
+        self.offerDepth[index] = nOffers
+        for name, field in self.analyticsFields.items():
+            value = analytics.get(name) if analytics is not None else None
+            field[index] = value if value is not None else np.nan
+
+        seq[index] = sequence + 2
+        return index
+
+    def close(self):
+        self.release()
+        if self.owner:
+            self.shm.unlink()
+
+class BookReader(SharedBooks):
+    """
+    ### Book Reader
+
+        - Attaches to the segment of a BookWriter (reattach after a writer restart)
+        - top / book / analytics: consistent reads (seqlock retry), book copies into a reusable record
+        - view: zero-copy NumPy record of the slot; check it with sequence before and stable after reading
+    """
+
+    def __init__(self, name='rofex-books', spins=1000):
+        shm = shared_memory.SharedMemory(name=name)
+        ## Attached segments are registered for removal at exit: the writer owns this one
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        if int(np.ndarray((), HEADER, buffer=shm.buf)['magic']) != MAGIC:
+            shm.close()
+            raise ValueError('Not a shared books segment: %s' % name)
+        self.map(shm)
+        self.name = name
+        self.spins = spins
+        self.symbols = {}
+
+    def refresh(self):
+        count = int(self.header['count'])
+        for index in range(len(self.symbols), count):
+            self.symbols[self.directory[index].decode('utf-8')] = index
+        return self.symbols
+
+    def index(self, symbol):
+        try:
+            return self.symbols[symbol]
+        except KeyError:
+            return self.refresh()[symbol]
+
+    def sequence(self, index):
+        """
+        Sequence to start a read with (waits while the writer is inside the slot)
+        """
+        seq = self.seq
+        for _ in range(self.spins):
+            sequence = int(seq[index])
+            if not sequence & 1:
+                return sequence
+        raise TimeoutError('Book slot %s locked by the writer' % index)
+
+    def stable(self, index, sequence):
+        return int(self.seq[index]) == sequence
+
+    def top(self, symbol):
+        """
+        Top of book
+
+        Return:
+            - tuple: (bid price, bid size, offer price, offer size, time ns) - NaN prices on an empty side
+        """
+        index = self.index(symbol)
+        for _ in range(self.spins):
+            sequence = self.sequence(index)
+            top = (float(self.bidPx[index, 0]), float(self.bidSize[index, 0]),
+                   float(self.offerPx[index, 0]), float(self.offerSize[index, 0]), int(self.time[index]))
+            if self.stable(index, sequence):
+                return top
+        raise TimeoutError('Book of %s kept changing' % symbol)
+
+    def analytics(self, symbol):
+        """
+        Book analytics (spread, mid, microprice, imbalance, bidVwap, offerVwap, depthImbalance) - NaN when missing
+        """
+        index = self.index(symbol)
+        for _ in range(self.spins):
+            sequence = self.sequence(index)
+            analytics = {name : float(field[index]) for name, field in self.analyticsFields.items()}
+            if self.stable(index, sequence):
+                return analytics
+        raise TimeoutError('Book of %s kept changing' % symbol)
+
+    def book(self, symbol, out=None):
+        """
+        Consistent copy of the book slot (into out, a 0-d record of self.dtype, to avoid allocations)
+        """
+        index = self.index(symbol)
+        if out is None:
+            out = np.empty((), self.dtype)
+        for _ in range(self.spins):
+            sequence = self.sequence(index)
+            out[()] = self.slots[index]
+            if self.stable(index, sequence):
+                return out
+        raise TimeoutError('Book of %s kept changing' % symbol)
+
+    def view(self, symbol):
+        """
+        Zero-copy record of the book slot (index, record): valid only if the sequence did not move
+        """
+        index = self.index(symbol)
+        return index, self.slots[index]
+
+    def close(self):
+        self.release()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Shared Memory Ring
+
+Single producer / single consumer ring buffer of variable length records in a
+multiprocessing.shared_memory block, to hand raw messages to another process
+without pickling, pipes or locks.
+"""
+
+import struct
+from multiprocessing import shared_memory
+
+HEADER = 128
+HEAD = 0
+TAIL = 64
+WRAP = 0xFFFFFFFF
+
+U32 = struct.Struct('<I')
+U64 = struct.Struct('<Q')
+
+def align(size):
+    return (size + 7) & ~7
+
+class SharedRing(object):
+    """
+    ### Shared Ring
+
+        - Header: head (bytes written, producer) and tail (bytes read, consumer) on separate cache lines
+        - Record: length (uint32) + payload, 8 byte aligned; a WRAP length sends the reader back to the start
+        - The payload is written before head is published, so the reader never sees a partial record
+        - put never blocks: a full ring drops the record (dropped counts them)
+        - name=None creates a new block, otherwise attaches to the block created by the other process
+    """
+
+    def __init__(self, name=None, size=16 * 2**20):
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=HEADER + align(size))
+            self.shm.buf[:HEADER] = bytes(HEADER)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.name = self.shm.name
+        self.buf = self.shm.buf
+        self.capacity = self.shm.size - HEADER
+        self.dropped = 0
+
+    def __len__(self):
+        """
+        Bytes waiting to be read
+        """
+        return U64.unpack_from(self.buf, HEAD)[0] - U64.unpack_from(self.buf, TAIL)[0]
+
+    def usage(self):
+        return len(self) / self.capacity
+
+    """
+    Producer
+    """
+
+    def put(self, data):
+        """
+        Append a record (bytes)
+
+        Return:
+            - bool: False if the ring is full (record dropped)
+        """
+        buf, capacity = self.buf, self.capacity
+        size = align(4 + len(data))
+        if size > capacity // 2:
+            raise ValueError('Record of %s bytes does not fit in the ring' % len(data))
+
+        head = U64.unpack_from(buf, HEAD)[0]
+        position = head % capacity
+        padding = capacity - position if position + size > capacity else 0
+        if head + padding + size - U64.unpack_from(buf, TAIL)[0] > capacity:
+            self.dropped += 1
+            return False
+
+        if padding:
+            U32.pack_into(buf, HEADER + position, WRAP)
+            head += padding
+            position = 0
+        start = HEADER + position
+        U32.pack_into(buf, start, len(data))
+        buf[start + 4:start + 4 + len(data)] = data
+        U64.pack_into(buf, HEAD, head + size)
+        return True
+
+    """
+    Consumer
+    """
+
+    def get(self):
+        """
+        Next record (bytes) or None if the ring is empty
+        """
+        buf, capacity = self.buf, self.capacity
+        tail = U64.unpack_from(buf, TAIL)[0]
+        if tail == U64.unpack_from(buf, HEAD)[0]:
+            return None
+
+        position = tail % capacity
+        length = U32.unpack_from(buf, HEADER + position)[0]
+        if length == WRAP:
+            tail += capacity - position
+            position = 0
+            length = U32.unpack_from(buf, HEADER)[0]
+        start = HEADER + position + 4
+        data = bytes(buf[start:start + length])
+        U64.pack_into(buf, TAIL, tail + align(4 + length))
+        return data
+
+    def close(self):
+        """
+        Detach (and remove the block if this process created it)
+        """
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Market Data Subscriptions
+
+Active Market Data streams (venue, symbol, entries, depth) with the consumers that asked for them:
+a stream is requested once, kept while it has consumers and unsubscribed (263=2) when the last one leaves.
+After a logon every stream of the venue is requested again in batches.
+
+Streams share the MDReqID of the request that opened them, and a 263=2 disables a whole request: when some
+of its streams are still used, the request is disabled and the survivors are requested again under a new
+MDReqID (a fresh snapshot of their books follows). Streams of a symbol with different entries or depth are
+separate streams (separate requests at the venue), they are not merged.
+"""
+
+import time
+import itertools
+import threading
+
+def streamKey(venue, symbol, entries, depth):
+    return (venue, symbol, tuple(sorted(str(entry) for entry in entries)), int(depth))
+
+class Stream(object):
+    """
+    ### Stream
+
+        - mdReqId: MDReqID of the request that opened the stream (needed to unsubscribe), shared by the
+          streams of that request
+        - consumers: consumer -> subscriptions
+    """
+
+    __slots__ = ('venue', 'symbol', 'entries', 'depth', 'mdReqId', 'consumers', 'since')
+
+    def __init__(self, venue, symbol, entries, depth):
+        self.venue, self.symbol, self.entries, self.depth = venue, symbol, entries, depth
+        self.mdReqId = None
+        self.consumers = {}
+        self.since = time.time()
+
+    def snapshot(self):
+        return {'venue'     : self.venue,
+                'symbol'    : self.symbol,
+                'entries'   : list(self.entries),
+                'depth'     : self.depth,
+                'mdReqId'   : self.mdReqId,
+                'consumers' : dict(self.consumers),
+                'since'     : self.since
+                }
+
+class SubscriptionManager(object):
+    """
+    ### Subscription Manager
+
+        - nextId(): unique MDReqID ('<startup time base 36>-<counter>', no collisions within or across runs)
+        - subscribe / unsubscribe: return what has to be sent (nothing for an already streaming or still used stream)
+        - resubscribe(venue): every stream of the venue in batches of batchSize symbols, with new MDReqIDs
+        - rejected(mdReqId): drop the streams of a rejected request
+    """
+
+    def __init__(self, batchSize=50):
+        self.batchSize = batchSize
+        self.streams = {}
+        self.lock = threading.RLock()
+        self.prefix = self.base36(int(time.time() * 1000))
+        self.counter = itertools.count(1)
+
+    @staticmethod
+    def base36(value):
+        digits = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+        result = ''
+        while value:
+            value, digit = divmod(value, 36)
+            result = digits[digit] + result
+        return result or '0'
+
+    def nextId(self):
+        return '%s-%s' % (self.prefix, next(self.counter))
+
+    def subscribe(self, consumer, venue, symbols, entries, depth):
+        """
+        Add consumer to the streams of symbols
+
+        Return:
+            - tuple: (MDReqID, symbols to request) - (None, []) when every stream is already open
+        """
+        with self.lock:
+            pending = []
+            for symbol in symbols:
+                key = streamKey(venue, symbol, entries, depth)
+                stream = self.streams.get(key)
+                if stream is None:
+                    stream = self.streams[key] = Stream(*key)
+                    pending.append(stream)
+                stream.consumers[consumer] = stream.consumers.get(consumer, 0) + 1
+            if not pending:
+                return None, []
+            mdReqId = self.nextId()
+            for stream in pending:
+                stream.mdReqId = mdReqId
+            return mdReqId, [stream.symbol for stream in pending]
+
+    def unsubscribe(self, consumer, venue, symbols, entries, depth):
+        """
+        Remove consumer from the streams of symbols
+
+        Return:
+            - tuple: (disable, requests) - lists of (MDReqID, entries, depth, symbols): the requests with streams left
+              without consumers (to disable, with every symbol they requested) and the survivors of those requests
+              (to request again under a new MDReqID)
+        """
+        with self.lock:
+            closed = {}
+            for symbol in symbols:
+                key = streamKey(venue, symbol, entries, depth)
+                stream = self.streams.get(key)
+                if stream is None or consumer not in stream.consumers:
+                    continue
+                stream.consumers[consumer] -= 1
+                if stream.consumers[consumer] <= 0:
+                    del stream.consumers[consumer]
+                if not stream.consumers:
+                    del self.streams[key]
+                    closed.setdefault(stream.mdReqId, (stream.entries, stream.depth, []))[2].append(stream.symbol)
+
+            disable, requests = [], []
+            for mdReqId, (streamEntries, streamDepth, closedSymbols) in closed.items():
+                survivors = [stream for stream in self.streams.values() if stream.mdReqId == mdReqId]
+                disable.append((mdReqId, list(streamEntries), streamDepth, closedSymbols + [stream.symbol for stream in survivors]))
+                if survivors:
+                    newId = self.nextId()
+                    for stream in survivors:
+                        stream.mdReqId = newId
+                    requests.append((newId, list(streamEntries), streamDepth, [stream.symbol for stream in survivors]))
+            return disable, requests
+
+    def resubscribe(self, venue):
+        """
+        Requests to open again every stream of venue (after a logon)
+
+        Return:
+            - list of (MDReqID, entries, depth, symbols)
+        """
+        with self.lock:
+            groups = {}
+            for stream in self.streams.values():
+                if stream.venue == venue:
+                    groups.setdefault((stream.entries, stream.depth), []).append(stream)
+            requests = []
+            for (entries, depth), streams in groups.items():
+                for start in range(0, len(streams), self.batchSize):
+                    batch = streams[start:start + self.batchSize]
+                    mdReqId = self.nextId()
+                    for stream in batch:
+                        stream.mdReqId = mdReqId
+                    requests.append((mdReqId, list(entries), depth, [stream.symbol for stream in batch]))
+            return requests
+
+    def rejected(self, mdReqId):
+        """
+        Drop the streams opened by a rejected request
+
+        Return:
+            - list of symbols
+        """
+        with self.lock:
+            symbols = []
+            for key, stream in list(self.streams.items()):
+                if stream.mdReqId == mdReqId:
+                    del self.streams[key]
+                    symbols.append(stream.symbol)
+            return symbols
+
+    def snapshot(self, venue=None, consumer=None):
+        with self.lock:
+            return [stream.snapshot() for stream in self.streams.values()
+                    if (venue is None or stream.venue == venue) and (consumer is None or consumer in stream.consumers)]
+
+    def __len__(self):
+        return len(self.streams)
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Top of Book History
+
+Intraday history of the top of book of every symbol: fixed capacity NumPy ring buffers of
+(time, best bid / offer price and size, last trade), one row per change, with vectorized
+window queries and export to NumPy arrays or pandas DataFrames.
+"""
+
+import threading
+
+import numpy as np
+
+TOP = np.dtype([('time', '<i8'), ('bidPx', '<f8'), ('bidSize', '<f8'), ('offerPx', '<f8'), ('offerSize', '<f8'),
+                ('lastPx', '<f8'), ('lastSize', '<f8')])
+
+class TopRing(object):
+    """
+    ### Top Ring
+
+        - Last capacity rows of a symbol (oldest overwritten), times ascending
+    """
+
+    def __init__(self, capacity):
+        self.rows = np.zeros(capacity, dtype=TOP)
+        self.capacity = capacity
+        self.position = 0
+        self.count = 0
+        self.last = None
+
+    def append(self, row):
+        self.rows[self.position] = row
+        self.position = (self.position + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.last = row
+
+    def ordered(self):
+        """
+        Rows oldest first (a view while the ring has not wrapped, a copy afterwards)
+        """
+        if self.count < self.capacity:
+            return self.rows[:self.count]
+        return np.concatenate((self.rows[self.position:], self.rows[:self.position]))
+
+    def window(self, start=None, end=None):
+        rows = self.ordered()
+        times = rows['time']
+        first = np.searchsorted(times, start, 'left') if start is not None else 0
+        last = np.searchsorted(times, end, 'left') if end is not None else len(rows)
+        return rows[first:last]
+
+class TopHistory(object):
+    """
+    ### Top History
+
+        - record(symbol, time ns, bidPx, bidSize, offerPx, offerSize, lastPx, lastSize): a row only when the top changes
+        - query(symbol, start, end): rows in [start, end) (structured array, times in ns since epoch)
+        - resample(symbol, start, end, step): state at every step (last row at or before each time)
+        - stats(symbol, start, end): spread and mid statistics of the window, time weighted
+        - dataframe(symbol, start, end): pandas DataFrame indexed by time (pandas imported on use)
+        - NaN price / 0 size when a side is empty
+    """
+
+    def __init__(self, capacity=50000):
+        self.capacity = capacity
+        self.rings = {}
+        self.lock = threading.Lock()
+
+    def record(self, symbol, timestamp, bidPx, bidSize, offerPx, offerSize, lastPx=np.nan, lastSize=0.0):
+        values = (bidPx, bidSize, offerPx, offerSize, lastPx, lastSize)
+        ring = self.rings.get(symbol)
+        if ring is None:
+            with self.lock:
+                ring = self.rings.setdefault(symbol, TopRing(self.capacity))
+        elif ring.last is not None and all(a == b or (a != a and b != b) for a, b in zip(ring.last[1:], values)):
+            ## Same top (NaN equal to NaN)
+            return False
+        with self.lock:
+            ring.append((timestamp,) + values)
+        return True
+
+    def symbols(self):
+        return sorted(self.rings)
+
+    def query(self, symbol, start=None, end=None, limit=None):
+        ring = self.rings.get(symbol)
+        if ring is None:
+            return np.zeros(0, dtype=TOP)
+        with self.lock:
+            rows = ring.window(start, end).copy()
+        return rows[-limit:] if limit else rows
+
+    def resample(self, symbol, start, end, step):
+        """
+        Top of book at start, start + step, ... < end (NaN before the first row)
+        """
+        times = np.arange(start, end, step, dtype=np.int64)
+        ring = self.rings.get(symbol)
+        result = np.zeros(len(times), dtype=TOP)
+        result['time'] = times
+        for name in TOP.names[1:]:
+            result[name] = np.nan
+        if ring is None:
+            return result
+        with self.lock:
+            rows = ring.window(None, end).copy()
+        indexes = np.searchsorted(rows['time'], times, 'right') - 1
+        valid = indexes >= 0
+        for name in TOP.names[1:]:
+            result[name][valid] = rows[name][indexes[valid]]
+        return result
+
+    def stats(self, symbol, start=None, end=None):
+        """
+        Window statistics (prices in price units, times in ns)
+
+        Return:
+            - dict: rows, meanSpread, twSpread (time weighted), maxSpread, minMid, maxMid, lastMid, twMid
+        """
+        rows = self.query(symbol, start, end)
+        if not len(rows):
+            return {'rows' : 0}
+        spread = rows['offerPx'] - rows['bidPx']
+        mid = (rows['offerPx'] + rows['bidPx']) / 2
+        ## Each row holds until the next one (the last one until end, or has no weight)
+        durations = np.diff(rows['time'], append=end if end is not None else rows['time'][-1]).astype(np.float64)
+        valid = ~np.isnan(spread)
+        weights = durations[valid]
+        with np.errstate(invalid='ignore'):
+            return {'rows'       : len(rows),
+                    'meanSpread' : float(np.nanmean(spread)) if valid.any() else None,
+                    'twSpread'   : float(np.average(spread[valid], weights=weights)) if weights.sum() > 0 else None,
+                    'maxSpread'  : float(np.nanmax(spread)) if valid.any() else None,
+                    'minMid'     : float(np.nanmin(mid)) if valid.any() else None,
+                    'maxMid'     : float(np.nanmax(mid)) if valid.any() else None,
+                    'lastMid'    : float(mid[valid][-1]) if valid.any() else None,
+                    'twMid'      : float(np.average(mid[valid], weights=weights)) if weights.sum() > 0 else None
+                    }
+
+    def dataframe(self, symbol, start=None, end=None):
+        import pandas as pd
+        frame = pd.DataFrame(self.query(symbol, start, end))
+        frame.index = pd.to_datetime(frame.pop('time'), unit='ns')
+        return frame
+
+def toRecords(rows):
+    """
+    Rows as a list of dicts (JSON), NaN as None
+    """
+    return [{name : (None if value != value else value) for name, value in zip(TOP.names, row)} for row in rows.tolist()]
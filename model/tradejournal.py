@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Trade Journal
+
+Append-only daily journal of trade capture reports (one JSON line per report, in the file of the
+trade date it was received on), deduplicated by TradeReportID.
+"""
+
+import os
+import json
+import datetime
+from threading import Lock
+
+class TradeJournal(object):
+    """
+    ### Trade Journal
+
+        - File: <directory>/trades-YYYYMMDD.jsonl of the current trade date (local date); a record of a newer date
+          rolls over to its file (a process running past midnight), a late record of a previous date stays in the
+          current file, so load() finds every report journaled during the trade date
+        - A fixed tradeDate writes every record to its file
+        - load(): the file of the current trade date
+        - Record: {'tradeReportId', 'tradeRequestId', 'time' (ns), 'transactTime', 'report'}
+    """
+
+    def __init__(self, directory='./Journal', tradeDate=None):
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.directory = directory
+        self.fixedDate = tradeDate
+        self.lock = Lock()
+        self.file = None
+        self.tradeReportIds = set()
+        self.last = None
+
+        self.roll(tradeDate or datetime.date.today().strftime('%Y%m%d'))
+
+    def roll(self, tradeDate):
+        """
+        Make tradeDate the current file (the previous one is closed)
+        """
+        if self.file is not None:
+            self.file.close()
+        self.tradeDate = tradeDate
+        self.path = os.path.join(self.directory, 'trades-%s.jsonl' % tradeDate)
+        self.file = open(self.path, 'a+b')
+
+    def recordDate(self, time):
+        if self.fixedDate is not None:
+            return self.fixedDate
+        return datetime.datetime.fromtimestamp(time / 1e9).strftime('%Y%m%d')
+
+    def load(self):
+        """
+        Rebuild the index from the journal file
+
+        Return:
+            - list of records in file order
+        """
+        records = []
+        with self.lock:
+            self.file.seek(0)
+            offset = 0
+            for line in self.file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    ## Incomplete last line (crash while writing)
+                    break
+                self.index(record)
+                records.append(record)
+                offset += len(line)
+            self.file.truncate(offset)
+            self.file.seek(0, os.SEEK_END)
+        return records
+
+    def index(self, record):
+        self.tradeReportIds.add(record['tradeReportId'])
+        if self.last is None or record['time'] >= self.last['time']:
+            self.last = record
+
+    def append(self, tradeReportId, tradeRequestId, time, transactTime, report):
+        """
+        Append a trade capture report (ignored if already journaled)
+
+        Return:
+            - bool: False if tradeReportId was already in the journal
+        """
+        record = {'tradeReportId'  : tradeReportId,
+                  'tradeRequestId' : tradeRequestId,
+                  'time'           : time,
+                  'transactTime'   : transactTime,
+                  'report'         : report
+                  }
+        with self.lock:
+            if tradeReportId in self.tradeReportIds:
+                return False
+            if self.recordDate(time) > self.tradeDate:
+                self.roll(self.recordDate(time))
+            self.file.write((json.dumps(record) + '\n').encode('utf-8'))
+            self.file.flush()
+            self.index(record)
+            return True
+
+    def __contains__(self, tradeReportId):
+        return tradeReportId in self.tradeReportIds
+
+    def __len__(self):
+        return len(self.tradeReportIds)
+
+    def lastTransactTime(self):
+        """
+        TransactTime (string) of the latest journaled report (None if empty)
+        """
+        return self.last['transactTime'] if self.last is not None else None
+
+    def close(self):
+        with self.lock:
+            self.file.close()
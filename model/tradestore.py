@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Trade Store
+
+Columnar (NumPy) store of trade capture report sides with vectorized aggregations
+(VWAP, volume by symbol/account, realized P&L).
+"""
+
+import calendar
+import datetime
+from threading import Lock
+
+import numpy as np
+
+def parseTransactTime(transactTime):
+    """
+    UTC Timestamp ('YYYYMMDD-HH:MM:SS[.sss]') to nanoseconds since epoch
+    """
+    try:
+        dt = datetime.datetime.strptime(transactTime, '%Y%m%d-%H:%M:%S.%f')
+    except ValueError:
+        dt = datetime.datetime.strptime(transactTime, '%Y%m%d-%H:%M:%S')
+    return (calendar.timegm(dt.timetuple()) * 1000000 + dt.microsecond) * 1000
+
+class TradeStore(object):
+    """
+    ### Trade Store
+
+        - One row per trade side: price, quantity, side (+1 Buy / -1 Sell), symbolId, time (ns), accountId
+        - Symbols and accounts are interned to integer ids
+        - Arrays grow by doubling, aggregations work on views of the filled rows
+    """
+
+    DTYPES = {'price'     : np.float64,
+              'quantity'  : np.int64,
+              'side'      : np.int8,
+              'symbolId'  : np.int32,
+              'time'      : np.int64,
+              'accountId' : np.int32
+              }
+
+    def __init__(self, capacity=1024):
+        self.lock = Lock()
+        self.size = 0
+        self.columns = {name : np.zeros(capacity, dtype=dtype) for name, dtype in self.DTYPES.items()}
+        self.symbols, self.symbolIds = [], {}
+        self.accounts, self.accountIds = [], {}
+        self.keys = set()
+
+    def __len__(self):
+        return self.size
+
+    def intern(self, value, values, ids):
+        try:
+            return ids[value]
+        except KeyError:
+            ids[value] = len(values)
+            values.append(value)
+            return ids[value]
+
+    def grow(self):
+        capacity = 2 * len(self.columns['price'])
+        for name, column in self.columns.items():
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+
+    def append(self, price, quantity, side, symbol, time, account, key=None):
+        """
+        Append one trade side
+
+        Arguments:
+            - price: float
+            - quantity: int
+            - side: int (+1 Buy / -1 Sell)
+            - symbol: string
+            - time: int (ns since epoch)
+            - account: string
+            - key: hashable (i.e. (TradeReportID, side)), duplicates are ignored
+
+        Return:
+            - bool: False if the key was already stored
+        """
+        with self.lock:
+            if key is not None:
+                if key in self.keys:
+                    return False
+                self.keys.add(key)
+            if self.size == len(self.columns['price']):
+                self.grow()
+            row = self.size
+            self.columns['price'][row]     = price
+            self.columns['quantity'][row]  = quantity
+            self.columns['side'][row]      = side
+            self.columns['symbolId'][row]  = self.intern(symbol, self.symbols, self.symbolIds)
+            self.columns['time'][row]      = time
+            self.columns['accountId'][row] = self.intern(account, self.accounts, self.accountIds)
+            self.size += 1
+            return True
+
+    def view(self):
+        """
+        Views (no copy) of the filled rows of every column
+        """
+        with self.lock:
+            return {name : column[:self.size] for name, column in self.columns.items()}
+
+    def mask(self, view, symbol=None, account=None, start=None, end=None):
+        mask = np.ones(len(view['price']), dtype=bool)
+        if symbol is not None:
+            mask &= view['symbolId'] == self.symbolIds.get(symbol, -1)
+        if account is not None:
+            mask &= view['accountId'] == self.accountIds.get(account, -1)
+        if start is not None:
+            mask &= view['time'] >= start
+        if end is not None:
+            mask &= view['time'] < end
+        return mask
+
+    """
+    Aggregations
+    """
+
+    def vwap(self, symbol=None, account=None, start=None, end=None):
+        """
+        Volume weighted average price of the selected trades (None if empty)
+        """
+        view = self.view()
+        mask = self.mask(view, symbol, account, start, end)
+        quantity = view['quantity'][mask]
+        total = quantity.sum()
+        if total == 0:
+            return None
+        return float(np.dot(view['price'][mask], quantity) / total)
+
+    def vwapBySymbol(self):
+        view = self.view()
+        quantity = np.bincount(view['symbolId'], weights=view['quantity'], minlength=len(self.symbols))
+        notional = np.bincount(view['symbolId'], weights=view['price'] * view['quantity'], minlength=len(self.symbols))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            vwap = notional / quantity
+        return {symbol : float(vwap[i]) for i, symbol in enumerate(self.symbols) if quantity[i] > 0}
+
+    def volumeBySymbol(self):
+        view = self.view()
+        volume = np.bincount(view['symbolId'], weights=view['quantity'], minlength=len(self.symbols))
+        return {symbol : int(volume[i]) for i, symbol in enumerate(self.symbols)}
+
+    def volumeByAccount(self):
+        view = self.view()
+        volume = np.bincount(view['accountId'], weights=view['quantity'], minlength=len(self.accounts))
+        return {account : int(volume[i]) for i, account in enumerate(self.accounts)}
+
+    def realizedPnl(self, multipliers=None):
+        """
+        Realized P&L by account and symbol (average cost)
+
+        The matched quantity min(bought, sold) is realized at (average sell - average buy) * multiplier.
+
+        Arguments:
+            - multipliers: dict symbol -> contract multiplier (default: 1)
+
+        Return:
+            - dict: (account, symbol) -> {'bought', 'sold', 'avgBuy', 'avgSell', 'realized'}
+        """
+        view = self.view()
+        nSymbols = max(len(self.symbols), 1)
+        groups = view['accountId'].astype(np.int64) * nSymbols + view['symbolId']
+        length = len(self.accounts) * nSymbols
+
+        buy = view['side'] > 0
+        quantity = view['quantity'].astype(np.float64)
+        notional = view['price'] * quantity
+
+        boughtQty = np.bincount(groups, weights=np.where(buy, quantity, 0), minlength=length)
+        soldQty = np.bincount(groups, weights=np.where(buy, 0, quantity), minlength=length)
+        boughtNotional = np.bincount(groups, weights=np.where(buy, notional, 0), minlength=length)
+        soldNotional = np.bincount(groups, weights=np.where(buy, 0, notional), minlength=length)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avgBuy = boughtNotional / boughtQty
+            avgSell = soldNotional / soldQty
+
+        multiplier = np.ones(length)
+        if multipliers:
+            for symbolId, symbol in enumerate(self.symbols):
+                multiplier[symbolId::nSymbols] = float(multipliers.get(symbol) or 1)
+
+        matched = np.minimum(boughtQty, soldQty)
+        realized = np.where(matched > 0, matched * (avgSell - avgBuy) * multiplier, 0.0)
+
+        result = {}
+        for group in np.nonzero(boughtQty + soldQty)[0]:
+            account, symbol = self.accounts[group // nSymbols], self.symbols[group % nSymbols]
+            result[(account, symbol)] = {'bought'   : int(boughtQty[group]),
+                                         'sold'     : int(soldQty[group]),
+                                         'avgBuy'   : float(avgBuy[group]) if boughtQty[group] else None,
+                                         'avgSell'  : float(avgSell[group]) if soldQty[group] else None,
+                                         'realized' : float(realized[group])
+                                         }
+        return result
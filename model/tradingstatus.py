@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Trading Status Cache
+
+Last known trading status per symbol (Security Status) and per market segment (Trading Session Status)
+of each venue, used to gate order entry.
+"""
+
+class TradingStatusCache(object):
+    """
+    ### Trading Status Cache
+
+        - symbols: (venue, symbol) -> (326) SecurityTradingStatus
+        - segments: (venue, marketSegmentId) -> (340) TradSesStatus
+        - venue: TargetCompID of the session that sent the status (symbols and segments are per venue)
+        - canTrade: O(1) check before sending an order
+    """
+
+    ## (326) SecurityTradingStatus: 2 (Trading Halt) / 4 (No Open) / 18 (Not Available for Trading) / 19 (Not Traded on this Market) / 20 (Unknown or Invalid)
+    SYMBOL_BLOCKED = {2  : 'Trading Halt',
+                      4  : 'No Open',
+                      18 : 'Not Available for Trading',
+                      19 : 'Not Traded on this Market',
+                      20 : 'Unknown or Invalid'
+                      }
+
+    ## (340) TradSesStatus: 1 (Halted) / 3 (Closed)
+    SEGMENT_BLOCKED = {1 : 'Halted',
+                       3 : 'Closed'
+                       }
+
+    def __init__(self):
+        self.symbols = {}
+        self.segments = {}
+
+    def setSymbolStatus(self, venue, symbol, status):
+        self.symbols[(venue, symbol)] = int(status)
+
+    def setSegmentStatus(self, venue, segment, status):
+        self.segments[(venue, segment)] = int(status)
+
+    def canTrade(self, venue, symbol, segment=None):
+        """
+        Whether an order on symbol can be sent
+
+        Unknown symbols/segments are considered tradable (the exchange has the last word).
+
+        Return:
+            - tuple: (bool, reason)
+        """
+        status = self.symbols.get((venue, symbol))
+        if status in self.SYMBOL_BLOCKED:
+            return False, "Symbol %s (%s): %s" % (symbol, venue, self.SYMBOL_BLOCKED[status])
+        status = self.segments.get((venue, segment))
+        if status in self.SEGMENT_BLOCKED:
+            return False, "Segment %s (%s): %s" % (segment, venue, self.SEGMENT_BLOCKED[status])
+        return True, None
+
+    def snapshot(self):
+        """
+        Statuses by venue (JSON): {'symbols': {venue: {symbol: status}}, 'segments': {venue: {segment: status}}}
+        """
+        result = {'symbols' : {}, 'segments' : {}}
+        for name in result:
+            for (venue, key), status in list(getattr(self, name).items()):
+                result[name].setdefault(venue, {})[key] = status
+        return result
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""
+Test configuration
+
+The model modules import each other flat (as Main does after adding model to sys.path), Main scripts
+are imported by name (those importing quickfix are not tested).
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, os.path.join(ROOT, 'Main'))
+sys.path.insert(0, os.path.join(ROOT, 'model'))
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from bars import BarAggregator
+
+def aggregator(**kwargs):
+    closed = []
+    bars = BarAggregator(onClose=lambda symbol, interval, bar: closed.append((symbol, interval, bar)), **kwargs)
+    return bars, closed
+
+def test_first_snapshot_is_skipped_and_volume_gives_size():
+    bars, closed = aggregator(intervals=(60,))
+    assert not bars.onTrade('DLR', 100.0, 5, volume=1000, timestamp=0)
+    assert not bars.onTrade('DLR', 100.0, 5, volume=1000, timestamp=1)
+    assert bars.onTrade('DLR', 101.0, 2, volume=1003, timestamp=2)
+    assert bars.onTrade('DLR', 99.0, 1, volume=1004, timestamp=3)
+    assert bars.history('DLR', 60) == []
+    current = bars.history('DLR', 60, current=True)[-1]
+    assert (current['open'], current['high'], current['low'], current['close']) == (101.0, 101.0, 99.0, 99.0)
+    assert current['volume'] == 4 and current['trades'] == 2
+
+def test_without_volume_repeated_trade_is_ignored():
+    bars, closed = aggregator(intervals=(60,))
+    bars.onTrade('DLR', 100.0, 5, timestamp=0)
+    assert not bars.onTrade('DLR', 100.0, 5, timestamp=1)
+    assert bars.onTrade('DLR', 100.0, 6, timestamp=2)
+
+def test_bars_close_on_next_period_and_clock():
+    bars, closed = aggregator(intervals=(1, 60))
+    bars.onTrade('DLR', 100.0, 1, timestamp=0)
+    bars.onTrade('DLR', 100.0, 2, timestamp=0.5)
+    bars.onTrade('DLR', 101.0, 3, timestamp=1.5)
+    assert [(interval, bar['start'], bar['close']) for _, interval, bar in closed] == [(1, 0, 100.0)]
+
+    bars.flush(now=61)
+    assert sorted((interval, bar['start']) for _, interval, bar in closed[1:]) == [(1, 1), (60, 0)]
+    assert [bar['volume'] for bar in bars.history('DLR', 60)] == [5.0]
+    assert bars.history('DLR', 300) == []
+
+def test_history_window_and_capacity():
+    bars, closed = aggregator(intervals=(1,), capacity=3)
+    bars.onTrade('DLR', 100.0, 1, timestamp=0)
+    for second in range(5):
+        bars.onTrade('DLR', 100.0 + second, 1, timestamp=second)
+    bars.flush(now=10)
+    assert [bar['start'] for bar in bars.history('DLR', 1)] == [2, 3, 4]
+    assert [bar['start'] for bar in bars.history('DLR', 1, start=3)] == [3, 4]
+    assert [bar['start'] for bar in bars.history('DLR', 1, end=4, limit=1)] == [3]
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from bookanalytics import FIELDS, bookAnalytics
+
+def levels(*pairs):
+    return [{'price' : price, 'size' : size} for price, size in pairs]
+
+def test_two_sided_book():
+    analytics = bookAnalytics(levels((100.0, 3), (99.0, 1)), levels((101.0, 1), (102.0, 3)))
+    assert set(analytics) == set(FIELDS)
+    assert analytics['spread'] == 1.0
+    assert analytics['mid'] == 100.5
+    assert analytics['microprice'] == pytest.approx((100.0 * 1 + 101.0 * 3) / 4)
+    assert analytics['imbalance'] == 0.5
+    assert analytics['bidVwap'] == pytest.approx(399.0 / 4)
+    assert analytics['offerVwap'] == pytest.approx(407.0 / 4)
+    assert analytics['depthImbalance'] == 0.0
+
+def test_one_sided_and_empty_books():
+    assert bookAnalytics(levels((100.0, 2)), []) == {'bidVwap' : 100.0, 'depthImbalance' : 1.0}
+    assert bookAnalytics([], []) == {}
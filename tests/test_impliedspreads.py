@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from impliedspreads import ImpliedEngine, impliedId, spreadLegs
+
+def future(symbol, maturityDate=None):
+    return {'symbol' : symbol, 'cfiCode' : 'FXXXSX', 'underlyingSymbol' : 'DLR', 'maturityDate' : maturityDate, 'venue' : 'ROFX'}
+
+INSTRUMENTS = [future('DLR/JUN24', '20240628'), future('DLR/MAY24', '20240531'), future('DLR/JUL24', '20240731'),
+               future('DLR/MAY24/JUN24'), {'symbol' : 'GGAL', 'cfiCode' : 'ESXXXX', 'underlyingSymbol' : 'GGAL'}]
+
+@pytest.fixture
+def engine():
+    engine = ImpliedEngine()
+    engine.load(INSTRUMENTS)
+    return engine
+
+def bySymbol(instruments):
+    return {instrument['symbol'] : instrument for instrument in instruments}
+
+def test_spread_legs():
+    outrights = {'DLR/MAY24' : 'DLR/MAY24', 'DLR/JUN24' : 'DLR/JUN24'}
+    assert spreadLegs('DLR/MAY24/JUN24', outrights) == ('DLR/MAY24', 'DLR/JUN24')
+    assert spreadLegs('DLR/MAY24/JUL24', outrights) is None
+    assert spreadLegs('DLR/MAY24', outrights) is None
+
+def test_definitions(engine):
+    assert engine.definitions() == {'DLR' : {'outrights' : ['DLR/MAY24', 'DLR/JUN24', 'DLR/JUL24'],
+                                             'spreads'   : ['DLR/MAY24/JUN24', 'DLR/JUN24/DLR/JUL24'],
+                                             'listed'    : ['DLR/MAY24/JUN24']}}
+
+def test_implied_spread(engine):
+    assert engine.onTop('GGAL', 1.0, 1, 2.0, 1) == ()
+    engine.onTop('DLR/MAY24', 900.0, 10, 901.0, 5)
+    changed = bySymbol(engine.onTop('DLR/JUN24', 920.0, 3, 922.0, 7))
+    spread = changed['DLR/MAY24/JUN24']
+    assert spread['instrumentId'] == {'symbol' : impliedId('DLR/MAY24/JUN24'), 'marketId' : 'ROFX'}
+    assert spread['kind'] == 'spread' and spread['listed'] == 1
+    assert spread['marketData'] == {'BI' : [{'price' : 19.0, 'size' : 3, 'position' : 1}],
+                                    'OF' : [{'price' : 22.0, 'size' : 7, 'position' : 1}]}
+    ## JUL24 has no top yet: the JUN24/JUL24 spread has no side
+    assert changed['DLR/JUN24/DLR/JUL24']['marketData'] == {'BI' : [], 'OF' : []}
+    assert engine.onTop('DLR/JUN24', 920.0, 3, 922.0, 7) == ()
+
+def test_implied_outright(engine):
+    engine.onTop('DLR/MAY24', 900.0, 10, 901.0, 5)
+    changed = bySymbol(engine.onTop('DLR/MAY24/JUN24', 18.0, 4, 21.0, 2))
+    outright = changed['DLR/JUN24']
+    assert outright['instrumentId']['symbol'] == 'implied:DLR/JUN24'
+    assert outright['kind'] == 'outright' and outright['legs'] == ['DLR/MAY24/JUN24']
+    assert outright['marketData'] == {'BI' : [{'price' : 918.0, 'size' : 4, 'position' : 1}],
+                                      'OF' : [{'price' : 922.0, 'size' : 2, 'position' : 1}]}
+    ## JUN24 has no top: the implied MAY24 has no side
+    assert changed['DLR/MAY24']['marketData'] == {'BI' : [], 'OF' : []}
+    assert [quote['symbol'] for quote in engine.quotes('DLR') if quote['kind'] == 'outright'] == ['DLR/MAY24', 'DLR/JUN24']
+
+def test_reload_keeps_tops(engine):
+    engine.onTop('DLR/MAY24', 900.0, 10, 901.0, 5)
+    engine.onTop('DLR/JUN24', 920.0, 3, None, None)
+    engine.load(INSTRUMENTS)
+    quotes = bySymbol(engine.quotes())
+    assert quotes['DLR/MAY24/JUN24']['marketData'] == {'BI' : [{'price' : 19.0, 'size' : 3, 'position' : 1}], 'OF' : []}
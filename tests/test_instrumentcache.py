@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+import json
+
+import pytest
+
+from instrumentcache import InstrumentCache
+
+TODAY = '2024-05-02'
+
+def ticker(symbol, venue='ROFX', segment='DDF'):
+    return {'symbol' : symbol, 'marketSegmentId' : segment, 'venue' : venue}
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = InstrumentCache(str(tmp_path / 'Cache' / 'instruments.db'))
+    yield cache
+    cache.close()
+
+def test_upsert_and_load(cache):
+    cache.upsert([ticker('DLR/MAY24'), ticker('GGAL/JUN24', venue='MATBA')])
+    cache.upsert([dict(ticker('DLR/MAY24'), minPriceIncrement=0.5)])
+    assert cache.count() == 2
+    assert cache.load()['DLR/MAY24']['minPriceIncrement'] == 0.5
+    assert list(cache.load(['MATBA'])) == ['GGAL/JUN24']
+    cache.delete(['GGAL/JUN24'])
+    assert list(cache.load()) == ['DLR/MAY24']
+
+def test_validity_per_venue(cache):
+    assert cache.getTradeDate('ROFX') is None
+    assert not cache.isValid('ROFX', TODAY)
+    cache.stamp('ROFX', TODAY)
+    assert cache.isValid('ROFX', TODAY)
+    assert not cache.isValid('ROFX', '2024-05-03')
+    assert not cache.isValid('MATBA', TODAY)
+    assert cache.validVenues(TODAY) == ['ROFX']
+
+def test_clear_one_venue(cache):
+    cache.upsert([ticker('DLR/MAY24'), ticker('GGAL/JUN24', venue='MATBA')])
+    cache.stamp('ROFX', TODAY)
+    cache.stamp('MATBA', TODAY)
+    cache.clear('ROFX')
+    assert list(cache.load()) == ['GGAL/JUN24']
+    assert cache.validVenues(TODAY) == ['MATBA']
+    cache.clear()
+    assert cache.count() == 0
+    assert cache.validVenues(TODAY) == []
+
+def test_migrates_cache_without_venue(tmp_path):
+    path = str(tmp_path / 'instruments.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE instruments (symbol TEXT PRIMARY KEY, marketSegmentId TEXT, data TEXT)')
+    conn.execute('INSERT INTO instruments VALUES (?, ?, ?)', ('DLR/MAY24', 'DDF', json.dumps(ticker('DLR/MAY24'))))
+    conn.commit()
+    conn.close()
+
+    cache = InstrumentCache(path)
+    try:
+        assert list(cache.load(['ROFX'])) == ['DLR/MAY24']
+    finally:
+        cache.close()
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from instruments import InstrumentRegistry, maturityKey
+
+def instrument(symbol, cfiCode, maturityDate=None, strikePrice=None, underlying='GGAL', segment='DDF'):
+    return {'symbol' : symbol, 'cfiCode' : cfiCode, 'maturityDate' : maturityDate, 'strikePrice' : strikePrice,
+            'underlyingSymbol' : underlying, 'marketSegmentId' : segment}
+
+INSTRUMENTS = [instrument('GGAL/JUN24', 'FXXXSX', '20240628'),
+               instrument('GGAL/MAY24', 'FXXXSX', '20240531'),
+               instrument('GGAL/JUN24 120 C', 'OCAFXS', '20240628', 120),
+               instrument('GGAL/JUN24 100 C', 'OCAFXS', '20240628', 100),
+               instrument('GGAL/JUN24 100 P', 'OPAFXS', '20240628', 100),
+               instrument('DLR/MAY24', 'FXXXSX', '20240531', underlying='DLR')]
+
+@pytest.fixture
+def registry():
+    return InstrumentRegistry({item['symbol'] : item for item in INSTRUMENTS})
+
+def symbols(instruments):
+    return [item['symbol'] for item in instruments]
+
+def test_maturity_key():
+    assert maturityKey({'maturityDate' : '20240628'}) == '20240628'
+    assert maturityKey({'maturityMonthYear' : '202406'}) == '20240600'
+    assert maturityKey({}) == '99999999'
+
+def test_futures_and_maturities(registry):
+    assert symbols(registry.futures('GGAL')) == ['GGAL/MAY24', 'GGAL/JUN24']
+    assert registry.maturities('GGAL') == ['20240531', '20240628']
+
+def test_option_chain_ordered_by_strike(registry):
+    chain = registry.optionChain('GGAL', '20240628')
+    assert symbols(chain['calls']) == ['GGAL/JUN24 100 C', 'GGAL/JUN24 120 C']
+    assert symbols(chain['puts']) == ['GGAL/JUN24 100 P']
+    assert registry.optionChain('GGAL', '20240531') == {'calls' : [], 'puts' : []}
+
+def test_search_and_query(registry):
+    assert registry.search('GGAL/JUN24 1') == ['GGAL/JUN24 100 C', 'GGAL/JUN24 100 P', 'GGAL/JUN24 120 C']
+    assert symbols(registry.byCfiCode('OP')) == ['GGAL/JUN24 100 P']
+    assert symbols(registry.query(maturityDate='20240531')) == ['DLR/MAY24', 'GGAL/MAY24']
+    assert symbols(registry.query(prefix='GGAL', cfiCode='F')) == ['GGAL/MAY24', 'GGAL/JUN24']
+
+def test_add_replace_and_remove(registry):
+    registry.add(instrument('GGAL/JUN24', 'FXXXSX', '20240430'))
+    assert symbols(registry.futures('GGAL')) == ['GGAL/JUN24', 'GGAL/MAY24']
+    assert len(registry) == len(INSTRUMENTS)
+
+    assert registry.remove('DLR/MAY24')['symbol'] == 'DLR/MAY24'
+    assert registry.remove('DLR/MAY24') is None
+    assert 'DLR/MAY24' not in registry
+    assert registry.lookup('underlying', 'DLR') == []
+    assert registry.search('DLR') == []
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import random
+
+import latency
+from latency import LatencyHistogram, LatencyRecorder
+
+def test_small_values_are_exact():
+    histogram = LatencyHistogram()
+    for value in range(histogram.subBuckets):
+        assert histogram.value(histogram.index(value)) == value
+
+def test_relative_error_bound():
+    histogram = LatencyHistogram()
+    bound = 2.0 ** -(histogram.precision - 1)
+    generator = random.Random(7)
+    for _ in range(10000):
+        value = generator.randint(1, 60 * 10**9)
+        upper = histogram.value(histogram.index(value))
+        assert value <= upper
+        assert (upper - value) / value < bound
+
+def test_percentiles():
+    histogram = LatencyHistogram()
+    for value in range(1, 101):
+        histogram.record(value * 1000)
+    histogram.record(-1)
+    summary = histogram.summary()
+    assert summary['count'] == 100 and summary['min'] == 1000 and summary['max'] == 100000
+    assert summary['mean'] == 50500
+    for name, expected in (('p50', 50000), ('p90', 90000), ('p99', 99000)):
+        assert expected <= summary[name] < expected * 1.01
+    histogram.reset()
+    assert histogram.percentile(50) is None
+
+def test_recorder_stages(monkeypatch):
+    clock = iter([100, 150, 400, 1000])
+    monkeypatch.setattr(latency.time, 'perf_counter_ns', lambda: next(clock))
+    recorder = LatencyRecorder()
+    recorder.begin('8')
+    recorder.mark('parse')
+    recorder.stage('write', 70)
+    recorder.mark('update')
+    recorder.end()
+    recorder.mark('ignored')
+
+    snapshot = recorder.snapshot(reset=True)
+    assert {stage : summary['max'] for stage, summary in snapshot['8'].items()} == {'parse' : 50, 'write' : 70, 'update' : 250, 'total' : 900}
+    assert recorder.snapshot()['8']['total']['count'] == 0
+
+def test_disabled_recorder():
+    recorder = LatencyRecorder(enabled=False)
+    recorder.begin('8')
+    recorder.mark('parse')
+    recorder.end()
+    assert recorder.snapshot() == {}
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from matchingengine import BUY, SELL, MatchingEngine, Order
+
+SYMBOL = 'DLR/MAY24'
+
+@pytest.fixture
+def engine():
+    return MatchingEngine([SYMBOL])
+
+def order(engine, side, quantity, price, clOrdId=None):
+    orderId = engine.nextOrderId()
+    return Order(orderId, clOrdId or 'c' + orderId, 'owner', 'A', SYMBOL, side, quantity, price, '2')
+
+def test_price_time_priority(engine):
+    first = order(engine, SELL, 5, 100.0)
+    second = order(engine, SELL, 5, 100.0)
+    better = order(engine, SELL, 5, 99.0)
+    for resting in (first, second, better):
+        assert engine.submit(resting) == []
+
+    buy = order(engine, BUY, 8, 100.0)
+    trades = engine.submit(buy)
+    assert [(trade['resting'], trade['price'], trade['quantity']) for trade in trades] == [(better, 99.0, 5), (first, 100.0, 3)]
+    assert buy.status == '2' and buy.avgPx == pytest.approx((99.0 * 5 + 100.0 * 3) / 8)
+    assert first.status == '1' and first.leavesQty == 2
+    assert engine.books[SYMBOL].depth() == ([], [(100.0, 7)])
+
+def test_limit_rests_and_market_remainder_cancels(engine):
+    engine.submit(order(engine, SELL, 2, 101.0))
+    limit = order(engine, BUY, 3, 100.0)
+    assert engine.submit(limit) == []
+    assert engine.books[SYMBOL].depth() == ([(100.0, 3)], [(101.0, 2)])
+
+    market = order(engine, BUY, 5, None)
+    assert [trade['quantity'] for trade in engine.submit(market)] == [2]
+    assert market.status == '4' and market.leavesQty == 3
+    assert engine.books[SYMBOL].best(SELL) is None
+
+def test_cancel_and_replace(engine):
+    resting = order(engine, BUY, 3, 100.0)
+    engine.submit(resting)
+    replaced, trades = engine.replace(resting.orderId, 'c2', price=101.0)
+    assert trades == [] and resting.status == '4'
+    assert replaced.origClOrdId == resting.clOrdId and replaced.orderId != resting.orderId
+    assert engine.books[SYMBOL].depth() == ([(101.0, 3)], [])
+
+    assert engine.cancel(replaced.orderId) is replaced
+    assert engine.cancel(replaced.orderId) is None
+    assert engine.replace(resting.orderId, 'c3') == (None, [])
+    assert engine.books[SYMBOL].depth() == ([], [])
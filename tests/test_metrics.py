@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import threading
+
+from metrics import MetricsRegistry
+
+def test_counter_sums_threads():
+    registry = MetricsRegistry()
+    counter = registry.counter('messages_total', 'Messages', labels=('msgType',))
+
+    def work():
+        for _ in range(10000):
+            counter.inc('8')
+        counter.inc('W')
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.value('8') == 40000
+    assert counter.value('W') == 4
+    assert counter.value('X') == 0
+    assert registry.counter('messages_total', 'Messages') is counter
+
+def test_render():
+    registry = MetricsRegistry(prefix='fix_')
+    registry.counter('orders_total', 'Orders', labels=('account',)).inc('A"1')
+    registry.gauge('connected', 'Session logged on', lambda: True)
+    registry.gauge('queue', 'Queue size', lambda: {('ws', 'a') : 1.5}, labels=('server', 'client'))
+    registry.gauge('broken', 'Failing callback', lambda: 1 / 0)
+
+    assert registry.render().splitlines() == ['# HELP fix_orders_total Orders',
+                                              '# TYPE fix_orders_total counter',
+                                              'fix_orders_total{account="A\\"1"} 1',
+                                              '# HELP fix_connected Session logged on',
+                                              '# TYPE fix_connected gauge',
+                                              'fix_connected 1',
+                                              '# HELP fix_queue Queue size',
+                                              '# TYPE fix_queue gauge',
+                                              'fix_queue{server="ws",client="a"} 1.5',
+                                              '# HELP fix_broken Failing callback',
+                                              '# TYPE fix_broken gauge']
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import math
+
+import numpy as np
+import pytest
+
+from optionchain import OptionChainEngine, black76, expiryTime, greeks, impliedVolatility, normCdf
+
+STRIKES = np.array([800.0, 900.0, 1000.0, 1100.0, 1200.0])
+
+def test_norm_cdf():
+    x = np.linspace(-5, 5, 101)
+    expected = [0.5 * (1 + math.erf(value / math.sqrt(2))) for value in x]
+    assert np.max(np.abs(normCdf(x) - expected)) < 7.5e-8
+
+def test_put_call_parity():
+    call, _ = black76(1000.0, STRIKES, 0.5, 0.05, 0.3, True)
+    put, _ = black76(1000.0, STRIKES, 0.5, 0.05, 0.3, False)
+    assert np.allclose(call - put, math.exp(-0.05 * 0.5) * (1000.0 - STRIKES))
+
+@pytest.mark.parametrize('isCall', [True, False])
+def test_implied_volatility_round_trip(isCall):
+    price, _ = black76(1000.0, STRIKES, 0.25, 0.05, 0.3, isCall)
+    assert np.allclose(impliedVolatility(price, 1000.0, STRIKES, 0.25, 0.05, isCall), 0.3, atol=1e-8)
+
+def test_implied_volatility_outside_bounds():
+    iv = impliedVolatility([np.nan, 0.0, 100.0, 1001.0], 1000.0, 900.0, 0.25, 0.0, True)
+    assert np.isnan(iv).all()
+    assert np.isnan(impliedVolatility(50.0, 1000.0, 1000.0, 0.0, 0.0, True))
+
+def test_greeks_match_finite_differences():
+    values = greeks(1000.0, STRIKES, 0.5, 0.05, 0.3, True)
+    step = 0.01
+    up, _ = black76(1000.0 + step, STRIKES, 0.5, 0.05, 0.3, True)
+    down, _ = black76(1000.0 - step, STRIKES, 0.5, 0.05, 0.3, True)
+    assert np.allclose(values['delta'], (up - down) / (2 * step), atol=1e-6)
+    higher, _ = black76(1000.0, STRIKES, 0.5, 0.05, 0.3 + 1e-4, True)
+    lower, _ = black76(1000.0, STRIKES, 0.5, 0.05, 0.3 - 1e-4, True)
+    assert np.allclose(values['vega'], (higher - lower) / 2e-4 / 100, atol=1e-6)
+    puts = greeks(1000.0, STRIKES, 0.5, 0.05, 0.3, False)
+    assert np.allclose(values['delta'] - puts['delta'], math.exp(-0.05 * 0.5))
+
+def option(strike, cfiCode):
+    return {'symbol' : 'GGAL/JUN24 %s %s' % (strike, cfiCode[1]), 'cfiCode' : cfiCode + 'AFXS',
+            'underlyingSymbol' : 'GGAL/JUN24', 'maturityDate' : '20240628', 'strikePrice' : strike}
+
+def test_engine_computes_marked_chains():
+    updates = []
+    engine = OptionChainEngine(interval=1.0, onUpdate=updates.append)
+    engine.load([option(900, 'OC'), option(1100, 'OP'), option(1000, 'OC'), {'symbol' : 'GGAL/JUN24', 'cfiCode' : 'FXXXSX'}])
+    now = expiryTime('20240628') - 0.25 * 365 * 86400
+    price, _ = black76(1000.0, np.array([900.0, 1000.0, 1100.0]), 0.25, 0.0, 0.3, np.array([True, True, False]))
+
+    assert not engine.onTop('OTHER', 1.0, 2.0)
+    engine.onTop('GGAL/JUN24 900 C', price[0] - 1, price[0] + 1)
+    engine.onTop('GGAL/JUN24 1000 C', price[1] - 1, price[1] + 1)
+    engine.onTop('GGAL/JUN24 1100 P', None, price[2])
+    engine.onTop('GGAL/JUN24', 999.0, 1001.0)
+    engine.flush(now)
+
+    assert len(updates) == 1
+    result = updates[0]
+    assert result['underlyingPrice'] == 1000.0 and result['timeToExpiry'] == pytest.approx(0.25)
+    options = result['options']
+    assert [(row['strike'], row['putCall']) for row in options] == [(900.0, 'C'), (1000.0, 'C'), (1100.0, 'P')]
+    assert [row['iv'] for row in options[:2]] == pytest.approx([0.3, 0.3], abs=1e-8)
+    assert options[0]['bidIv'] < 0.3 < options[0]['offerIv']
+    assert 'bid' not in options[2] and 'iv' not in options[2] and options[2]['offerIv'] == pytest.approx(0.3)
+
+    ## Within the interval the marked chain waits
+    engine.onTop('GGAL/JUN24', 1000.0, 1002.0)
+    engine.flush(now + 0.5)
+    assert len(updates) == 1
+    engine.flush(now + 1.0)
+    assert len(updates) == 2 and updates[1]['underlyingPrice'] == 1001.0
+    assert engine.snapshot('GGAL/JUN24', 20240628) == [updates[1]]
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import os
+import xml.etree.ElementTree as ET
+
+from prunedictionary import prune, write
+
+SPEC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'conf', 'spec')
+
+DICTIONARY = """<fix type="FIX" major="5" minor="0" servicepack="2">
+  <header/>
+  <trailer/>
+  <messages>
+    <message name="NewOrderSingle" msgtype="D" msgcat="app">
+      <field name="ClOrdID" required="Y"/>
+      <component name="Instrument" required="Y"/>
+      <group name="NoPartyIDs" required="N">
+        <field name="PartyID" required="N"/>
+      </group>
+    </message>
+    <message name="Quote" msgtype="S" msgcat="app">
+      <field name="QuoteID" required="Y"/>
+      <component name="Unused" required="N"/>
+    </message>
+  </messages>
+  <components>
+    <component name="Instrument">
+      <field name="Symbol" required="N"/>
+      <component name="SecAltIDGrp" required="N"/>
+    </component>
+    <component name="SecAltIDGrp">
+      <field name="SecurityAltID" required="N"/>
+    </component>
+    <component name="Unused">
+      <field name="Text" required="N"/>
+    </component>
+  </components>
+  <fields>
+    <field number="11" name="ClOrdID" type="STRING"/>
+    <field number="55" name="Symbol" type="STRING"/>
+    <field number="58" name="Text" type="STRING"/>
+    <field number="117" name="QuoteID" type="STRING"/>
+    <field number="448" name="PartyID" type="STRING"/>
+    <field number="453" name="NoPartyIDs" type="NUMINGROUP"/>
+    <field number="455" name="SecurityAltID" type="STRING"/>
+  </fields>
+</fix>
+"""
+
+def names(root, section):
+    return [element.get('name') for element in root.find(section)]
+
+def test_prune_keeps_reachable_definitions():
+    root = prune(ET.fromstring(DICTIONARY), messages=['D'])
+    assert names(root, 'messages') == ['NewOrderSingle']
+    assert names(root, 'components') == ['Instrument', 'SecAltIDGrp']
+    assert names(root, 'fields') == ['ClOrdID', 'Symbol', 'PartyID', 'NoPartyIDs', 'SecurityAltID']
+
+def test_shipped_dictionary_is_up_to_date(tmp_path):
+    target = str(tmp_path / 'FIX50SP2_rofex.xml')
+    write(os.path.join(SPEC, 'FIX50SP2_rofex_full.xml'), target)
+    with open(target, 'rb') as pruned, open(os.path.join(SPEC, 'FIX50SP2_rofex.xml'), 'rb') as shipped:
+        assert pruned.read() == shipped.read()
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from recorder import FixRecorder, SegmentReader, listSegments
+
+def message(symbol, seqNum):
+    return '8=FIXT.1.1\x019=10\x0135=W\x0134=%d\x0155=%s\x0110=000\x01' % (seqNum, symbol)
+
+def test_record_and_read_back(tmp_path):
+    directory = str(tmp_path)
+    recorder = FixRecorder(directory, blockSize=128, flushInterval=60)
+    symbols = ['DLR/MAY24', 'GGAL/JUN24']
+    for seqNum in range(1, 21):
+        recorder.record(message(symbols[seqNum % 2], seqNum), timestamp=seqNum * 1000)
+    recorder.close()
+    assert recorder.dropped == 0
+
+    segments = listSegments(directory)
+    assert len(segments) == 1
+    reader = SegmentReader(segments[0])
+    assert len(reader) == 20
+    assert len(reader.blocks) > 1
+    assert reader.symbols() == sorted(symbols)
+    assert reader.timeRange() == (1000, 20000)
+
+    assert [timestamp for timestamp, _ in reader.messages()] == [seqNum * 1000 for seqNum in range(1, 21)]
+    selected = list(reader.messages('DLR/MAY24', start=5000, end=12000))
+    assert [timestamp for timestamp, _ in selected] == [6000, 8000, 10000]
+    assert selected[0][1] == message('DLR/MAY24', 6)
+    assert all(block['last'] >= 5000 and block['first'] < 12000 for block in reader.select(start=5000, end=12000))
+
+def test_rotates_segments(tmp_path):
+    directory = str(tmp_path)
+    recorder = FixRecorder(directory, segmentSize=1, blockSize=1, flushInterval=60)
+    for seqNum in range(1, 4):
+        recorder.record(message('DLR/MAY24', seqNum), timestamp=seqNum)
+    recorder.close()
+
+    segments = listSegments(directory)
+    assert sum(len(SegmentReader(segment)) for segment in segments) == 3
+    assert len([segment for segment in segments if len(SegmentReader(segment))]) == 3
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import rttmonitor
+from rttmonitor import RttMonitor
+
+class Clock(object):
+
+    def __init__(self, now=10**12):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def monitor(monkeypatch, **kwargs):
+    clock = Clock()
+    monkeypatch.setattr(rttmonitor.time, 'perf_counter_ns', clock)
+    alerts = []
+    monitor = RttMonitor(onAlert=lambda session, kind, value, stats: alerts.append((session, kind, value)), **kwargs)
+    return monitor, clock, alerts
+
+def test_round_trip(monkeypatch):
+    rtt, clock, alerts = monitor(monkeypatch, threshold=0.5)
+    testReqID = rtt.requestId('ROFX')
+    assert rtt.stats('ROFX')['pending'] == 1
+    clock.now += 2 * 10**6
+    assert rtt.onHeartbeat('ROFX', testReqID) == 2 * 10**6
+    assert rtt.onHeartbeat('ROFX', 'TEST') is None
+    assert rtt.onHeartbeat('ROFX', 'RTT-x') is None
+
+    stats = rtt.stats()['ROFX']
+    assert stats['count'] == 1 and stats['pending'] == 0 and stats['p50'] == 2 * 10**6
+    assert alerts == []
+
+def test_threshold_and_timeout_alerts(monkeypatch):
+    rtt, clock, alerts = monitor(monkeypatch, threshold=0.5, timeout=5.0)
+    slow = rtt.requestId('ROFX')
+    clock.now += 10**9
+    rtt.onHeartbeat('ROFX', slow)
+    lost = rtt.requestId('ROFX')
+    clock.now += 6 * 10**9
+    rtt.check()
+    rtt.check()
+
+    assert alerts == [('ROFX', 'threshold', 10**9), ('ROFX', 'timeout', 6 * 10**9)]
+    assert rtt.stats('ROFX')['alerts'] == {'threshold' : 1, 'timeout' : 1}
+    assert rtt.onHeartbeat('ROFX', lost) == 6 * 10**9
+
+def test_window_and_reset(monkeypatch):
+    rtt, clock, alerts = monitor(monkeypatch, window=3, threshold=None)
+    for i in range(5):
+        testReqID = rtt.requestId('ROFX')
+        clock.now += i + 1
+        rtt.onHeartbeat('ROFX', testReqID)
+    assert rtt.stats('ROFX')['min'] == 3 and rtt.stats('ROFX')['count'] == 3
+    rtt.requestId('ROFX')
+    rtt.reset('ROFX')
+    assert rtt.stats('ROFX')['pending'] == 0
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from securitylist import SecurityListAssembler
+
+def test_assembles_fragments_by_count():
+    assembler = SecurityListAssembler()
+    details = {'totNoRelatedSym' : 3}
+    assert assembler.ingest('req1', details, ['A', 'B']) is None
+    assert assembler.pending() == {'req1' : (2, 3)}
+
+    result = assembler.ingest('req1', {'totNoRelatedSym' : 3}, ['C'])
+    assert result['symbols'] == ['A', 'B', 'C']
+    assert result['fragments'] == 2
+    assert result['details'] is details
+    assert result['elapsed'] >= 0
+    assert assembler.pending() == {}
+
+def test_last_fragment_flag_wins():
+    assembler = SecurityListAssembler()
+    assert assembler.ingest('req1', {'totNoRelatedSym' : 2}, ['A', 'B'], lastFragment=False) is None
+    assert assembler.ingest('req1', {'totNoRelatedSym' : 2}, ['C'], lastFragment=True)['symbols'] == ['A', 'B', 'C']
+
+def test_requests_are_independent():
+    assembler = SecurityListAssembler()
+    assembler.ingest('req1', {'totNoRelatedSym' : 2}, ['A'])
+    assert assembler.ingest('req2', {'totNoRelatedSym' : 1}, ['X'])['symbols'] == ['X']
+    assert assembler.pending() == {'req1' : (1, 2)}
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import math
+
+import pytest
+from multiprocessing import resource_tracker
+
+from shmbook import BookReader, BookWriter, NAME_SIZE
+
+def balance(name):
+    ## Readers (and a refused writer) unregister the segment from the resource tracker, which in the writer's
+    ## process is the writer's own registration
+    resource_tracker.register('/' + name, 'shared_memory')
+
+def levels(*pairs):
+    return [{'price' : price, 'size' : size, 'position' : i + 1} for i, (price, size) in enumerate(pairs)]
+
+@pytest.fixture
+def writer():
+    skipped = []
+    writer = BookWriter(depth=2, capacity=2, onSkip=lambda symbol, reason: skipped.append(symbol))
+    writer.skippedSymbols = skipped
+    yield writer
+    writer.close()
+
+@pytest.fixture
+def reader(writer):
+    reader = BookReader(writer.name)
+    balance(writer.name)
+    yield reader
+    reader.close()
+
+def test_top_and_book(writer, reader):
+    assert writer.update('DLR/MAY24', levels((100.0, 5), (99.5, 2), (99.0, 1)), levels((100.5, 3)),
+                         {'spread' : 0.5, 'mid' : 100.25}, timestamp=42) == 0
+    assert reader.top('DLR/MAY24') == (100.0, 5.0, 100.5, 3.0, 42)
+
+    book = reader.book('DLR/MAY24')
+    assert list(book['bidPx']) == [100.0, 99.5]
+    assert book['bidDepth'] == 2 and book['offerDepth'] == 1
+    assert math.isnan(book['offerPx'][1]) and book['offerSize'][1] == 0
+    assert int(book['seq']) % 2 == 0
+
+    analytics = reader.analytics('DLR/MAY24')
+    assert analytics['spread'] == 0.5 and analytics['mid'] == 100.25
+    assert math.isnan(analytics['microprice'])
+
+def test_update_clears_old_levels(writer, reader):
+    writer.update('DLR/MAY24', levels((100.0, 5), (99.5, 2)), levels((100.5, 3)))
+    writer.update('DLR/MAY24', [], levels((101.0, 1)))
+    bidPx, bidSize, offerPx, offerSize, _ = reader.top('DLR/MAY24')
+    assert math.isnan(bidPx) and bidSize == 0 and (offerPx, offerSize) == (101.0, 1.0)
+
+def test_skips_beyond_capacity_and_long_names(writer, reader):
+    writer.update('A', [], [])
+    writer.update('B', [], [])
+    assert writer.update('C', [], []) is None
+    assert writer.update('X' * (NAME_SIZE + 1), [], []) is None
+    assert writer.update('C', [], []) is None
+    assert writer.skippedSymbols == ['C', 'X' * (NAME_SIZE + 1)]
+    assert reader.refresh() == {'A' : 0, 'B' : 1}
+    with pytest.raises(KeyError):
+        reader.top('C')
+
+def test_in_use_segment_is_not_replaced(writer):
+    with pytest.raises(FileExistsError):
+        BookWriter(writer.name, depth=2, capacity=2)
+    balance(writer.name)
+
+def test_attach_writes_owner_segment(writer, reader):
+    attached = BookWriter.attach(writer.name)
+    try:
+        attached.update('DLR/MAY24', levels((100.0, 5)), levels((100.5, 3)), timestamp=7)
+        assert reader.top('DLR/MAY24') == (100.0, 5.0, 100.5, 3.0, 7)
+    finally:
+        attached.close()
+    ## The owner keeps the segment
+    again = BookReader(writer.name)
+    balance(writer.name)
+    assert again.top('DLR/MAY24')[4] == 7
+    again.close()
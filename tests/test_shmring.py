@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from shmring import SharedRing
+
+@pytest.fixture
+def ring():
+    ring = SharedRing(size=256)
+    yield ring
+    ring.close()
+
+def test_put_get_in_order(ring):
+    assert ring.get() is None
+    for payload in (b'a', b'', b'x' * 30):
+        assert ring.put(payload)
+    assert len(ring) == 8 + 8 + 40
+    assert [ring.get() for _ in range(4)] == [b'a', b'', b'x' * 30, None]
+    assert len(ring) == 0 and ring.usage() == 0
+
+def test_wraps_around(ring):
+    for i in range(100):
+        payload = bytes([i]) * (1 + i % 50)
+        assert ring.put(payload)
+        assert ring.get() == payload
+
+def test_full_ring_drops(ring):
+    records = 0
+    while ring.put(b'x' * 60):
+        records += 1
+    assert records == 4 and ring.dropped == 1
+    assert ring.get() == b'x' * 60
+    assert ring.put(b'y' * 60)
+    with pytest.raises(ValueError):
+        ring.put(b'z' * 200)
+
+def test_attach_by_name(ring):
+    consumer = SharedRing(ring.name)
+    try:
+        ring.put(b'message')
+        assert consumer.get() == b'message'
+        assert ring.get() is None
+    finally:
+        consumer.close()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from subscriptions import SubscriptionManager
+
+ENTRIES = ['BI', 'OF']
+
+def test_stream_requested_once():
+    manager = SubscriptionManager()
+    mdReqId, symbols = manager.subscribe('ws1', 'ROFX', ['DLR/MAY24', 'GGAL/JUN24'], ENTRIES, 5)
+    assert mdReqId and symbols == ['DLR/MAY24', 'GGAL/JUN24']
+    assert manager.subscribe('ws2', 'ROFX', ['DLR/MAY24'], ['OF', 'BI'], 5) == (None, [])
+
+    other, symbols = manager.subscribe('ws2', 'ROFX', ['DLR/MAY24'], ENTRIES, 1)
+    assert other != mdReqId and symbols == ['DLR/MAY24']
+    assert len(manager) == 3
+
+def test_last_consumer_disables_and_survivors_are_requested_again():
+    manager = SubscriptionManager()
+    mdReqId, _ = manager.subscribe('ws1', 'ROFX', ['DLR/MAY24', 'GGAL/JUN24'], ENTRIES, 5)
+    manager.subscribe('ws2', 'ROFX', ['DLR/MAY24'], ENTRIES, 5)
+
+    assert manager.unsubscribe('ws2', 'ROFX', ['DLR/MAY24'], ENTRIES, 5) == ([], [])
+    disable, requests = manager.unsubscribe('ws1', 'ROFX', ['DLR/MAY24'], ENTRIES, 5)
+    assert disable == [(mdReqId, ENTRIES, 5, ['DLR/MAY24', 'GGAL/JUN24'])]
+    assert len(requests) == 1
+    newId, entries, depth, symbols = requests[0]
+    assert newId != mdReqId and (entries, depth, symbols) == (ENTRIES, 5, ['GGAL/JUN24'])
+
+    disable, requests = manager.unsubscribe('ws1', 'ROFX', ['GGAL/JUN24', 'UNKNOWN'], ENTRIES, 5)
+    assert disable == [(newId, ENTRIES, 5, ['GGAL/JUN24'])] and requests == []
+    assert len(manager) == 0
+
+def test_resubscribe_in_batches():
+    manager = SubscriptionManager(batchSize=2)
+    manager.subscribe('ws1', 'ROFX', ['A', 'B', 'C'], ENTRIES, 5)
+    manager.subscribe('ws1', 'MATBA', ['D'], ENTRIES, 5)
+    requests = manager.resubscribe('ROFX')
+    assert [symbols for _, _, _, symbols in requests] == [['A', 'B'], ['C']]
+    assert len(set(mdReqId for mdReqId, _, _, _ in requests)) == 2
+    assert [stream['mdReqId'] for stream in manager.snapshot('ROFX')] == [requests[0][0], requests[0][0], requests[1][0]]
+
+def test_rejected_drops_streams():
+    manager = SubscriptionManager()
+    mdReqId, _ = manager.subscribe('ws1', 'ROFX', ['A', 'B'], ENTRIES, 5)
+    manager.subscribe('ws1', 'ROFX', ['C'], ENTRIES, 5)
+    assert manager.rejected(mdReqId) == ['A', 'B']
+    assert [stream['symbol'] for stream in manager.snapshot(consumer='ws1')] == ['C']
+
+def test_ids_are_unique():
+    manager = SubscriptionManager()
+    assert SubscriptionManager.base36(0) == '0'
+    assert SubscriptionManager.base36(36 * 36 + 35) == '10Z'
+    ids = [manager.nextId() for _ in range(3)]
+    assert ids == ['%s-%s' % (manager.prefix, i) for i in (1, 2, 3)]
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import math
+
+import numpy as np
+import pytest
+
+from tophistory import TopHistory, toRecords
+
+@pytest.fixture
+def history():
+    history = TopHistory(capacity=4)
+    history.record('DLR', 100, 99.0, 1, 101.0, 1)
+    history.record('DLR', 200, 99.0, 1, 101.0, 1)
+    history.record('DLR', 300, 99.5, 1, 100.5, 1)
+    history.record('DLR', 400, np.nan, 0, 100.5, 1)
+    return history
+
+def test_records_changes_only(history):
+    assert list(history.query('DLR')['time']) == [100, 300, 400]
+    assert not history.record('DLR', 500, np.nan, 0, 100.5, 1)
+    assert list(history.query('DLR', start=300, end=400)['time']) == [300]
+    assert list(history.query('DLR', limit=1)['time']) == [400]
+    assert len(history.query('GGAL')) == 0
+
+def test_ring_keeps_the_last_rows(history):
+    for i in range(3):
+        history.record('DLR', 500 + i, 90.0 + i, 1, 110.0, 1)
+    assert list(history.query('DLR')['time']) == [400, 500, 501, 502]
+    assert list(history.query('DLR', start=501)['time']) == [501, 502]
+
+def test_resample(history):
+    rows = history.resample('DLR', 0, 500, 100)
+    assert list(rows['time']) == [0, 100, 200, 300, 400]
+    assert math.isnan(rows['bidPx'][0])
+    assert list(rows['bidPx'][1:4]) == [99.0, 99.0, 99.5]
+    assert math.isnan(history.resample('GGAL', 0, 100, 50)['bidPx'][1])
+
+def test_stats_are_time_weighted(history):
+    stats = history.stats('DLR', end=500)
+    assert stats['rows'] == 3
+    assert stats['meanSpread'] == pytest.approx(1.5)
+    assert stats['twSpread'] == pytest.approx((2.0 * 200 + 1.0 * 100) / 300)
+    assert stats['maxSpread'] == 2.0
+    assert stats['lastMid'] == 100.0
+    assert history.stats('GGAL') == {'rows' : 0}
+
+def test_to_records(history):
+    records = toRecords(history.query('DLR', start=400))
+    assert records == [{'time' : 400, 'bidPx' : None, 'bidSize' : 0.0, 'offerPx' : 100.5, 'offerSize' : 1.0,
+                        'lastPx' : None, 'lastSize' : 0.0}]
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import os
+import datetime
+
+from tradejournal import TradeJournal
+
+def nanos(dt):
+    return int(dt.timestamp() * 1e9)
+
+def test_dedup_and_reload(tmp_path):
+    journal = TradeJournal(str(tmp_path), tradeDate='20240502')
+    assert journal.append('T1', 'R1', 1, '20240502-13:00:00', {'price' : 100.0})
+    assert not journal.append('T1', 'R1', 1, '20240502-13:00:00', {'price' : 100.0})
+    assert journal.append('T2', 'R1', 2, '20240502-13:00:01', {'price' : 101.0})
+    journal.close()
+
+    journal = TradeJournal(str(tmp_path), tradeDate='20240502')
+    records = journal.load()
+    assert [record['tradeReportId'] for record in records] == ['T1', 'T2']
+    assert 'T2' in journal and len(journal) == 2
+    assert journal.lastTransactTime() == '20240502-13:00:01'
+    journal.close()
+
+def test_load_drops_incomplete_line(tmp_path):
+    journal = TradeJournal(str(tmp_path), tradeDate='20240502')
+    journal.append('T1', 'R1', 1, '20240502-13:00:00', {})
+    journal.file.write(b'{"tradeReportId": "T2", "tra')
+    journal.file.flush()
+    journal.close()
+
+    journal = TradeJournal(str(tmp_path), tradeDate='20240502')
+    assert [record['tradeReportId'] for record in journal.load()] == ['T1']
+    journal.append('T2', 'R1', 2, '20240502-13:00:01', {})
+    journal.close()
+
+    journal = TradeJournal(str(tmp_path), tradeDate='20240502')
+    assert len(journal.load()) == 2
+    journal.close()
+
+def test_late_record_stays_in_current_file(tmp_path):
+    now = datetime.datetime.now()
+    journal = TradeJournal(str(tmp_path))
+    journal.append('T1', 'R1', nanos(now - datetime.timedelta(days=1)), '', {})
+    assert os.listdir(str(tmp_path)) == ['trades-%s.jsonl' % now.strftime('%Y%m%d')]
+    journal.close()
+
+    journal = TradeJournal(str(tmp_path))
+    assert 'T1' in [record['tradeReportId'] for record in journal.load()]
+    journal.close()
+
+def test_newer_record_rolls_over(tmp_path):
+    tomorrow = datetime.datetime.now() + datetime.timedelta(days=1)
+    journal = TradeJournal(str(tmp_path))
+    journal.append('T1', 'R1', nanos(tomorrow), '', {})
+    assert journal.tradeDate == tomorrow.strftime('%Y%m%d')
+    assert os.path.getsize(journal.path) > 0
+    journal.close()
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from tradestore import TradeStore, parseTransactTime
+
+def test_parse_transact_time():
+    assert parseTransactTime('19700101-00:00:01') == 1000000000
+    assert parseTransactTime('19700101-00:00:01.250') == 1250000000
+
+@pytest.fixture
+def store():
+    store = TradeStore(capacity=2)
+    store.append(100.0, 10, 1, 'DLR/MAY24', 1, 'A', key=('1', 1))
+    store.append(110.0, 4, -1, 'DLR/MAY24', 2, 'A', key=('2', -1))
+    store.append(50.0, 2, 1, 'GGAL/JUN24', 3, 'B', key=('3', 1))
+    return store
+
+def test_grows_and_ignores_duplicates(store):
+    assert len(store) == 3
+    assert len(store.columns['price']) == 4
+    assert not store.append(100.0, 10, 1, 'DLR/MAY24', 1, 'A', key=('1', 1))
+    assert len(store) == 3
+
+def test_vwap(store):
+    assert store.vwap('DLR/MAY24') == pytest.approx((100.0 * 10 + 110.0 * 4) / 14)
+    assert store.vwap('DLR/MAY24', start=2) == 110.0
+    assert store.vwap('UNKNOWN') is None
+    assert store.vwapBySymbol() == {'DLR/MAY24' : pytest.approx(1440.0 / 14), 'GGAL/JUN24' : 50.0}
+
+def test_volumes(store):
+    assert store.volumeBySymbol() == {'DLR/MAY24' : 14, 'GGAL/JUN24' : 2}
+    assert store.volumeByAccount() == {'A' : 14, 'B' : 2}
+
+def test_realized_pnl(store):
+    pnl = store.realizedPnl({'DLR/MAY24' : 1000})
+    assert pnl[('A', 'DLR/MAY24')] == {'bought' : 10, 'sold' : 4, 'avgBuy' : 100.0, 'avgSell' : 110.0, 'realized' : 40000.0}
+    assert pnl[('B', 'GGAL/JUN24')] == {'bought' : 2, 'sold' : 0, 'avgBuy' : 50.0, 'avgSell' : None, 'realized' : 0.0}
+    assert ('A', 'GGAL/JUN24') not in pnl
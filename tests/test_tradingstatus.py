@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from tradingstatus import TradingStatusCache
+
+def test_unknown_is_tradable():
+    assert TradingStatusCache().canTrade('ROFX', 'DLR/MAY24', 'DDF') == (True, None)
+
+def test_symbol_and_segment_blocks():
+    cache = TradingStatusCache()
+    cache.setSymbolStatus('ROFX', 'DLR/MAY24', '2')
+    cache.setSegmentStatus('ROFX', 'DDA', 3)
+
+    allowed, reason = cache.canTrade('ROFX', 'DLR/MAY24', 'DDF')
+    assert not allowed and 'Trading Halt' in reason
+    allowed, reason = cache.canTrade('ROFX', 'GGAL/JUN24', 'DDA')
+    assert not allowed and 'Closed' in reason
+
+    cache.setSymbolStatus('ROFX', 'DLR/MAY24', 17)
+    assert cache.canTrade('ROFX', 'DLR/MAY24', 'DDF') == (True, None)
+
+def test_statuses_are_per_venue():
+    cache = TradingStatusCache()
+    cache.setSymbolStatus('ROFX', 'DLR/MAY24', 2)
+    cache.setSegmentStatus('MATBA', 'DDF', 1)
+    assert cache.canTrade('MATBA', 'DLR/MAY24')[0]
+    assert cache.canTrade('ROFX', 'GGAL/JUN24', 'DDF')[0]
+    assert cache.snapshot() == {'symbols' : {'ROFX' : {'DLR/MAY24' : 2}}, 'segments' : {'MATBA' : {'DDF' : 1}}}